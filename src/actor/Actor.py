@@ -31,6 +31,21 @@ class Actor(DirectObject, NodePath):
     validateSubparts = ConfigVariableBool('validate-subparts', True)
     mergeLODBundles = ConfigVariableBool('merge-lod-bundles', True)
     allowAsyncBind = ConfigVariableBool('allow-async-bind', True)
+    shareAnimBundles = ConfigVariableBool('actor-share-anim-bundles', True)
+
+    # Process-wide registry of the AnimBundles loaded from anim files,
+    # resolved filename->AnimBundle.  Every Actor that plays the same
+    # anim file binds against the same AnimBundle, instead of loading its
+    # own.  An entry is dropped when the last Actor that bound it unloads
+    # it (or is cleaned up).
+    _sharedAnimBundles = {}
+    # resolved filename->number of Actors that have it bound
+    _sharedAnimBundleUsers = {}
+    # filename as given->resolved filename, so that binding an anim
+    # doesn't search the model-path each time; cleared when the
+    # model-path, saved in _sharedAnimKeyPath, changes
+    _sharedAnimKeys = {}
+    _sharedAnimKeyPath = None
 
     class PartDef:
 
@@ -105,6 +120,73 @@ class Actor(DirectObject, NodePath):
         def __repr__(self):
             return 'Actor.SubpartDef(%s, %s)' % (repr(self.truePartName), repr(self.subset))
 
+    @classmethod
+    def getSharedAnimKey(cls, filename):
+        """Returns the key of the named anim file in the shared AnimBundle
+        registry: its full path, resolved along the model-path, so that
+        different spellings of the same file share one AnimBundle.  The
+        result is cached until the model-path changes."""
+        searchPath = getModelPath().getValue()
+        modelPath = tuple(searchPath.getDirectory(i).getFullpath()
+                          for i in range(searchPath.getNumDirectories()))
+        if modelPath != cls._sharedAnimKeyPath:
+            Actor._sharedAnimKeys = {}
+            Actor._sharedAnimKeyPath = modelPath
+        name = str(filename)
+        key = cls._sharedAnimKeys.get(name)
+        if key is None:
+            filename = Filename(filename)
+            if not filename.isFullyQualified():
+                filename.resolveFilename(searchPath)
+            filename.standardize()
+            key = filename.getFullpath()
+            Actor._sharedAnimKeys[name] = key
+        return key
+
+    @classmethod
+    def getSharedAnimBundle(cls, filename):
+        """Returns the AnimBundle registered for the named anim file, or
+        None if it has not been loaded yet."""
+        return cls._sharedAnimBundles.get(cls.getSharedAnimKey(filename))
+
+    @classmethod
+    def loadSharedAnimBundle(cls, filename):
+        """Returns the shared AnimBundle for the named anim file, loading
+        it (synchronously) and registering it if this is the first time
+        it has been asked for.  Returns None if it couldn't be loaded."""
+        key = cls.getSharedAnimKey(filename)
+        animBundle = cls._sharedAnimBundles.get(key)
+        if animBundle is None:
+            Loader._loadPythonFileTypes()
+            node = PandaLoader.getGlobalPtr().loadSync(Filename(filename),
+                                                        cls.animLoaderOptions)
+            if node is None:
+                return None
+            animBundleNP = NodePath(node)
+            if not node.isOfType(AnimBundleNode.getClassType()):
+                animBundleNP = animBundleNP.find('**/+AnimBundleNode')
+                if animBundleNP.isEmpty():
+                    Actor.notify.warning("%s contains no animation" % (filename))
+                    return None
+            animBundle = animBundleNP.node().getBundle()
+            cls._sharedAnimBundles[key] = animBundle
+        return animBundle
+
+    @classmethod
+    def releaseSharedAnimBundles(cls, filenames=None):
+        """Removes the named anim files (or all of them, if filenames is
+        None) from the registry.  Actors that have already bound them
+        keep working; the next bind will load them again."""
+        if filenames is None:
+            cls._sharedAnimBundles.clear()
+            cls._sharedAnimBundleUsers.clear()
+            cls._sharedAnimKeys.clear()
+        else:
+            for filename in filenames:
+                key = cls.getSharedAnimKey(filename)
+                cls._sharedAnimBundles.pop(key, None)
+                cls._sharedAnimBundleUsers.pop(key, None)
+
     def __init__(self, models=None, anims=None, other=None, copy=True,
                  lodNode = None, flattenable = True, setFinal = False,
                  mergeLODBundles = None, allowAsyncBind = None,
@@ -208,6 +290,13 @@ class Actor(DirectObject, NodePath):
         self.__subpartDict = {}
         self.__sortedLODNames = []
         self.__animControlDict = {}
+        # flattened lookup caches in front of __animControlDict, for
+        # play(), loop(), pose() and friends; see getAnimControls()
+        self.__animDefCache = {}
+        self.__animDefListCache = {}
+        # filename->shared registry key, for each anim file whose shared
+        # AnimBundle this Actor has bound and counts as a user of
+        self.__sharedAnimKeys = {}
 
         self.__subpartsComplete = False
 
@@ -387,6 +476,7 @@ class Actor(DirectObject, NodePath):
 
             # copy the anim dictionary from other
             self.__copyAnimControls(other)
+            self.__clearAnimDefCache()
 
 
     def __cmp__(self, other):
@@ -531,11 +621,13 @@ class Actor(DirectObject, NodePath):
         NodePath.removeNode(self)
 
     def clearPythonData(self):
+        self.__releaseSharedAnimBundles()
         self.__commonBundleHandles = {}
         self.__partBundleDict = {}
         self.__subpartDict = {}
         self.__sortedLODNames = []
         self.__animControlDict = {}
+        self.__clearAnimDefCache()
 
     def flush(self):
         """
@@ -556,10 +648,26 @@ class Actor(DirectObject, NodePath):
     # accessing
 
     def getAnimControlDict(self):
+        # If the caller adds or removes AnimDefs in the dictionary, it
+        # must call resetAnimControlCache() afterwards.
         return self.__animControlDict
 
+    def resetAnimControlCache(self):
+        """Forgets the cached anim control lookups.  Call this after
+        adding or removing AnimDefs in the dictionary returned by
+        getAnimControlDict()."""
+        self.__clearAnimDefCache()
+
     def removeAnimControlDict(self):
         self.__animControlDict = {}
+        self.__clearAnimDefCache()
+
+    def __clearAnimDefCache(self):
+        # Must be called whenever AnimDefs are added to or removed from
+        # __animControlDict, or the subparts change.  (Unbinding an
+        # AnimDef doesn't need it; the caches check for that.)
+        self.__animDefCache = {}
+        self.__animDefListCache = {}
 
     def getPartBundleDict(self):
         return self.__partBundleDict
@@ -1030,6 +1138,7 @@ class Actor(DirectObject, NodePath):
         # remove the animations
         if partName in partDict:
             del partDict[partName]
+            self.__clearAnimDefCache()
 
     def hidePart(self, partName, lodName="lodRoot"):
         """
@@ -1718,6 +1827,12 @@ class Actor(DirectObject, NodePath):
             else:
                 lodName = 'lodRoot'
 
+        anim = self.__animDefCache.get((animName, partName, lodName))
+        if anim is not None and anim.animControl:
+            if not allowAsyncBind:
+                anim.animControl.waitPending()
+            return anim.animControl
+
         partDict = self.__animControlDict.get(lodName)
         # if this assertion fails, named lod was not present
         assert partDict is not None
@@ -1739,6 +1854,7 @@ class Actor(DirectObject, NodePath):
                                           allowAsyncBind = allowAsyncBind)
                 elif not allowAsyncBind:
                     anim.animControl.waitPending()
+                self.__animDefCache[(animName, partName, lodName)] = anim
                 return anim.animControl
 
         return None
@@ -1764,6 +1880,25 @@ class Actor(DirectObject, NodePath):
         If lodName is None or omitted, all LOD's are returned.
         """
 
+        # The common case of a single named anim is answered from a
+        # flattened cache of the AnimDefs found the last time, as long
+        # as they are all still bound.
+        cacheKey = None
+        if isinstance(animName, str) and (partName is None or isinstance(partName, str)):
+            cacheKey = (animName, partName, lodName)
+            animDefs = self.__animDefListCache.get(cacheKey)
+            if animDefs is not None:
+                controls = []
+                for anim in animDefs:
+                    animControl = anim.animControl
+                    if not animControl:
+                        break
+                    if not allowAsyncBind:
+                        animControl.waitPending()
+                    controls.append(animControl)
+                else:
+                    return controls
+
         if partName is None and self.__subpartsComplete:
             # If we have the __subpartsComplete flag, and no partName
             # is specified, it really means to play the animation on
@@ -1771,6 +1906,8 @@ class Actor(DirectObject, NodePath):
             partName = list(self.__subpartDict.keys())
 
         controls = []
+        # the AnimDefs of the controls, for the cache
+        animDefs = []
         # build list of lodNames and corresponding animControlDicts
         # requested.
         if lodName is None or self.mergeLODBundles:
@@ -1867,6 +2004,10 @@ class Actor(DirectObject, NodePath):
 
                             if animControl:
                                 controls.append(animControl)
+                                animDefs.append(anim)
+
+        if cacheKey is not None and controls:
+            self.__animDefListCache[cacheKey] = animDefs
 
         return controls
 
@@ -1966,6 +2107,7 @@ class Actor(DirectObject, NodePath):
                     animDef.animBundle = animControl.getAnim()
                     animDef.animControl = animControl
                     self.__animControlDict[lodName][partName][animName] = animDef
+                self.__clearAnimDefCache()
 
     def __prepareBundle(self, bundleNP, partModel,
                         partName="modelRoot", lodName="lodRoot"):
@@ -2045,6 +2187,7 @@ class Actor(DirectObject, NodePath):
             subset.addExcludeJoint(GlobPattern(name))
 
         self.__subpartDict[partName] = Actor.SubpartDef(parent, subset)
+        self.__clearAnimDefCache()
 
         if __dev__ and not overlapping and self.validateSubparts.getValue():
             # Without the overlapping flag True, we're not allowed to
@@ -2078,6 +2221,7 @@ class Actor(DirectObject, NodePath):
         """
 
         self.__subpartsComplete = flag
+        self.__clearAnimDefCache()
 
         if __dev__ and self.__subpartsComplete and self.validateSubparts.getValue():
             # If we've specified any parts at all so far, make sure we've
@@ -2138,6 +2282,8 @@ class Actor(DirectObject, NodePath):
         assert Actor.notify.debug("in loadAnims: %s, part: %s, lod: %s" %
                                   (anims, partName, lodNames[0]))
 
+        self.__clearAnimDefCache()
+
         firstLoad = True
         if not reload:
             try:
@@ -2172,8 +2318,10 @@ class Actor(DirectObject, NodePath):
                     # it (and produce an AnimControl) when it is
                     # played.
                     self.__animControlDict[lName][partName][animName].filename = filename
+                    self.__animControlDict[lName][partName][animName].animBundle = None
 
     def initAnimsOnAllLODs(self,partNames):
+        self.__clearAnimDefCache()
         if self.mergeLODBundles:
             lodNames = ['common']
         else:
@@ -2200,6 +2348,7 @@ class Actor(DirectObject, NodePath):
         to 'lodRoot' for non-LOD actors) and dict of corresponding
         anims in the form animName:animPath{}
         """
+        self.__clearAnimDefCache()
         if self.mergeLODBundles:
             lodNames = ['common']
         else:
@@ -2288,6 +2437,59 @@ class Actor(DirectObject, NodePath):
                             animDef.animControl.getPart().setControlEffect(animDef.animControl, 0.0)
                             animDef.animControl = None
 
+        self.__releaseUnboundSharedAnimBundles()
+
+    def __releaseUnboundSharedAnimBundles(self):
+        # Gives up this Actor's use of the shared AnimBundles of the anim
+        # files it no longer has bound, so that the unload really frees
+        # them once no other Actor uses them.
+        if not self.__sharedAnimKeys:
+            return
+        bound = set()
+        unbound = []
+        for partDict in self.__animControlDict.values():
+            for animDict in partDict.values():
+                for animDef in animDict.values():
+                    if animDef.animControl is not None:
+                        bound.add(str(animDef.filename))
+                    elif str(animDef.filename) in self.__sharedAnimKeys:
+                        unbound.append(animDef)
+        for animDef in unbound:
+            if str(animDef.filename) not in bound:
+                # look it up in the registry again on the next bind
+                animDef.animBundle = None
+        self.__releaseSharedAnimBundles(
+            [filename for filename in self.__sharedAnimKeys if filename not in bound])
+
+    def __useSharedAnimBundle(self, filename):
+        # Counts this Actor as a user of the shared AnimBundle of the
+        # anim file, if it is in the registry.
+        filename = str(filename)
+        if filename in self.__sharedAnimKeys:
+            return
+        key = Actor.getSharedAnimKey(filename)
+        if key not in Actor._sharedAnimBundles:
+            return
+        self.__sharedAnimKeys[filename] = key
+        Actor._sharedAnimBundleUsers[key] = Actor._sharedAnimBundleUsers.get(key, 0) + 1
+
+    def __releaseSharedAnimBundles(self, filenames = None):
+        # Gives up this Actor's use of the shared AnimBundles of the named
+        # anim files, or of all of them; a bundle that no Actor uses any
+        # more is dropped from the registry.
+        if filenames is None:
+            filenames = list(self.__sharedAnimKeys.keys())
+        for filename in filenames:
+            key = self.__sharedAnimKeys.pop(filename, None)
+            if key is None:
+                continue
+            numUsers = Actor._sharedAnimBundleUsers.get(key, 0) - 1
+            if numUsers > 0:
+                Actor._sharedAnimBundleUsers[key] = numUsers
+            else:
+                Actor._sharedAnimBundleUsers.pop(key, None)
+                Actor._sharedAnimBundles.pop(key, None)
+
 
     def bindAnim(self, animName, partName = None, lodName = None,
                  allowAsyncBind = False):
@@ -2367,6 +2569,15 @@ class Actor(DirectObject, NodePath):
         else:
             bundle = self.__partBundleDict[lodName][subpartDef.truePartName].getBundle()
 
+        if not anim.animBundle and self.shareAnimBundles.getValue():
+            # Bind against the process-wide copy of the anim, if it has
+            # been loaded already, or if we have to load it now anyway.
+            animBundle = Actor.getSharedAnimBundle(anim.filename)
+            if animBundle is None and not (allowAsyncBind and self.allowAsyncBind):
+                animBundle = Actor.loadSharedAnimBundle(anim.filename)
+            if animBundle is not None:
+                anim.animBundle = animBundle
+
         if anim.animBundle:
             # We already have a bundle; just bind it.
             animControl = bundle.bindAnim(anim.animBundle, -1, subpartDef.subset)
@@ -2384,6 +2595,17 @@ class Actor(DirectObject, NodePath):
             # not attempted asynchronously.)
             return None
 
+        if (self.shareAnimBundles.getValue() and not anim.animBundle and
+            not animControl.isPending()):
+            # It was loaded by loadBindAnim(); share it from now on.
+            anim.animBundle = animControl.getAnim()
+            Actor._sharedAnimBundles.setdefault(
+                Actor.getSharedAnimKey(anim.filename), anim.animBundle)
+
+        if (self.shareAnimBundles.getValue() and anim.animBundle and
+            anim.filename is not None):
+            self.__useSharedAnimBundle(anim.filename)
+
         # store the animControl
         anim.animControl = animControl
         assert Actor.notify.debug("binding anim: %s to part: %s, lod: %s" %
@@ -2607,6 +2829,9 @@ class Actor(DirectObject, NodePath):
     list_joints = listJoints
     make_subpart = makeSubpart
     get_anim_control = getAnimControl
+    get_shared_anim_bundle = getSharedAnimBundle
+    load_shared_anim_bundle = loadSharedAnimBundle
+    release_shared_anim_bundles = releaseSharedAnimBundles
     get_part_bundle = getPartBundle
     get_part_bundle_dict = getPartBundleDict
     get_duration = getDuration
@@ -2647,4 +2872,5 @@ class Actor(DirectObject, NodePath):
     copy_actor = copyActor
     get_base_frame_rate = getBaseFrameRate
     remove_anim_control_dict = removeAnimControlDict
+    reset_anim_control_cache = resetAnimControlCache
     load_anims_on_all_lods = loadAnimsOnAllLODs
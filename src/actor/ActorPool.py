@@ -0,0 +1,291 @@
+"""ActorPool module: contains the ActorPool class.
+
+An ActorPool hands out ready-made Actors that are all copies of one
+template, so that spawning an Actor at a busy moment doesn't have to load
+and prepare its models and anims.
+"""
+
+__all__ = ['ActorPool']
+
+from panda3d.core import ClockObject, NodePath
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.task.TaskManagerGlobal import taskMgr
+from .Actor import Actor
+from collections import deque
+
+
+class ActorPool:
+    """
+    Keeps a supply of Actors built from the same models and anims.
+
+    The template Actor's models are loaded asynchronously, and then
+    numFree copies of it are made in the background, perFrame copies per
+    frame, with their anims bound asynchronously (see allowAsyncBind).
+    acquire() hands out one of these, or makes a new copy on the spot if
+    none is free; release() resets the Actor and returns it to the pool,
+    and the pool is topped back up in the background.
+
+    Example::
+
+        pool = ActorPool('phase_3/models/char/dog-mod',
+                         {'walk': 'phase_3/models/char/dog-walk'},
+                         numFree = 20)
+        ...
+        dog = pool.acquire()
+        dog.reparentTo(render)
+        dog.loop('walk')
+        ...
+        pool.release(dog)
+
+    release() stops the Actor's anims and puts it back in its rest pose,
+    shows all of its parts, clears any forced LOD, and detaches it from
+    the scene graph with its transform and color scale cleared.  Anything
+    else the user changed, such as exposed or controlled joints, should
+    be undone by the user first, or in an override of resetActor().
+    """
+    notify = directNotify.newCategory("ActorPool")
+
+    # how many acquire() latencies are kept for getSpawnStats()
+    NumLatencies = 1000
+
+    def __init__(self, models, anims = None, numFree = 0, maxFree = None,
+                 perFrame = 1, actorClass = Actor, loader = None,
+                 name = 'ActorPool', **actorKw):
+        """models and anims are as for the Actor constructor; models may
+        also be given as (dicts of) NodePaths, which are used directly for
+        the template instead of being loaded.  The pool keeps numFree Actors ready, and
+        holds on to at most maxFree of those that are released
+        (numFree, if maxFree is None).  Any other keyword arguments are
+        passed to the actorClass constructor for the template."""
+        self.actorClass = actorClass
+        self.numFree = numFree
+        if maxFree is None:
+            maxFree = numFree
+        self.maxFree = max(maxFree, numFree)
+        self.perFrame = perFrame
+        self.name = name
+        self._anims = anims
+        self._actorKw = actorKw
+        self._template = None
+        # (lodName, partName)->(animBlend, frameBlend, blendType) of the
+        # template's part bundles, which resetActor() restores
+        self._blendSettings = {}
+        self._free = []
+        # (callback, extraArgs, requestTime) for acquire() calls that are
+        # waiting for the template to load
+        self._waiting = []
+        self._latencies = deque(maxlen = self.NumLatencies)
+        self.numHits = 0
+        self.numMisses = 0
+        self._clock = ClockObject.getGlobalClock()
+        self._prewarmTaskName = '%s-prewarm-%s' % (self.name, id(self))
+
+        self._loadCb = None
+        self._models = models
+        self._modelPaths = []
+        self._collectModelPaths(models, self._modelPaths)
+        if self._modelPaths:
+            if loader is None:
+                loader = base.loader
+            self._loader = loader
+            self._loadCb = loader.loadModel(self._modelPaths, callback = self._gotModels)
+        else:
+            self._makeTemplate(models)
+
+    def destroy(self):
+        taskMgr.remove(self._prewarmTaskName)
+        if self._loadCb is not None:
+            self._loadCb.cancel()
+            self._loadCb = None
+        for actor in self._free:
+            actor.cleanup()
+        self._free = []
+        self._waiting = []
+        if self._template is not None:
+            self._template.cleanup()
+            self._template = None
+
+    def _collectModelPaths(self, models, modelPaths):
+        if isinstance(models, dict):
+            for value in models.values():
+                self._collectModelPaths(value, modelPaths)
+        elif models is not None and not isinstance(models, NodePath):
+            modelPaths.append(models)
+
+    def _replaceModelPaths(self, models, path2model):
+        # returns models with each path replaced by its loaded NodePath
+        if isinstance(models, dict):
+            return dict((key, self._replaceModelPaths(value, path2model))
+                        for key, value in models.items())
+        if models is not None and not isinstance(models, NodePath):
+            return path2model[models]
+        return models
+
+    def _gotModels(self, loadedModels):
+        self._loadCb = None
+        path2model = {}
+        for modelPath, model in zip(self._modelPaths, loadedModels):
+            if model is None:
+                self.notify.warning('%s: could not load %s' % (self.name, modelPath))
+                self._failWaiting()
+                return
+            path2model[modelPath] = model
+        self._makeTemplate(self._replaceModelPaths(self._models, path2model))
+
+    def _failWaiting(self):
+        # the template can't be made, so the acquire() calls that are
+        # waiting for it get None instead of an Actor
+        waiting = self._waiting
+        self._waiting = []
+        if waiting:
+            self.notify.warning('%s: %s acquire() calls failed' % (self.name, len(waiting)))
+        for callback, extraArgs, requestTime in waiting:
+            callback(None, *extraArgs)
+
+    def _makeTemplate(self, models):
+        self._template = self.actorClass(models, self._anims, copy = False,
+                                         **self._actorKw)
+        self._blendSettings = {}
+        for lodName, partDict in self._template.getPartBundleDict().items():
+            for partName, partDef in partDict.items():
+                bundle = partDef.getBundle()
+                self._blendSettings[(lodName, partName)] = (
+                    bundle.getAnimBlendFlag(), bundle.getFrameBlendFlag(),
+                    bundle.getBlendType())
+        # the first bind of each anim loads it into the shared registry,
+        # so that the copies don't have to
+        self._template.bindAllAnims(allowAsyncBind = True)
+        waiting = self._waiting
+        self._waiting = []
+        for callback, extraArgs, requestTime in waiting:
+            self._handOut(self._makeActor(), callback, extraArgs, requestTime, False)
+        self._startPrewarm()
+
+    def isReady(self):
+        # returns true once the template has been loaded
+        return self._template is not None
+
+    def getNumFree(self):
+        return len(self._free)
+
+    def _makeActor(self):
+        actor = self.actorClass(other = self._template)
+        actor.bindAllAnims(allowAsyncBind = True)
+        return actor
+
+    def _startPrewarm(self):
+        if (self._template is not None and len(self._free) < self.numFree and
+            not taskMgr.hasTaskNamed(self._prewarmTaskName)):
+            taskMgr.add(self._prewarmTask, self._prewarmTaskName)
+
+    def _prewarmTask(self, task):
+        for i in range(self.perFrame):
+            if len(self._free) >= self.numFree:
+                break
+            self._free.append(self._makeActor())
+        if len(self._free) >= self.numFree:
+            return task.done
+        return task.cont
+
+    def acquire(self, callback = None, extraArgs = []):
+        """Returns an Actor from the pool, making one if none is free.
+        If the template hasn't finished loading, this waits for it,
+        unless a callback is given; in that case the Actor is passed to
+        the callback (along with extraArgs) as soon as it can be made,
+        which may be before acquire() returns, and acquire() returns
+        None.  If the template's models can't be loaded, the callback is
+        passed None instead of an Actor."""
+        requestTime = self._clock.getRealTime()
+        if self._template is None:
+            if callback is not None:
+                self._waiting.append((callback, extraArgs, requestTime))
+                return None
+            if self._loadCb is not None:
+                # the async load's callback only comes with the next
+                # event poll, so just load the models here
+                self._loadCb.cancel()
+                self._loadCb = None
+                self._gotModels(self._loader.loadModel(self._modelPaths, okMissing = True))
+            if self._template is None:
+                self.notify.error('%s: could not load the template Actor' % (self.name))
+
+        if self._free:
+            actor = self._free.pop()
+            fromPool = True
+        else:
+            actor = self._makeActor()
+            fromPool = False
+        self._startPrewarm()
+        return self._handOut(actor, callback, extraArgs, requestTime, fromPool)
+
+    def _handOut(self, actor, callback, extraArgs, requestTime, fromPool):
+        if fromPool:
+            self.numHits += 1
+        else:
+            self.numMisses += 1
+        self._latencies.append(self._clock.getRealTime() - requestTime)
+        if callback is not None:
+            callback(actor, *extraArgs)
+            return None
+        return actor
+
+    def release(self, actor):
+        """Returns an Actor from acquire() to the pool.  It is reset for
+        reuse, or cleaned up if the pool already has enough free Actors;
+        either way, the caller should no longer use it."""
+        if len(self._free) >= self.maxFree or self._template is None:
+            actor.cleanup()
+            return
+        self.resetActor(actor)
+        self._free.append(actor)
+
+    def resetActor(self, actor):
+        """Puts a released Actor back into the state of a new copy of the
+        template.  Override this to undo any other changes your Actors
+        may have had made to them."""
+        actor.stop()
+        for lodName, partDict in actor.getPartBundleDict().items():
+            for partName, partDef in partDict.items():
+                bundle = partDef.getBundle()
+                blendSettings = self._blendSettings.get((lodName, partName))
+                if blendSettings is not None:
+                    animBlend, frameBlend, blendType = blendSettings
+                    bundle.setAnimBlendFlag(animBlend)
+                    bundle.setFrameBlendFlag(frameBlend)
+                    bundle.setBlendType(blendType)
+                # with no anims contributing, the joints return to their
+                # rest transforms on the next update
+                bundle.clearControlEffects()
+                bundle.forceUpdate()
+                partDef.partBundleNP.show()
+        if actor.hasLOD():
+            actor.resetLOD()
+        actor.detachNode()
+        actor.clearTransform()
+        actor.clearColorScale()
+        actor.show()
+
+    def getSpawnStats(self):
+        """Returns a dictionary of statistics for the recent acquire()
+        calls: how many were served from the pool (hits) or needed a new
+        Actor (misses), and the 50th, 90th and 99th percentile and
+        maximum times, in seconds, from the call until the Actor was
+        handed out."""
+        latencies = sorted(self._latencies)
+        stats = {'hits': self.numHits,
+                 'misses': self.numMisses,
+                 'free': len(self._free),
+                 }
+        for name, fraction in (('p50', .5), ('p90', .9), ('p99', .99)):
+            if latencies:
+                stats[name] = latencies[min(int(len(latencies) * fraction),
+                                            len(latencies) - 1)]
+            else:
+                stats[name] = 0.
+        stats['max'] = latencies[-1] if latencies else 0.
+        return stats
+
+    def resetSpawnStats(self):
+        self._latencies.clear()
+        self.numHits = 0
+        self.numMisses = 0
@@ -0,0 +1,211 @@
+"""AnimThrottleManager module: contains the AnimThrottleManager class.
+
+Animating a crowd of Actors costs a full joint evaluation per Actor per
+frame.  The AnimThrottleManager sorts the Actors it is given into tiers
+by their distance from the camera, and animates the farther tiers only
+every few frames, or not at all.
+"""
+
+__all__ = ['AnimThrottleManager']
+
+from panda3d.core import Point3
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.task.TaskManagerGlobal import taskMgr
+
+
+class _ThrottledActor:
+    __slots__ = ('actor', 'characters', 'numJoints', 'radius', 'interval',
+                 'phase', 'held')
+
+    def __init__(self, actor, characters, numJoints, radius):
+        self.actor = actor
+        # the Character nodes of the actor
+        self.characters = characters
+        self.numJoints = numJoints
+        self.radius = radius
+        # animate every interval frames; 1 is every frame, 0 is never
+        self.interval = 1
+        # the frame (mod interval) on which this actor is animated
+        self.phase = 0
+        # true while the actor's Characters are prevented from animating
+        self.held = False
+
+
+class AnimThrottleManager:
+    """
+    Throttles the animation of a group of Actors by distance from the
+    camera.  tiers is a list of (maxDistance, interval) pairs in
+    increasing order of distance: an Actor within maxDistance of the
+    camera (and beyond the previous tier) has its joints updated every
+    interval frames.  Actors beyond the last tier are frozen in their
+    current pose.  If scaleByRadius is true, distances are measured in
+    multiples of each Actor's bounding radius instead, so that the tiers
+    correspond to the Actor's size on screen.
+
+    Actors with the same interval are staggered across the frames, so
+    that with an interval of 4 a quarter of them are animated each frame.
+    The tiers are recomputed every retierFrames frames.
+
+    This works through the same Character mechanism as
+    Actor.setLODAnimation(), which the manager takes over for the Actors
+    it is given; removeActor() clears it again.
+    """
+    notify = directNotify.newCategory("AnimThrottleManager")
+
+    # delay factor that keeps a held Character from animating
+    HoldDelay = 1.e9
+
+    def __init__(self, tiers = ((30., 1), (60., 2), (120., 4)),
+                 camera = None, scaleByRadius = False, retierFrames = 8,
+                 taskName = 'animThrottleManager', taskSort = 40):
+        self.tiers = tuple(tiers)
+        self.camera = camera
+        self.scaleByRadius = scaleByRadius
+        self.retierFrames = retierFrames
+        self.taskName = taskName
+        # id(actor)->_ThrottledActor
+        self._actors = {}
+        # (interval, phase)->{id(actor): _ThrottledActor}, for intervals > 1
+        self._buckets = {}
+        # interval->number of actors assigned to it so far, for staggering
+        self._nextPhase = {}
+        self._frame = 0
+        # the number of joints in the actors that are held this frame
+        self._heldJoints = 0
+        self.jointsSavedLastFrame = 0
+        self.jointsSavedTotal = 0
+        self.numFrames = 0
+        taskMgr.add(self._throttleTask, self.taskName, sort = taskSort)
+
+    def destroy(self):
+        taskMgr.remove(self.taskName)
+        for actorId in list(self._actors.keys()):
+            self._release(self._actors.pop(actorId))
+        self._buckets = {}
+
+    def addActor(self, actor):
+        if id(actor) in self._actors:
+            return
+        characters = []
+        for partDict in actor.getPartBundleDict().values():
+            for partDef in partDict.values():
+                characters.append(partDef.partBundleNP.node())
+        radius = 1.
+        if self.scaleByRadius:
+            bounds = actor.getBounds()
+            if not bounds.isEmpty() and bounds.getRadius() > 0:
+                radius = bounds.getRadius()
+        self._actors[id(actor)] = _ThrottledActor(
+            actor, characters, len(actor.getJoints()), radius)
+        self._retier(self._actors[id(actor)], self._getCamera())
+
+    def removeActor(self, actor):
+        """Stops throttling the actor, which animates every frame again.
+        Call this before cleaning up an Actor that was added."""
+        info = self._actors.pop(id(actor), None)
+        if info is not None:
+            self._setInterval(info, 1)
+            info.actor.clearLODAnimation()
+
+    def hasActor(self, actor):
+        return id(actor) in self._actors
+
+    def getInterval(self, actor):
+        # returns how often the actor is currently being animated: every
+        # n frames, or 0 for frozen
+        return self._actors[id(actor)].interval
+
+    def getNumActorsByInterval(self):
+        counts = {}
+        for info in self._actors.values():
+            counts[info.interval] = counts.get(info.interval, 0) + 1
+        return counts
+
+    def getJointsSavedPerFrame(self):
+        """Returns the average number of joint evaluations skipped per
+        frame.  This counts every joint of every held Actor, so it is an
+        upper bound: an Actor that is offscreen, or whose animation has
+        not moved to a new frame, wouldn't have been evaluated anyway."""
+        if self.numFrames == 0:
+            return 0.
+        return self.jointsSavedTotal / float(self.numFrames)
+
+    def resetStats(self):
+        self.jointsSavedTotal = 0
+        self.numFrames = 0
+
+    def _getCamera(self):
+        if self.camera is None:
+            return base.cam
+        return self.camera
+
+    def _getIntervalForDistance(self, distance):
+        for maxDistance, interval in self.tiers:
+            if distance <= maxDistance:
+                return interval
+        return 0
+
+    def _retier(self, info, camera):
+        actor = info.actor
+        if actor.isEmpty():
+            # it was cleaned up without being removed
+            self._setInterval(info, 1)
+            del self._actors[id(actor)]
+            return
+        distance = actor.getDistance(camera) / info.radius
+        self._setInterval(info, self._getIntervalForDistance(distance))
+
+    def _setInterval(self, info, interval):
+        if interval == info.interval:
+            return
+        if info.interval > 1:
+            del self._buckets[(info.interval, info.phase)][id(info.actor)]
+        info.interval = interval
+        if interval > 1:
+            phase = self._nextPhase.get(interval, 0)
+            self._nextPhase[interval] = (phase + 1) % interval
+            info.phase = phase
+            self._buckets.setdefault((interval, phase), {})[id(info.actor)] = info
+            # its turn will come when its phase comes around
+            self._hold(info)
+        elif interval == 1:
+            self._release(info)
+        else:
+            self._hold(info)
+
+    def _hold(self, info):
+        if not info.held:
+            info.held = True
+            self._heldJoints += info.numJoints
+            for character in info.characters:
+                character.setLodAnimation(Point3(0, 0, 0), 1., 0., self.HoldDelay)
+
+    def _release(self, info):
+        if info.held:
+            info.held = False
+            self._heldJoints -= info.numJoints
+            for character in info.characters:
+                character.clearLodAnimation()
+
+    def _throttleTask(self, task):
+        frame = self._frame
+        if frame % self.retierFrames == 0:
+            camera = self._getCamera()
+            for info in list(self._actors.values()):
+                self._retier(info, camera)
+
+        # Hold the actors that were animated last frame, and release the
+        # ones whose turn it is this frame; the others don't change.
+        for (interval, phase), bucket in self._buckets.items():
+            if phase == (frame - 1) % interval:
+                for info in bucket.values():
+                    self._hold(info)
+            elif phase == frame % interval:
+                for info in bucket.values():
+                    self._release(info)
+
+        self.jointsSavedLastFrame = self._heldJoints
+        self.jointsSavedTotal += self._heldJoints
+        self.numFrames += 1
+        self._frame = frame + 1
+        return task.cont
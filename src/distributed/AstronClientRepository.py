@@ -109,6 +109,7 @@ class AstronClientRepository(ClientRepositoryBase):
             # updateRequiredFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cacheOwner.recordMiss()
             # Construct a new one
             classDef = dclass.getOwnerClassDef()
             if classDef == None:
@@ -1,4 +1,10 @@
 import collections
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 from panda3d.core import *
 from direct.showbase import ShowBase # __builtin__.config
@@ -12,79 +18,127 @@ from .AstronDatabaseInterface import AstronDatabaseInterface
 from .NetMessenger import NetMessenger
 
 # Helper functions for logging output:
-def msgpack_length(dg, length, fix, maxfix, tag8, tag16, tag32):
+def msgpack_encode(dg, element):
+    dg.appendData(msgpack_packb(element))
+
+# The encoders below build the MessagePack bytes of an element in a single
+# bytearray, dispatching on the element's type through a table.
+_pack_tag = struct.Struct('>B').pack
+_pack_uint8 = struct.Struct('>BB').pack
+_pack_uint16 = struct.Struct('>BH').pack
+_pack_uint32 = struct.Struct('>BI').pack
+_pack_uint64 = struct.Struct('>BQ').pack
+_pack_int8 = struct.Struct('>Bb').pack
+_pack_int16 = struct.Struct('>Bh').pack
+_pack_int32 = struct.Struct('>Bi').pack
+_pack_int64 = struct.Struct('>Bq').pack
+_pack_float64 = struct.Struct('>Bd').pack
+
+def _msgpack_length(buf, length, fix, maxfix, tag16, tag32):
     if length < maxfix:
-        dg.addUint8(fix + length)
-    elif tag8 is not None and length < 1<<8:
-        dg.addUint8(tag8)
-        dg.addUint8(length)
-    elif tag16 is not None and length < 1<<16:
-        dg.addUint8(tag16)
-        dg.addBeUint16(length)
-    elif tag32 is not None and length < 1<<32:
-        dg.addUint8(tag32)
-        dg.addBeUint32(length)
+        buf.append(fix + length)
+    elif length < 1<<16:
+        buf += _pack_uint16(tag16, length)
+    elif length < 1<<32:
+        buf += _pack_uint32(tag32, length)
     else:
         raise ValueError('Value too big for MessagePack')
 
-def msgpack_encode(dg, element):
-    if element == None:
-        dg.addUint8(0xc0)
-    elif element is False:
-        dg.addUint8(0xc2)
-    elif element is True:
-        dg.addUint8(0xc3)
-    elif isinstance(element, int):
-        if -32 <= element < 128:
-            dg.addInt8(element)
-        elif 128 <= element < 256:
-            dg.addUint8(0xcc)
-            dg.addUint8(element)
-        elif 256 <= element < 65536:
-            dg.addUint8(0xcd)
-            dg.addBeUint16(element)
-        elif 65536 <= element < (1<<32):
-            dg.addUint8(0xce)
-            dg.addBeUint32(element)
-        elif (1<<32) <= element < (1<<64):
-            dg.addUint8(0xcf)
-            dg.addBeUint64(element)
-        elif -128 <= element < -32:
-            dg.addUint8(0xd0)
-            dg.addInt8(element)
-        elif -32768 <= element < -128:
-            dg.addUint8(0xd1)
-            dg.addBeInt16(element)
-        elif -1<<31 <= element < -32768:
-            dg.addUint8(0xd2)
-            dg.addBeInt32(element)
-        elif -1<<63 <= element < -1<<31:
-            dg.addUint8(0xd3)
-            dg.addBeInt64(element)
+def _msgpack_none(buf, element):
+    buf.append(0xc0)
+
+def _msgpack_bool(buf, element):
+    buf.append(0xc3 if element else 0xc2)
+
+def _msgpack_int(buf, element):
+    if -32 <= element < 128:
+        buf.append(element & 0xff)
+    elif element >= 0:
+        if element < 256:
+            buf += _pack_uint8(0xcc, element)
+        elif element < 65536:
+            buf += _pack_uint16(0xcd, element)
+        elif element < (1<<32):
+            buf += _pack_uint32(0xce, element)
+        elif element < (1<<64):
+            buf += _pack_uint64(0xcf, element)
         else:
             raise ValueError('int out of range for msgpack: %d' % element)
-    elif isinstance(element, dict):
-        msgpack_length(dg, len(element), 0x80, 0x10, None, 0xde, 0xdf)
-        for k,v in element.items():
-            msgpack_encode(dg, k)
-            msgpack_encode(dg, v)
-    elif isinstance(element, list):
-        msgpack_length(dg, len(element), 0x90, 0x10, None, 0xdc, 0xdd)
-        for v in element:
-            msgpack_encode(dg, v)
-    elif isinstance(element, str):
-        # 0xd9 is str 8 in all recent versions of the MsgPack spec, but somehow
-        # Logstash bundles a MsgPack implementation SO OLD that this isn't
-        # handled correctly so this function avoids it too
-        msgpack_length(dg, len(element), 0xa0, 0x20, None, 0xda, 0xdb)
-        dg.appendData(element)
-    elif isinstance(element, float):
-        # Python does not distinguish between floats and doubles, so we send
-        # everything as a double in MsgPack:
-        dg.addUint8(0xcb)
-        dg.addBeFloat64(element)
+    elif element >= -128:
+        buf += _pack_int8(0xd0, element)
+    elif element >= -32768:
+        buf += _pack_int16(0xd1, element)
+    elif element >= -1<<31:
+        buf += _pack_int32(0xd2, element)
+    elif element >= -1<<63:
+        buf += _pack_int64(0xd3, element)
     else:
-        raise TypeError('Encountered non-MsgPack-packable value: %r' % element)
+        raise ValueError('int out of range for msgpack: %d' % element)
+
+def _msgpack_float(buf, element):
+    # Python does not distinguish between floats and doubles, so we send
+    # everything as a double in MsgPack:
+    buf += _pack_float64(0xcb, element)
+
+def _msgpack_str(buf, element):
+    _msgpack_bytes(buf, element.encode('utf-8'))
+
+def _msgpack_bytes(buf, element):
+    # 0xd9 is str 8 in all recent versions of the MsgPack spec, but somehow
+    # Logstash bundles a MsgPack implementation SO OLD that this isn't
+    # handled correctly so this function avoids it too
+    _msgpack_length(buf, len(element), 0xa0, 0x20, 0xda, 0xdb)
+    buf += element
+
+def _msgpack_dict(buf, element):
+    _msgpack_length(buf, len(element), 0x80, 0x10, 0xde, 0xdf)
+    encoders = _msgpack_encoders
+    for k, v in element.items():
+        (encoders.get(k.__class__) or _msgpack_other)(buf, k)
+        (encoders.get(v.__class__) or _msgpack_other)(buf, v)
+
+def _msgpack_list(buf, element):
+    _msgpack_length(buf, len(element), 0x90, 0x10, 0xdc, 0xdd)
+    encoders = _msgpack_encoders
+    for v in element:
+        (encoders.get(v.__class__) or _msgpack_other)(buf, v)
+
+def _msgpack_other(buf, element):
+    # A subclass of one of the supported types; find its encoder, and
+    # remember it for next time.
+    for cls, encoder in _msgpack_base_encoders:
+        if isinstance(element, cls):
+            _msgpack_encoders[element.__class__] = encoder
+            encoder(buf, element)
+            return
+    raise TypeError('Encountered non-MsgPack-packable value: %r' % element)
+
+_msgpack_base_encoders = (
+    (bool, _msgpack_bool),
+    (int, _msgpack_int),
+    (float, _msgpack_float),
+    (str, _msgpack_str),
+    (bytes, _msgpack_bytes),
+    (dict, _msgpack_dict),
+    (list, _msgpack_list),
+    (tuple, _msgpack_list),
+    )
+_msgpack_encoders = dict(_msgpack_base_encoders)
+_msgpack_encoders[type(None)] = _msgpack_none
+_msgpack_encoders[collections.OrderedDict] = _msgpack_dict
+
+def msgpack_packb(element):
+    """
+    Returns the MessagePack encoding of element as bytes.  This uses the
+    msgpack package if it is installed, in its old-spec mode, which
+    doesn't use the str 8 type either.
+    """
+    if msgpack is not None:
+        return msgpack.packb(element, use_bin_type=False)
+
+    buf = bytearray()
+    (_msgpack_encoders.get(element.__class__) or _msgpack_other)(buf, element)
+    return bytes(buf)
 
 class AstronInternalRepository(ConnectionRepository):
     """
@@ -132,6 +186,19 @@ class AstronInternalRepository(ConnectionRepository):
 
         self.eventLogId = self.config.GetString('eventlog-id', 'AIR:%d' % self.ourChannel)
         self.eventSocket = None
+
+        # If eventlog-batch is set, events are encoded when they are
+        # written, but queued and sent together once a frame, or as soon
+        # as eventlog-batch-kb of them are waiting.  At most
+        # eventlog-max-queue events are queued; any more are dropped.
+        self.eventLogBatch = self.config.GetBool('eventlog-batch', False)
+        self.eventLogBatchBytes = self.config.GetInt('eventlog-batch-kb', 16) * 1024
+        self.eventLogMaxQueue = self.config.GetInt('eventlog-max-queue', 10000)
+        self.eventLogQueue = []
+        self.eventLogQueueBytes = 0
+        self.numEventsSent = 0
+        self.numEventsDropped = 0
+        self.numEventFlushes = 0
         eventLogHost = self.config.GetString('eventlog-host', '')
         if eventLogHost:
             if ':' in eventLogHost:
@@ -648,15 +715,27 @@ class AstronInternalRepository(ConnectionRepository):
 
         if not host:
             self.eventSocket = None
+            self.__stopEventLogFlush()
             return
 
         address = SocketAddress()
         if not address.setHost(host, port):
             self.notify.warning('Invalid Event Log host specified: %s:%s' % (host, port))
             self.eventSocket = None
+            self.__stopEventLogFlush()
         else:
             self.eventSocket = SocketUDPOutgoing()
             self.eventSocket.InitToAddress(address)
+            if self.eventLogBatch:
+                taskMgr.remove(self.uniqueName('eventLogFlush'))
+                taskMgr.add(self.__eventLogFlushTask, self.uniqueName('eventLogFlush'), sort = 50)
+
+    def __stopEventLogFlush(self):
+        taskMgr.remove(self.uniqueName('eventLogFlush'))
+        # the queued events have nowhere to go now
+        self.numEventsDropped += len(self.eventLogQueue)
+        self.eventLogQueue = []
+        self.eventLogQueueBytes = 0
 
     def writeServerEvent(self, logtype, *args, **kwargs):
         """
@@ -667,7 +746,7 @@ class AstronInternalRepository(ConnectionRepository):
         should be used whenever such an interesting in-game event occurs.
         """
 
-        if self.eventSocket is not None:
+        if self.eventSocket is None:
             return # No event logger configured!
 
         log = collections.OrderedDict()
@@ -680,9 +759,48 @@ class AstronInternalRepository(ConnectionRepository):
 
         log.update(kwargs)
 
-        dg = PyDatagram()
-        msgpack_encode(dg, log)
-        self.eventSocket.Send(dg.getMessage())
+        data = msgpack_packb(log)
+        if not self.eventLogBatch:
+            self.eventSocket.Send(data)
+            self.numEventsSent += 1
+            return
+
+        if len(self.eventLogQueue) >= self.eventLogMaxQueue:
+            self.numEventsDropped += 1
+            return
+        self.eventLogQueue.append(data)
+        self.eventLogQueueBytes += len(data)
+        if self.eventLogQueueBytes >= self.eventLogBatchBytes:
+            self.flushServerEvents()
+
+    def flushServerEvents(self):
+        """
+        Sends the events queued by writeServerEvent(), when eventlog-batch
+        is set.  This is called once a frame, and whenever enough events
+        are waiting.
+        """
+        queue = self.eventLogQueue
+        if not queue or self.eventSocket is None:
+            return
+        self.eventLogQueue = []
+        self.eventLogQueueBytes = 0
+        # The Event Logger expects one event per packet.
+        send = self.eventSocket.Send
+        for data in queue:
+            send(data)
+        self.numEventsSent += len(queue)
+        self.numEventFlushes += 1
+
+    def __eventLogFlushTask(self, task):
+        self.flushServerEvents()
+        return task.cont
+
+    def getEventLogStats(self):
+        return {'sent': self.numEventsSent,
+                'dropped': self.numEventsDropped,
+                'queued': len(self.eventLogQueue),
+                'flushes': self.numEventFlushes,
+                }
 
     def setAI(self, doId, aiChannel):
         """
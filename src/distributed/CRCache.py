@@ -2,18 +2,35 @@
 
 from direct.directnotify import DirectNotifyGlobal
 from . import DistributedObject
+from collections import OrderedDict
+import sys
 
 class CRCache:
     notify = DirectNotifyGlobal.directNotify.newCategory("CRCache")
 
-    def __init__(self, maxCacheItems=10):
+    def __init__(self, maxCacheItems=10, maxCacheBytes=None):
         self.maxCacheItems = maxCacheItems
         self.storedCacheItems = maxCacheItems
-        self.dict = {}
-        self.fifo = []
+        # Optional budget on the estimated memory used by the cached
+        # objects, in bytes; see estimateSize().
+        self.maxCacheBytes = maxCacheBytes
+        # doId -> distObj, least recently cached first
+        self.dict = OrderedDict()
+        # doId -> estimated size of the cached object
+        self.doId2size = {}
+        self.totalBytes = 0
+        # className -> maximum number of objects of that class to cache
+        self.classLimits = {}
+        # className -> OrderedDict of doIds, least recently cached first
+        self.class2doIds = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # className -> number of objects of that class evicted
+        self.class2evictions = {}
 
     def isEmpty(self):
-        return len(self.fifo) == 0
+        return len(self.dict) == 0
 
     def flush(self):
         """
@@ -48,8 +65,10 @@ class CRCache:
                       (safeRepr(obj), itype(obj), obj.getDelayDeleteNames()))
             self.notify.error(s)
         # Null out all references to the objects so they will get gcd
-        self.dict = {}
-        self.fifo = []
+        self.dict = OrderedDict()
+        self.doId2size = {}
+        self.totalBytes = 0
+        self.class2doIds = {}
 
     def cache(self, distObj):
         # Only distributed objects are allowed in the cache
@@ -59,66 +78,165 @@ class CRCache:
         doId = distObj.getDoId()
         # Error check
         success = False
+        className = distObj.__class__.__name__
+        size = self.estimateSize(distObj)
         if doId in self.dict:
             CRCache.notify.warning("Double cache attempted for distObj "
                                    + str(doId))
+        elif (self.maxCacheItems <= 0 or
+              self.classLimits.get(className, 1) <= 0 or
+              (self.maxCacheBytes is not None and size > self.maxCacheBytes)):
+            # It would be evicted again straight away, so don't cache it
+            # at all; the caller deletes it instead.
+            pass
         else:
             # Call disable on the distObj
             distObj.disableAndAnnounce()
 
-            # Put the distObj in the fifo and the dict
-            self.fifo.append(distObj)
+            # Put the distObj at the most recent end of the cache
             self.dict[doId] = distObj
+            self.class2doIds.setdefault(className, OrderedDict())[doId] = None
+            self.doId2size[doId] = size
+            self.totalBytes += size
 
             success = True
 
-            if len(self.fifo) > self.maxCacheItems:
-                # if the cache is full, pop the oldest item
-                oldestDistObj = self.fifo.pop(0)
-                # and remove it from the dictionary
-                del(self.dict[oldestDistObj.getDoId()])
-                # and delete it
-                oldestDistObj.deleteOrDelay()
-                if oldestDistObj.getDelayDeleteCount() <= 0:
-                    # make sure we're not leaking
-                    oldestDistObj.detectLeaks()
-
-        # Make sure that the fifo and the dictionary are sane
-        assert len(self.dict) == len(self.fifo)
+            # if there are too many objects of this class, evict the
+            # oldest of them
+            classLimit = self.classLimits.get(className)
+            if classLimit is not None:
+                classDoIds = self.class2doIds[className]
+                while len(classDoIds) > classLimit:
+                    self._evict(next(iter(classDoIds)))
+
+            # if the cache is full, evict the oldest items
+            while (len(self.dict) > self.maxCacheItems or
+                   (self.maxCacheBytes is not None and
+                    self.totalBytes > self.maxCacheBytes and
+                    len(self.dict))):
+                self._evict(next(iter(self.dict)))
+
+        # Make sure that the dictionaries are sane
+        assert len(self.dict) == len(self.doId2size)
         return success
 
     def retrieve(self, doId):
         assert self.checkCache()
-        if doId in self.dict:
-            # Find the object
-            distObj = self.dict[doId]
-            # Remove it from the dictionary
-            del(self.dict[doId])
-            # Remove it from the fifo
-            self.fifo.remove(distObj)
-            # return the distObj
-            return distObj
-        else:
+        distObj = self._remove(doId)
+        if distObj is None:
             # If you can't find it, return None
-            return None
+            self.misses += 1
+        else:
+            self.hits += 1
+        return distObj
 
     def contains(self, doId):
         return doId in self.dict
 
+    def recordMiss(self):
+        # called by the repositories when they generate an object that
+        # wasn't in the cache, since they check contains() rather than
+        # calling retrieve() for it
+        self.misses += 1
+
     def delete(self, doId):
         assert self.checkCache()
         assert doId in self.dict
-        # Look it up
-        distObj = self.dict[doId]
-        # Remove it from the dict and fifo
-        del(self.dict[doId])
-        self.fifo.remove(distObj)
+        # Look it up and remove it from the cache
+        distObj = self._remove(doId)
         # and delete it
         distObj.deleteOrDelay()
         if distObj.getDelayDeleteCount() <= 0:
             # make sure we're not leaking
             distObj.detectLeaks()
 
+    def _remove(self, doId):
+        # removes the object from all of the cache's tables and returns it,
+        # or returns None if it isn't cached
+        distObj = self.dict.pop(doId, None)
+        if distObj is not None:
+            self.totalBytes -= self.doId2size.pop(doId)
+            className = distObj.__class__.__name__
+            classDoIds = self.class2doIds[className]
+            del classDoIds[doId]
+            if len(classDoIds) == 0:
+                del self.class2doIds[className]
+        return distObj
+
+    def _evict(self, doId):
+        distObj = self._remove(doId)
+        self.evictions += 1
+        className = distObj.__class__.__name__
+        self.class2evictions[className] = self.class2evictions.get(className, 0) + 1
+        # and delete it
+        distObj.deleteOrDelay()
+        if distObj.getDelayDeleteCount() <= 0:
+            # make sure we're not leaking
+            distObj.detectLeaks()
+
+    def estimateSize(self, distObj):
+        """
+        Returns the approximate number of bytes held by the object.  A
+        class may define getCacheSize() to report its own size (e.g. to
+        account for the geometry it holds); otherwise this is a shallow
+        estimate of the object and its attributes.
+        """
+        if hasattr(distObj, 'getCacheSize'):
+            return distObj.getCacheSize()
+        size = sys.getsizeof(distObj)
+        attrs = getattr(distObj, '__dict__', None)
+        if attrs is not None:
+            size += sys.getsizeof(attrs)
+            for value in attrs.values():
+                size += sys.getsizeof(value)
+        return size
+
+    def setMaxCacheBytes(self, maxCacheBytes):
+        # None removes the memory budget
+        self.maxCacheBytes = maxCacheBytes
+
+    def setClassLimit(self, className, maxItems):
+        # None removes the limit for the class
+        if maxItems is None:
+            self.classLimits.pop(className, None)
+        else:
+            self.classLimits[className] = maxItems
+
+    def getStats(self):
+        return {'items': len(self.dict),
+                'bytes': self.totalBytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                }
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.class2evictions = {}
+
+    def report(self):
+        # returns a human-readable breakdown of the cache contents by class
+        s = 'CRCache: %s/%s items' % (len(self.dict), self.maxCacheItems)
+        if self.maxCacheBytes is None:
+            s += ', %s bytes' % self.totalBytes
+        else:
+            s += ', %s/%s bytes' % (self.totalBytes, self.maxCacheBytes)
+        s += ', %s hits, %s misses, %s evictions' % (
+            self.hits, self.misses, self.evictions)
+        classNames = set(self.class2doIds.keys())
+        classNames.update(self.class2evictions.keys())
+        for className in sorted(classNames):
+            doIds = self.class2doIds.get(className, ())
+            size = sum(self.doId2size[doId] for doId in doIds)
+            s += '\n  %s: %s items, %s bytes, %s evictions' % (
+                className, len(doIds), size,
+                self.class2evictions.get(className, 0))
+            if className in self.classLimits:
+                s += ' (limit %s)' % self.classLimits[className]
+        return s
+
     def checkCache(self):
         # For debugging; this verifies that the cache is sensible and
         # returns true if so.
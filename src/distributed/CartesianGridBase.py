@@ -1,7 +1,16 @@
 from panda3d.core import Vec3
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 # Utility functions that are useful to both AI and client CartesianGrid code
 
 class CartesianGridBase:
+    # below this many positions, getZonesFromXY doesn't bother with numpy
+    NumpyBatchThreshold = 64
+
     def isValidZone(self, zoneId):
         def checkBounds(self=self, zoneId=zoneId):
             if ((zoneId < self.startingZone) or
@@ -34,6 +43,32 @@ class CartesianGridBase:
         else:
             return zoneId
 
+    def getZonesFromXY(self, xs, ys):
+        # Batched version of getZoneFromXYZ: takes parallel sequences of x
+        # and y positions relative to our own grid origin, and returns a
+        # list of their zoneIds.  Uses numpy when it is available.
+        cellWidth = self.cellWidth
+        gridSize = self.gridSize
+        startingZone = self.startingZone
+        dx = cellWidth * gridSize * .5
+        if numpy is not None and len(xs) >= self.NumpyBatchThreshold:
+            cols = numpy.floor_divide(numpy.asarray(xs, dtype=numpy.float64) + dx, cellWidth)
+            rows = numpy.floor_divide(numpy.asarray(ys, dtype=numpy.float64) + dx, cellWidth)
+            return (startingZone + (rows * gridSize + cols)).astype(numpy.int64).tolist()
+        return [int(startingZone + (((y + dx) // cellWidth) * gridSize + ((x + dx) // cellWidth)))
+                for x, y in zip(xs, ys)]
+
+    def getZoneChanges(self, objIds, xs, ys, lastZoneIds):
+        # Computes the zones for a batch of objects (see getZonesFromXY)
+        # and returns a list of (objId, newZoneId) for just those objects
+        # whose zone differs from the one computed for them last time,
+        # given by the parallel sequence lastZoneIds (None for an object
+        # that has no zone computed yet).
+        newZoneIds = self.getZonesFromXY(xs, ys)
+        return [(objId, newZoneId)
+                for objId, lastZoneId, newZoneId in zip(objIds, lastZoneIds, newZoneIds)
+                if lastZoneId != newZoneId]
+
     def getGridSizeFromSphereRadius(self, sphereRadius, cellWidth, gridRadius):
         # NOTE: This ensures that the grid is at least a "gridRadius" number
         # of cells larger than the trigger sphere that loads the grid.  This
@@ -90,6 +125,19 @@ class CartesianGridBase:
     # Returns:
     #--------------------------------------------------------------------------
     def getConcentricZones(self, zoneId, radius):
+        # The result only depends on the grid layout, so it is cached per
+        # (zoneId, radius); a copy is returned since callers may modify it.
+        cache = getattr(self, '_concentricZoneCache', None)
+        layout = (self.startingZone, self.gridSize)
+        if cache is None or cache[0] != layout:
+            cache = self._concentricZoneCache = (layout, {})
+        zones = cache[1].get((zoneId, radius))
+        if zones is None:
+            zones = self._computeConcentricZones(zoneId, radius)
+            cache[1][(zoneId, radius)] = zones
+        return list(zones)
+
+    def _computeConcentricZones(self, zoneId, radius):
         zones = []
         #currZone = zoneId + radius
         #numZones = (2 * radius * 8) + 2
@@ -246,6 +246,7 @@ class ClientRepositoryBase(ConnectionRepository):
             # updateRequiredFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cache.recordMiss()
             # Construct a new one
             classDef = dclass.getClassDef()
             if classDef == None:
@@ -294,6 +295,7 @@ class ClientRepositoryBase(ConnectionRepository):
             # updateRequiredOtherFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cache.recordMiss()
             # Construct a new one
             classDef = dclass.getClassDef()
             if classDef == None:
@@ -337,6 +339,7 @@ class ClientRepositoryBase(ConnectionRepository):
             # updateRequiredOtherFields calls announceGenerate
         else:
             # ...it is not in the dictionary or the cache.
+            self.cacheOwner.recordMiss()
             # Construct a new one
             classDef = dclass.getOwnerClassDef()
             if classDef == None:
@@ -22,6 +22,11 @@ class DistributedCartesianGridAI(DistributedNodeAI, CartesianGridBase):
 
         # Keep track of all AI objects added to the grid
         self.gridObjects = {}
+        # avId->the zone last computed from the object's position by
+        # updateGridTask; an object is only moved to another zone when
+        # this changes, so that a zone given to addObjectToGrid sticks
+        # until the object leaves its cell
+        self.gridZoneIds = {}
         self.updateTaskStarted = 0
 
     def delete(self):
@@ -52,6 +57,7 @@ class DistributedCartesianGridAI(DistributedNodeAI, CartesianGridBase):
         #gridParent = self.attachNewNode("gridParent-%s" % avId)
         #self.gridParents[avId] = gridParent
         self.gridObjects[avId] = av
+        self.gridZoneIds[avId] = self.getZoneFromXYZ(av.getPos(self))
 
         # Put the avatar on the grid
         self.handleAvatarZoneChange(av, useZoneId)
@@ -68,6 +74,7 @@ class DistributedCartesianGridAI(DistributedNodeAI, CartesianGridBase):
         avId = av.doId
         if avId in self.gridObjects:
             del self.gridObjects[avId]
+        self.gridZoneIds.pop(avId, None)
 
         # Stop task if there are no more av's being managed
         if len(self.gridObjects) == 0:
@@ -95,20 +102,28 @@ class DistributedCartesianGridAI(DistributedNodeAI, CartesianGridBase):
         self.updateTaskStarted = 0
 
     def updateGridTask(self, task=None):
-        # Run through all grid objects and update their parents if needed
-        missingObjs = []
-        for avId in self.gridObjects.keys():
-            av = self.gridObjects[avId]
+        # Run through all grid objects and update their parents if needed.
+        # The zones are computed for all the objects at once, and only
+        # the objects that have moved into another cell since the last
+        # pass are handled.
+        avIds = []
+        xs = []
+        ys = []
+        lastZoneIds = []
+        for avId, av in list(self.gridObjects.items()):
             # handle a missing object after it is already gone?
             if (av.isEmpty()):
-                task.setDelay(1.0)
                 del self.gridObjects[avId]
+                self.gridZoneIds.pop(avId, None)
                 continue
-            pos = av.getPos()
-            if ((pos[0] < 0 or pos[1] < 0) or
-                (pos[0] > self.cellWidth or pos[1] > self.cellWidth)):
-                # we are out of the bounds of this current cell
-                self.handleAvatarZoneChange(av)
+            pos = av.getPos(self)
+            avIds.append(avId)
+            xs.append(pos[0])
+            ys.append(pos[1])
+            lastZoneIds.append(self.gridZoneIds.get(avId))
+        for avId, zoneId in self.getZoneChanges(avIds, xs, ys, lastZoneIds):
+            self.gridZoneIds[avId] = zoneId
+            self.handleAvatarZoneChange(self.gridObjects[avId], zoneId)
         # Do this every second, not every frame
         if (task):
             task.setDelay(1.0)
@@ -23,6 +23,8 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
 
     def disable(self):
         if self.activeState != DistributedObject.ESDisabled:
+            if self.cr.spatialIndex is not None:
+                self.cr.spatialIndex.remove(self.doId)
             if not self.isEmpty():
                 self.reparentTo(hidden)
             DistributedObject.DistributedObject.disable(self)
@@ -42,6 +44,14 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
         DistributedObject.DistributedObject.generate(self)
         self.gotStringParentToken = 0
 
+    def updateSpatialIndex(self):
+        # Records the node's current position in the repository's spatial
+        # index, if it has one.  DistributedSmoothNode calls this as it
+        # moves; other nodes should call it after they are repositioned.
+        spatialIndex = self.cr.spatialIndex
+        if spatialIndex is not None and not self.isEmpty():
+            spatialIndex.updateNode(self.doId, self)
+
     def setLocation(self, parentId, zoneId, teleport=0):
         # Redefine DistributedObject setLocation, so that when
         # location is set to the ocean grid, we can update our parenting
@@ -62,6 +72,7 @@ class DistributedNode(DistributedObject.DistributedObject, NodePath):
             if self.gridParent:
                 self.gridParent.delete()
                 self.gridParent = None
+        self.updateSpatialIndex()
 
     def __cmp__(self, other):
         # DistributedNode inherits from NodePath, which inherits a
@@ -5,6 +5,8 @@ from panda3d.direct import *
 from .ClockDelta import *
 from . import DistributedNode
 from . import DistributedSmoothNodeBase
+from . import SmoothingManager
+from .SmoothingManager import BatchSmoothing, getSmoothingManager
 from direct.task.Task import cont
 from direct.showbase import DConfig as config
 
@@ -125,6 +127,8 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
         if self.smoother.computeSmoothPosition():
             self.smoother.applySmoothPos(self)
             self.smoother.applySmoothHpr(self)
+            if self.cr.spatialIndex is not None:
+                self.updateSpatialIndex()
         elif self.stopped:
             self.fullyStopped = True
 
@@ -150,7 +154,11 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
             taskName = self.taskName("smooth")
             taskMgr.remove(taskName)
             self.reloadPosition()
-            taskMgr.add(self.doSmoothTask, taskName)
+            if BatchSmoothing.getValue():
+                # smoothed along with the other nodes, from one task
+                getSmoothingManager().addNode(self)
+            else:
+                taskMgr.add(self.doSmoothTask, taskName)
             self.smoothStarted = 1
 
     def stopSmooth(self):
@@ -161,6 +169,8 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
         if self.smoothStarted:
             taskName = self.taskName("smooth")
             taskMgr.remove(taskName)
+            if SmoothingManager.smoothingMgr is not None:
+                SmoothingManager.smoothingMgr.removeNode(self)
             self.forceToTruePosition()
             self.smoothStarted = 0
 
@@ -179,6 +189,7 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
         if (not self.isLocal()) and \
            self.smoother.getLatestPosition():
             self.smoother.applySmoothPosHpr(self, self)
+            self.updateSpatialIndex()
         self.smoother.clearPositions(1)
 
     def reloadPosition(self):
@@ -394,6 +405,8 @@ class DistributedSmoothNode(DistributedNode.DistributedNode,
         if not self.localControl and not self.smoothStarted and \
            self.smoother.getLatestPosition():
             self.smoother.applySmoothPosHpr(self, self)
+            if self.cr.spatialIndex is not None:
+                self.updateSpatialIndex()
 
     # These are all required by the CMU server, which requires get* to
     # match set* in more cases than the Disney server does.
@@ -4,6 +4,7 @@ from .ClockDelta import *
 from direct.task import Task
 from direct.showbase.PythonUtil import randFloat, Enum
 from panda3d.direct import CDistributedSmoothNodeBase
+from .PosHprBroadcastScheduler import ScheduleBroadcasts, getPosHprBroadcastScheduler
 
 class DummyTaskClass:
     def setDelay(self, blah):
@@ -18,6 +19,9 @@ class DistributedSmoothNodeBase:
 
     def __init__(self):
         self.__broadcastPeriod = None
+        # true while our broadcasts are sent by the
+        # PosHprBroadcastScheduler instead of our own task
+        self.__scheduled = False
         self.cnode = None
 
     def generate(self):
@@ -48,6 +52,8 @@ class DistributedSmoothNodeBase:
     def setPosHprBroadcastPeriod(self, period):
         # call this at any time to change the delay between broadcasts
         self.__broadcastPeriod = period
+        if self.__scheduled:
+            getPosHprBroadcastScheduler().setPeriod(self, period)
 
     def getPosHprBroadcastPeriod(self):
         # query the current delay between broadcasts
@@ -55,6 +61,9 @@ class DistributedSmoothNodeBase:
 
     def stopPosHprBroadcast(self):
         taskMgr.remove(self.getPosHprBroadcastTaskName())
+        if self.__scheduled:
+            getPosHprBroadcastScheduler().removeObject(self)
+            self.__scheduled = False
         # Delete this callback because it maintains a reference to self
         self.d_broadcastPosHpr = None
 
@@ -97,6 +106,18 @@ class DistributedSmoothNodeBase:
 
         # remove any old tasks
         taskMgr.remove(taskName)
+        if self.__scheduled:
+            getPosHprBroadcastScheduler().removeObject(self)
+            self.__scheduled = False
+        if self.wantSmoothPosBroadcastTask() and ScheduleBroadcasts.getValue():
+            # the scheduler spreads the broadcasts out itself, so stagger
+            # isn't needed
+            # the AI's repository is self.air, the client's is self.cr
+            repository = getattr(self, 'air', None) or getattr(self, 'cr', None)
+            getPosHprBroadcastScheduler(repository).addObject(
+                self, self.__broadcastPeriod, self.d_broadcastPosHpr)
+            self.__scheduled = True
+            return
         # spawn the new task
         delay = 0.
         if stagger:
@@ -1,4 +1,7 @@
 from direct.distributed import DoHierarchy
+from direct.distributed.DoTable import DoTable
+from direct.distributed.SpatialGrid import SpatialGrid
+from direct.showbase import DConfig as config
 import re
 
 #hack:
@@ -9,17 +12,21 @@ BAD_CHANNEL_ID = 0 # 0xFFFFFFFFFFFFFFFF
 class DoCollectionManager:
     def __init__(self):
         # Dict of {DistributedObject ids: DistributedObjects}
-        self.doId2do = {}
+        # also indexed by class and dclass, see DoTable
+        self.doId2do = DoTable()
         # (parentId, zoneId) to dict of doId->DistributedObjectAI
         ## self.zoneId2doIds={}
         if self.hasOwnerView():
             # Dict of {DistributedObject ids: DistributedObjects}
             # for 'owner' views of objects
-            self.doId2ownerView = {}
+            self.doId2ownerView = DoTable()
         # Dict of {
         #   parent DistributedObject id:
         #     { zoneIds: [child DistributedObject ids] }}
         self._doHierarchy = DoHierarchy.DoHierarchy()
+        # optional spatial index over the positions of DistributedNodes,
+        # see enableSpatialIndex()
+        self.spatialIndex = None
 
     def getDo(self, doId):
         return self.doId2do.get(doId)
@@ -93,33 +100,23 @@ class DoCollectionManager:
         return matches, len(matches)
 
     def doFindAllInstances(self, cls):
-        matches = []
-        for value in self.doId2do.values():
-            if isinstance(value, cls):
-                matches.append(value)
-        return matches
+        return self.doId2do.getDosOfClass(cls)
 
     def _getDistanceFromLA(self, do):
         if hasattr(do, 'getPos'):
             return do.getPos(localAvatar).length()
         return None
 
-    def _compareDistance(self, do1, do2):
-        dist1 = self._getDistanceFromLA(do1)
-        dist2 = self._getDistanceFromLA(do2)
-        if dist1 is None and dist2 is None:
-            return 0
-        if dist1 is None:
-            return 1
-        if dist2 is None:
-            return -1
-        if (dist1 < dist2):
-            return -1
-        return 1
+    def _getDistanceSortKey(self, do):
+        # objects without a position sort after all the others
+        dist = self._getDistanceFromLA(do)
+        if dist is None:
+            return (1, 0.)
+        return (0, dist)
 
     def dosByDistance(self):
         objs = list(self.doId2do.values())
-        objs.sort(cmp=self._compareDistance)
+        objs.sort(key=self._getDistanceSortKey)
         return objs
 
     def doByDistance(self):
@@ -128,6 +125,54 @@ class DoCollectionManager:
             print('%s\t%s\t%s' % (obj.doId, self._getDistanceFromLA(obj),
                                   obj.dclass.getName()))
 
+    def enableSpatialIndex(self, cellSize=None, referenceNode=None):
+        """
+        Starts maintaining a SpatialGrid over the positions of the
+        DistributedNodes in the repository, measured relative to
+        referenceNode (render by default), for use by getNearest() and
+        getWithinRadius().  DistributedSmoothNodes keep their entries up
+        to date as they move; other DistributedNodes should call
+        updateSpatialIndex() after they are repositioned.
+        """
+        if cellSize is None:
+            cellSize = config.GetFloat('spatial-index-cell-size', 100.)
+        if referenceNode is None:
+            referenceNode = render
+        self.spatialIndex = SpatialGrid(cellSize, referenceNode)
+        for do in self.doId2do.values():
+            if hasattr(do, 'updateSpatialIndex'):
+                do.updateSpatialIndex()
+
+    def disableSpatialIndex(self):
+        self.spatialIndex = None
+
+    def _getQueryPos(self, pos):
+        if pos is None:
+            pos = localAvatar.getPos(self.spatialIndex.referenceNode)
+        return pos[0], pos[1], pos[2]
+
+    def getNearest(self, n, pos=None, maxRadius=None):
+        """
+        Returns the n DistributedNodes nearest to pos (the local avatar's
+        position by default), nearest first.  Requires enableSpatialIndex().
+        """
+        assert self.spatialIndex is not None
+        x, y, z = self._getQueryPos(pos)
+        return [self.doId2do[doId] for doId in
+                self.spatialIndex.getNearest(x, y, z, n, maxRadius)
+                if doId in self.doId2do]
+
+    def getWithinRadius(self, radius, pos=None, sort=True):
+        """
+        Returns the DistributedNodes within radius of pos (the local
+        avatar's position by default).  Requires enableSpatialIndex().
+        """
+        assert self.spatialIndex is not None
+        x, y, z = self._getQueryPos(pos)
+        return [self.doId2do[doId] for doId in
+                self.spatialIndex.getWithinRadius(x, y, z, radius, sort)
+                if doId in self.doId2do]
+
     if __debug__:
         def printObjects(self):
             format="%10s %10s %10s %30s %20s"
@@ -215,8 +260,12 @@ class DoCollectionManager:
             for i in self.getDoIdList(parentId, zoneId, classType)]
 
     def getDoIdList(self, parentId, zoneId=None, classType=None):
-        return self._doHierarchy.getDoIds(self.getDo,
-                                          parentId, zoneId, classType)
+        doIds = self._doHierarchy.getDoIds(self.getDo, parentId, zoneId)
+        if classType is not None:
+            # filter using the class index rather than isinstance
+            hasDoIdOfClass = self.doId2do.hasDoIdOfClass
+            doIds = [doId for doId in doIds if hasDoIdOfClass(doId, classType)]
+        return doIds
 
     def hasOwnerViewDoId(self, doId):
         assert self.hasOwnerView()
@@ -224,47 +273,43 @@ class DoCollectionManager:
 
     def getOwnerViewDoList(self, classType):
         assert self.hasOwnerView()
-        l = []
-        for obj in self.doId2ownerView.values():
-            if isinstance(obj, classType):
-                l.append(obj)
-        return l
+        return self.doId2ownerView.getDosOfClass(classType)
 
     def getOwnerViewDoIdList(self, classType):
         assert self.hasOwnerView()
-        l = []
-        for doId, obj in self.doId2ownerView.items():
-            if isinstance(obj, classType):
-                l.append(doId)
-        return l
+        return self.doId2ownerView.getDoIdsOfClass(classType)
 
     def countObjects(self, classType):
         """
         Counts the number of objects of the given type in the
         repository (for testing purposes)
         """
-        count = 0
-        for dobj in self.doId2do.values():
-            if isinstance(dobj, classType):
-                count += 1
-        return count
+        return self.doId2do.countDosOfClass(classType)
 
 
     def getAllOfType(self, type):
         # Returns a list of all DistributedObjects in the repository
         # of a particular type.
-        result = []
-        for obj in self.doId2do.values():
-            if isinstance(obj, type):
-                result.append(obj)
-        return result
+        return self.doId2do.getDosOfClass(type)
+
+    def getAllOfDclass(self, dclassName):
+        # Returns a list of all DistributedObjects in the repository
+        # whose dclass has the given name.
+        return self.doId2do.getDosOfDclass(dclassName)
 
     def findAnyOfType(self, type):
         # Searches the repository for any object of the given type.
-        for obj in self.doId2do.values():
-            if isinstance(obj, type):
-                return obj
-        return None
+        return self.doId2do.findAnyOfClass(type)
+
+    def checkDoTables(self):
+        """
+        For debugging and tests: verifies that the class and dclass
+        indexes of the doId tables are consistent with their contents.
+        """
+        self.doId2do.checkIndexes()
+        if self.hasOwnerView():
+            self.doId2ownerView.checkIndexes()
+        return 1
 
     #----------------------------------
 
@@ -0,0 +1,186 @@
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+class DoTable(dict):
+    """
+    A doId->distributed object dictionary that also indexes its objects by
+    Python class and by dclass name.  The indexes are kept up to date on
+    every insertion and removal, so that queries by type are dictionary
+    lookups instead of isinstance scans over every object in the table.
+    Reads are plain dict reads.
+    """
+    notify = directNotify.newCategory("DoTable")
+
+    def __init__(self):
+        dict.__init__(self)
+        # class->doId->distObj, by the exact class of each object
+        self._class2dos = {}
+        # dclassName->doId->distObj
+        self._dclassName2dos = {}
+        # doId->dclassName the object was indexed under
+        self._doId2dclassName = {}
+        # queried class->list of indexed classes that are subclasses of it;
+        # cleared whenever a class is added to or removed from the index
+        self._subclassCache = {}
+
+    def __setitem__(self, doId, do):
+        if doId in self:
+            self._unindex(doId, dict.__getitem__(self, doId))
+        dict.__setitem__(self, doId, do)
+        self._index(doId, do)
+
+    def __delitem__(self, doId):
+        do = dict.__getitem__(self, doId)
+        dict.__delitem__(self, doId)
+        self._unindex(doId, do)
+
+    def pop(self, doId, *args):
+        if doId not in self:
+            return dict.pop(self, doId, *args)
+        do = dict.pop(self, doId)
+        self._unindex(doId, do)
+        return do
+
+    def popitem(self):
+        doId, do = dict.popitem(self)
+        self._unindex(doId, do)
+        return doId, do
+
+    def setdefault(self, doId, do=None):
+        if doId not in self:
+            self[doId] = do
+        return dict.__getitem__(self, doId)
+
+    def update(self, *args, **kwArgs):
+        for doId, do in dict(*args, **kwArgs).items():
+            self[doId] = do
+
+    def clear(self):
+        dict.clear(self)
+        self._class2dos.clear()
+        self._dclassName2dos.clear()
+        self._doId2dclassName.clear()
+        self._subclassCache.clear()
+
+    def _getDclassName(self, do):
+        dclass = getattr(do, 'dclass', None)
+        if dclass is None:
+            return None
+        return dclass.getName()
+
+    def _index(self, doId, do):
+        cls = do.__class__
+        dos = self._class2dos.get(cls)
+        if dos is None:
+            dos = self._class2dos[cls] = {}
+            self._subclassCache.clear()
+        dos[doId] = do
+        dclassName = self._getDclassName(do)
+        self._dclassName2dos.setdefault(dclassName, {})[doId] = do
+        self._doId2dclassName[doId] = dclassName
+
+    def _unindex(self, doId, do):
+        cls = do.__class__
+        dos = self._class2dos[cls]
+        del dos[doId]
+        if len(dos) == 0:
+            del self._class2dos[cls]
+            self._subclassCache.clear()
+        # use the dclass name the object was indexed under, in case its
+        # dclass has changed since
+        dclassName = self._doId2dclassName.pop(doId)
+        dos = self._dclassName2dos[dclassName]
+        del dos[doId]
+        if len(dos) == 0:
+            del self._dclassName2dos[dclassName]
+
+    def _getIndexedSubclasses(self, classType):
+        # returns the indexed classes for which isinstance(obj, classType)
+        # holds; classType may also be a tuple of classes
+        classes = self._subclassCache.get(classType)
+        if classes is None:
+            classes = [cls for cls in self._class2dos
+                       if issubclass(cls, classType)]
+            self._subclassCache[classType] = classes
+        return classes
+
+    def getDosOfClass(self, classType):
+        """
+        Returns a list of the objects that are instances of classType.
+        """
+        result = []
+        for cls in self._getIndexedSubclasses(classType):
+            result.extend(self._class2dos[cls].values())
+        return result
+
+    def getDoIdsOfClass(self, classType):
+        """
+        Returns a list of the doIds of the objects that are instances of
+        classType.
+        """
+        result = []
+        for cls in self._getIndexedSubclasses(classType):
+            result.extend(self._class2dos[cls].keys())
+        return result
+
+    def countDosOfClass(self, classType):
+        count = 0
+        for cls in self._getIndexedSubclasses(classType):
+            count += len(self._class2dos[cls])
+        return count
+
+    def findAnyOfClass(self, classType):
+        for cls in self._getIndexedSubclasses(classType):
+            for do in self._class2dos[cls].values():
+                return do
+        return None
+
+    def hasDoIdOfClass(self, doId, classType):
+        do = self.get(doId)
+        return do is not None and do.__class__ in self._getIndexedSubclasses(classType)
+
+    def getDosOfDclass(self, dclassName):
+        """
+        Returns a list of the objects whose dclass has the given name.
+        """
+        return list(self._dclassName2dos.get(dclassName, {}).values())
+
+    def checkIndexes(self):
+        """
+        For debugging and tests: verifies that the indexes agree with the
+        contents of the table, and returns true if so.
+        """
+        numIndexed = 0
+        for cls, dos in self._class2dos.items():
+            if len(dos) == 0:
+                self.notify.error('empty index for class %s' % cls.__name__)
+            for doId, do in dos.items():
+                if dict.get(self, doId) is not do:
+                    self.notify.error('class index has stale doId %s (%s)' % (
+                        doId, cls.__name__))
+                if do.__class__ is not cls:
+                    self.notify.error('doId %s indexed under %s but is a %s' % (
+                        doId, cls.__name__, do.__class__.__name__))
+            numIndexed += len(dos)
+        if numIndexed != len(self):
+            self.notify.error('class index holds %s objects, table holds %s' % (
+                numIndexed, len(self)))
+        numIndexed = 0
+        for dclassName, dos in self._dclassName2dos.items():
+            if len(dos) == 0:
+                self.notify.error('empty index for dclass %s' % dclassName)
+            for doId, do in dos.items():
+                if dict.get(self, doId) is not do:
+                    self.notify.error('dclass index has stale doId %s (%s)' % (
+                        doId, dclassName))
+                if self._doId2dclassName.get(doId) != dclassName:
+                    self.notify.error('doId %s indexed under dclass %s' % (
+                        doId, dclassName))
+            numIndexed += len(dos)
+        if numIndexed != len(self) or len(self._doId2dclassName) != len(self):
+            self.notify.error('dclass index holds %s objects, table holds %s' % (
+                numIndexed, len(self)))
+        for classType, classes in self._subclassCache.items():
+            if classes != [cls for cls in self._class2dos
+                           if issubclass(cls, classType)]:
+                self.notify.error('stale subclass cache for %s' % (classType, ))
+        return 1
@@ -0,0 +1,257 @@
+"""PosHprBroadcastScheduler module: contains the PosHprBroadcastScheduler
+class.
+
+Each DistributedSmoothNode(AI) that broadcasts its position normally
+runs its own doMethodLater task, so thousands of broadcasting objects
+means thousands of task dispatches per second.  The
+PosHprBroadcastScheduler broadcasts all of them from a single task
+instead.  Set smooth-broadcast-scheduler to use it, and
+smooth-broadcast-bundle-channel to send each frame's broadcasts as one
+message bundle.
+"""
+
+__all__ = ['PosHprBroadcastScheduler', 'getPosHprBroadcastScheduler']
+
+from panda3d.core import ClockObject, ConfigVariableBool, ConfigVariableInt
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.task.TaskManagerGlobal import taskMgr
+
+ScheduleBroadcasts = ConfigVariableBool('smooth-broadcast-scheduler', False,
+    'Set this true to send the position broadcasts of all '
+    'DistributedSmoothNodes from a single task, instead of a task for '
+    'each node.')
+
+BundleChannel = ConfigVariableInt('smooth-broadcast-bundle-channel', 0,
+    'If this is nonzero, and the repository has want-message-bundling '
+    'set, the broadcasts that smooth-broadcast-scheduler sends in a frame '
+    'are packed into one message bundle, sent to this channel.')
+
+
+class _Broadcaster:
+    __slots__ = ('obj', 'func', 'group', 'index')
+
+    def __init__(self, obj, func):
+        self.obj = obj
+        # the cnode's broadcastPosHpr* method
+        self.func = func
+        # the _PeriodGroup the broadcaster is in, and its index there
+        self.group = None
+        self.index = 0
+
+
+class _PeriodGroup:
+    __slots__ = ('period', 'broadcasters', 'cursor', 'credit')
+
+    def __init__(self, period):
+        self.period = period
+        self.broadcasters = []
+        # the index of the next broadcaster to send
+        self.cursor = 0
+        # the number of broadcasts owed, including the fraction of one
+        # carried over from the previous frame
+        self.credit = 0.
+
+
+class PosHprBroadcastScheduler:
+    """
+    Sends the position broadcasts of the objects it is given.  Objects
+    with the same broadcast period are grouped together, and each frame
+    the next few objects of each group are broadcast in turn, so that
+    each object is still broadcast once per period but the broadcasts
+    are spread evenly over the frames of the period.
+
+    The cnode only sends a message when the object has moved (or one
+    stop message once it stops), and the scheduler counts the
+    broadcasts that were sent and those that were suppressed because
+    nothing changed.
+
+    If a repository is given, and its message bundling is enabled, all
+    the messages sent in a frame are packed into one message bundle,
+    sent to bundleChannel.  Otherwise the messages of a frame are still
+    sent together, so collect-tcp can combine them.  The global scheduler
+    takes its repository from the first object added to it, and its
+    bundleChannel from smooth-broadcast-bundle-channel; setRepository()
+    changes either.
+
+    DistributedSmoothNodeBase.startPosHprBroadcast() and
+    stopPosHprBroadcast() add and remove the object when
+    smooth-broadcast-scheduler is set.
+    """
+    notify = directNotify.newCategory("PosHprBroadcastScheduler")
+
+    def __init__(self, repository = None, bundleChannel = None,
+                 taskName = 'posHprBroadcastScheduler', taskSort = 0):
+        self.repository = repository
+        self.bundleChannel = bundleChannel
+        self.taskName = taskName
+        self.taskSort = taskSort
+        self.clock = ClockObject.getGlobalClock()
+        # id(obj)->_Broadcaster
+        self._broadcasters = {}
+        # period->_PeriodGroup
+        self._groups = {}
+        self._lastTime = None
+        self.taskRunning = False
+        self.numSent = 0
+        self.numSuppressed = 0
+        self.numBundles = 0
+
+    def destroy(self):
+        taskMgr.remove(self.taskName)
+        self.taskRunning = False
+        self._broadcasters = {}
+        self._groups = {}
+
+    def setRepository(self, repository, bundleChannel = None):
+        """Sets the repository whose message bundling is used, and the
+        channel the bundles are sent to; with either of them None, the
+        messages aren't bundled."""
+        self.repository = repository
+        self.bundleChannel = bundleChannel
+
+    def addObject(self, obj, period, broadcastFunc):
+        """Broadcasts obj every period seconds by calling broadcastFunc,
+        one of its cnode's broadcastPosHpr* methods."""
+        self.removeObject(obj)
+        broadcaster = _Broadcaster(obj, broadcastFunc)
+        self._broadcasters[id(obj)] = broadcaster
+        self._addToGroup(broadcaster, period)
+        if not self.taskRunning:
+            self._lastTime = self.clock.getFrameTime()
+            taskMgr.add(self._broadcastTask, self.taskName, sort = self.taskSort)
+            self.taskRunning = True
+
+    def removeObject(self, obj):
+        broadcaster = self._broadcasters.pop(id(obj), None)
+        if broadcaster is None:
+            return
+        self._removeFromGroup(broadcaster)
+        if not self._broadcasters:
+            taskMgr.remove(self.taskName)
+            self.taskRunning = False
+
+    def hasObject(self, obj):
+        return id(obj) in self._broadcasters
+
+    def setPeriod(self, obj, period):
+        broadcaster = self._broadcasters.get(id(obj))
+        if broadcaster is not None and broadcaster.group.period != period:
+            self._removeFromGroup(broadcaster)
+            self._addToGroup(broadcaster, period)
+
+    def getNumObjects(self):
+        return len(self._broadcasters)
+
+    def getNumObjectsByPeriod(self):
+        return dict((period, len(group.broadcasters))
+                    for period, group in self._groups.items())
+
+    def getStats(self):
+        return {'objects': len(self._broadcasters),
+                'sent': self.numSent,
+                'suppressed': self.numSuppressed,
+                'bundles': self.numBundles,
+                }
+
+    def resetStats(self):
+        self.numSent = 0
+        self.numSuppressed = 0
+        self.numBundles = 0
+
+    def _addToGroup(self, broadcaster, period):
+        group = self._groups.get(period)
+        if group is None:
+            group = self._groups[period] = _PeriodGroup(period)
+        broadcaster.group = group
+        broadcaster.index = len(group.broadcasters)
+        group.broadcasters.append(broadcaster)
+
+    def _removeFromGroup(self, broadcaster):
+        # swap the last broadcaster into this one's place, to keep the
+        # list compact without shifting it
+        group = broadcaster.group
+        broadcasters = group.broadcasters
+        last = broadcasters.pop()
+        if last is not broadcaster:
+            broadcasters[broadcaster.index] = last
+            last.index = broadcaster.index
+        if not broadcasters:
+            del self._groups[group.period]
+        elif group.cursor >= len(broadcasters):
+            group.cursor = 0
+        broadcaster.group = None
+
+    def _broadcastTask(self, task):
+        now = self.clock.getFrameTime()
+        dt = now - self._lastTime
+        self._lastTime = now
+
+        repository = self.repository
+        bundle = (repository is not None and self.bundleChannel is not None and
+                  repository.getWantMessageBundling())
+        if bundle:
+            repository.startMessageBundle()
+
+        sent = 0
+        suppressed = 0
+        try:
+            for group in list(self._groups.values()):
+                broadcasters = group.broadcasters
+                numBroadcasters = len(broadcasters)
+                if group.period > 0:
+                    group.credit += numBroadcasters * dt / group.period
+                else:
+                    group.credit = numBroadcasters
+                count = int(group.credit)
+                if count >= numBroadcasters:
+                    # a long frame; send each of them once, and don't try to
+                    # catch up on the rest
+                    count = numBroadcasters
+                    group.credit = 0.
+                else:
+                    group.credit -= count
+                cursor = group.cursor
+                for i in range(count):
+                    if cursor >= len(broadcasters):
+                        # some were removed by an earlier broadcast
+                        cursor = 0
+                        if not broadcasters:
+                            break
+                    broadcaster = broadcasters[cursor]
+                    cursor += 1
+                    if broadcaster.func():
+                        sent += 1
+                    else:
+                        suppressed += 1
+                if broadcasters:
+                    group.cursor = cursor % len(broadcasters)
+        finally:
+            # even if a broadcast raised, the repository must leave
+            # bundling mode, or it would hold back every later message
+            if bundle:
+                if sent:
+                    repository.sendMessageBundle(self.bundleChannel,
+                                                 getattr(repository, 'ourChannel', 0))
+                    self.numBundles += 1
+                else:
+                    repository.abandonMessageBundles()
+
+        self.numSent += sent
+        self.numSuppressed += suppressed
+        return task.cont
+
+
+posHprBroadcastScheduler = None
+
+def getPosHprBroadcastScheduler(repository = None):
+    """Returns the PosHprBroadcastScheduler that DistributedSmoothNodes
+    use when smooth-broadcast-scheduler is set, creating it the first
+    time.  If it doesn't have a repository yet, it is given this one,
+    along with the channel from smooth-broadcast-bundle-channel."""
+    global posHprBroadcastScheduler
+    if posHprBroadcastScheduler is None:
+        posHprBroadcastScheduler = PosHprBroadcastScheduler()
+    if repository is not None and posHprBroadcastScheduler.repository is None:
+        bundleChannel = BundleChannel.getValue()
+        posHprBroadcastScheduler.setRepository(repository, bundleChannel or None)
+    return posHprBroadcastScheduler
@@ -7,7 +7,10 @@ from direct.task import Task
 from direct.directnotify import DirectNotifyGlobal
 from direct.distributed.PyDatagram import PyDatagram
 
+import heapq
 import inspect
+import itertools
+import struct
 
 
 class ServerRepository:
@@ -60,6 +63,15 @@ class ServerRepository:
             # objects created by this client.
             self.objectsByZoneId = {}
 
+            # The zones the client has opened interest in whose
+            # generates haven't been requested yet, as a heap of
+            # (priority, seq, zoneId).  See sendPendingInterestTask().
+            self.pendingZoneIds = []
+
+            # The number of frames in which the client still had zones
+            # left over, for reporting.
+            self.throttledFrames = 0
+
     class Object:
         """ This internal class keeps track of the data associated
         with each extent distributed object. """
@@ -95,6 +107,12 @@ class ServerRepository:
         self.qcr = QueuedConnectionReader(self.qcm, numThreads)
         self.cw = ConnectionWriter(self.qcm, numThreads)
 
+        # A second writer in raw mode, which adds no header of its own;
+        # used to send a client several already-framed datagrams at
+        # once.  See sendToClients().
+        self.rawCw = ConnectionWriter(self.qcm, numThreads)
+        self.rawCw.setRawMode(True)
+
         taskMgr.setupTaskChain('flushTask')
         if threadedNet:
             taskMgr.setupTaskChain('flushTask', numThreads = 1,
@@ -111,6 +129,40 @@ class ServerRepository:
         # need to be flushed.
         self.needsFlush = set()
 
+        # If this is true, messages to clients are queued and sent at
+        # the end of the frame, with all of the messages queued for a
+        # particular client sent as a single write.
+        self.batchSends = base.config.GetBool('server-batch-sends', False)
+
+        # A dictionary of Client -> list of framed message strings,
+        # waiting to be sent by sendBatchesTask().
+        self.pendingSends = {}
+
+        # The number of messages and writes sent by sendBatchesTask(),
+        # for reporting.
+        self.numBatchedMessages = 0
+        self.numBatchedWrites = 0
+
+        taskMgr.add(self.sendBatchesTask, 'serverSendBatchesTask', sort = 50)
+
+        # If this is nonzero, the generates requested when a client
+        # opens interest in new zones are requested over several
+        # frames, this many zones per client per frame, so that a
+        # client opening interest in many zones at once doesn't flood
+        # the server and the other clients in a single frame.
+        self.interestZonesPerFrame = base.config.GetInt('server-interest-zones-per-frame', 0)
+
+        # If this is nonzero, the list of objects disabled on an
+        # interest change is split into datagrams of at most this many
+        # objects.
+        self.maxDisablesPerDatagram = base.config.GetInt('server-max-disables-per-datagram', 0)
+
+        # Orders the pending zones of equal priority.
+        self.interestSeq = itertools.count()
+
+        if self.interestZonesPerFrame > 0:
+            taskMgr.add(self.sendPendingInterestTask, 'serverPendingInterestTask', sort = 40)
+
         collectTcpInterval = ConfigVariableDouble('collect-tcp-interval').getValue()
         taskMgr.doMethodLater(collectTcpInterval, self.flushTask, 'flushTask',
                               taskChain = 'flushTask')
@@ -143,6 +195,11 @@ class ServerRepository:
         self.dcSuffix = ''
         self.readDCFile(dcFileNames)
 
+        # The struct format of the TCP header, and the largest message
+        # length it can hold, computed on first use by frameDatagram().
+        self.__headerFormat = None
+        self.__maxMessageSize = 0
+
     def flushTask(self, task):
         """ This task is run periodically to flush any connections
         that might need it.  It's only necessary in cases where
@@ -164,6 +221,7 @@ class ServerRepository:
         this."""
         self.qcr.setTcpHeaderSize(headerSize)
         self.cw.setTcpHeaderSize(headerSize)
+        self.__headerFormat = None
 
     def getTcpHeaderSize(self):
         """Returns the current setting of TCP header size. See
@@ -489,13 +547,11 @@ class ServerRepository:
                     targetId,
                     dclass.getName(), dcfield.getName(), doId, client.doIdBase))
                 return
-            self.cw.send(dg, target.connection)
-            self.needsFlush.add(target)
+            self.sendToClient(target, dg)
 
         elif dcfield.hasKeyword('p2p'):
             # p2p: to object owner only
-            self.cw.send(dg, owner.connection)
-            self.needsFlush.add(owner)
+            self.sendToClient(owner, dg)
 
         elif dcfield.hasKeyword('broadcast'):
             # Broadcast: to everyone except orig sender
@@ -582,11 +638,10 @@ class ServerRepository:
         datagram = PyDatagram()
         datagram.addUint16(OBJECT_DISABLE_CMU)
         datagram.addUint32(object.doId)
-        for client in self.zonesToClients[oldZoneId]:
-            if client != owner:
-                if zoneId not in client.currentInterestZoneIds:
-                    self.cw.send(datagram, client.connection)
-                    self.needsFlush.add(client)
+        self.sendToClients(
+            [client for client in self.zonesToClients[oldZoneId]
+             if client != owner and zoneId not in client.currentInterestZoneIds],
+            datagram)
 
         # The client is now responsible for sending a generate for the
         # object that just switched zones, to inform the clients that
@@ -601,8 +656,7 @@ class ServerRepository:
         datagram.addUint32(client.doIdBase)
         datagram.addUint32(self.doIdRange)
 
-        self.cw.send(datagram, client.connection)
-        self.needsFlush.add(client)
+        self.sendToClient(client, datagram)
 
     # a client disconnected from us, we need to update our data, also
     # tell other clients to remove the disconnected clients objects
@@ -626,6 +680,10 @@ class ServerRepository:
         client.objectsByDoId = {}
         client.objectsByZoneId = {}
 
+        # Anything still queued for the client can't be delivered now.
+        self.pendingSends.pop(client, None)
+        self.needsFlush.discard(client)
+
         del self.clientsByConnection[client.connection]
         del self.clientsByDoIdBase[client.doIdBase]
 
@@ -665,26 +723,95 @@ class ServerRepository:
         for zoneId in addedZoneIds:
             self.zonesToClients.setdefault(zoneId, set()).add(client)
 
-            # The client is opening interest in this zone. Need to get
-            # all of the data from clients who may have objects in
-            # this zone
-            datagram = NetDatagram()
-            datagram.addUint16(REQUEST_GENERATES_CMU)
-            datagram.addUint32(zoneId)
-            self.sendToZoneExcept(zoneId, datagram, [client])
+            if self.interestZonesPerFrame > 0:
+                # Requested over the next frames by
+                # sendPendingInterestTask().
+                heapq.heappush(client.pendingZoneIds, (
+                    self.getZonePriority(client, zoneId),
+                    next(self.interestSeq), zoneId))
+            else:
+                self.requestGenerates(client, zoneId)
+
+        unrequestedZoneIds = set()
+        if client.pendingZoneIds and removedZoneIds:
+            # Forget the removed zones that haven't been requested yet.
+            # The client hasn't been sent their objects, so it doesn't
+            # need to disable them either.
+            pendingZoneIds = []
+            for entry in client.pendingZoneIds:
+                if entry[2] in removedZoneIds:
+                    unrequestedZoneIds.add(entry[2])
+                else:
+                    pendingZoneIds.append(entry)
+            heapq.heapify(pendingZoneIds)
+            client.pendingZoneIds = pendingZoneIds
 
         datagram = PyDatagram()
         datagram.addUint16(OBJECT_DISABLE_CMU)
+        numDisables = 0
         for zoneId in removedZoneIds:
             self.zonesToClients[zoneId].remove(client)
+            if zoneId in unrequestedZoneIds:
+                continue
 
             # The client is abandoning interest in this zone.  Any
             # objects in this zone should be disabled for the client.
             for object in self.objectsByZoneId.get(zoneId, []):
+                if self.maxDisablesPerDatagram and \
+                   numDisables >= self.maxDisablesPerDatagram:
+                    self.sendToClient(client, datagram)
+                    datagram = PyDatagram()
+                    datagram.addUint16(OBJECT_DISABLE_CMU)
+                    numDisables = 0
                 datagram.addUint32(object.doId)
-        self.cw.send(datagram, client.connection)
+                numDisables += 1
+        self.sendToClient(client, datagram)
 
-        self.needsFlush.add(client)
+    def requestGenerates(self, client, zoneId):
+        """ The client is opening interest in this zone. Need to get
+        all of the data from clients who may have objects in this
+        zone. """
+        datagram = NetDatagram()
+        datagram.addUint16(REQUEST_GENERATES_CMU)
+        datagram.addUint32(zoneId)
+        self.sendToZoneExcept(zoneId, datagram, [client])
+
+    def getZonePriority(self, client, zoneId):
+        """ Returns the priority of requesting the generates for the
+        zone, when they are paced by server-interest-zones-per-frame;
+        lower values are requested first.  Override this to request,
+        for instance, the zones nearest the client first. """
+        return 0
+
+    def sendPendingInterestTask(self, task):
+        """ Requests the generates for the next few zones each client
+        has opened interest in. """
+        for client in self.clientsByConnection.values():
+            pending = client.pendingZoneIds
+            if not pending:
+                continue
+            for _ in range(self.interestZonesPerFrame):
+                if not pending:
+                    break
+                priority, seq, zoneId = heapq.heappop(pending)
+                self.requestGenerates(client, zoneId)
+            if pending:
+                client.throttledFrames += 1
+        return Task.cont
+
+    def getClientBacklog(self, client):
+        """ Returns how much interest change work is waiting for the
+        client. """
+        return {'zones': len(client.pendingZoneIds),
+                'throttledFrames': client.throttledFrames,
+                }
+
+    def getInterestBacklog(self):
+        """ Returns a dictionary of client doIdBase -> number of zones
+        still waiting, for the clients that have any. """
+        return dict((client.doIdBase, len(client.pendingZoneIds))
+                    for client in self.clientsByConnection.values()
+                    if client.pendingZoneIds)
 
 
     def clientHardDisconnectTask(self, task):
@@ -704,13 +831,12 @@ class ServerRepository:
                 "ServerRepository sending to all in zone %s except %s:" % (zoneId, [c.doIdBase for c in exceptionList]))
             #datagram.dumpHex(ostream)
 
-        for client in self.zonesToClients.get(zoneId, []):
-            if client not in exceptionList:
-                if self.notify.getDebug():
-                    self.notify.debug(
-                        "  -> %s" % (client.doIdBase))
-                self.cw.send(datagram, client.connection)
-                self.needsFlush.add(client)
+        clients = self.zonesToClients.get(zoneId)
+        if not clients:
+            return
+        if exceptionList:
+            clients = clients.difference(exceptionList)
+        self.sendToClients(clients, datagram)
 
     def sendToAllExcept(self, datagram, exceptionList):
         """ sends a message to all connected clients, except for
@@ -721,10 +847,89 @@ class ServerRepository:
                 "ServerRepository sending to all except %s:" % ([c.doIdBase for c in exceptionList],))
             #datagram.dumpHex(ostream)
 
-        for client in self.clientsByConnection.values():
-            if client not in exceptionList:
-                if self.notify.getDebug():
-                    self.notify.debug(
-                        "  -> %s" % (client.doIdBase))
-                self.cw.send(datagram, client.connection)
-                self.needsFlush.add(client)
+        clients = self.clientsByConnection.values()
+        if exceptionList:
+            clients = set(clients).difference(exceptionList)
+        self.sendToClients(clients, datagram)
+
+    def sendToClient(self, client, datagram):
+        """ sends a message to a single client. """
+        self.sendToClients((client, ), datagram)
+
+    def sendToClients(self, clients, datagram):
+        """ sends the same message to each of the indicated clients.
+        If batchSends is on, the message is framed only once, and
+        queued for each client until the end of the frame; otherwise
+        it is sent immediately. """
+
+        if self.notify.getDebug():
+            for client in clients:
+                self.notify.debug(
+                    "  -> %s" % (client.doIdBase))
+
+        framed = None
+        if self.batchSends:
+            framed = self.frameDatagram(datagram)
+
+        if framed is None:
+            if self.pendingSends:
+                # Send anything already queued for these clients first,
+                # so that they still get their messages in order.
+                for client in clients:
+                    pending = self.pendingSends.pop(client, None)
+                    if pending:
+                        self.sendPending(client, pending)
+            send = self.cw.send
+            for client in clients:
+                send(datagram, client.connection)
+            self.needsFlush.update(clients)
+            return
+
+        pendingSends = self.pendingSends
+        for client in clients:
+            pending = pendingSends.get(client)
+            if pending is None:
+                pendingSends[client] = [framed]
+            else:
+                pending.append(framed)
+
+    def frameDatagram(self, datagram):
+        """ Returns the bytes that the ConnectionWriter would put on
+        the wire for this datagram, including the TCP header, or None
+        if the header doesn't allow this: a header size of 0 leaves no
+        way to tell datagrams apart, and a message may be too long for
+        its length to fit in the header. """
+
+        if self.__headerFormat is None:
+            headerSize = self.getTcpHeaderSize()
+            self.__headerFormat, self.__maxMessageSize = {
+                2: ('<H', 0xffff),
+                4: ('<I', 0xffffffff),
+                }.get(headerSize, ('', 0))
+        if not self.__headerFormat:
+            return None
+        message = datagram.getMessage()
+        if len(message) > self.__maxMessageSize:
+            return None
+        return struct.pack(self.__headerFormat, len(message)) + message
+
+    def sendBatchesTask(self, task):
+        """ This task runs at the end of each frame to send the
+        messages queued by sendToClients(), with a single write for
+        each client. """
+
+        if self.pendingSends:
+            pendingSends = self.pendingSends
+            self.pendingSends = {}
+            for client, pending in pendingSends.items():
+                self.sendPending(client, pending)
+        return Task.cont
+
+    def sendPending(self, client, pending):
+        """ Sends the client the list of framed messages queued for it
+        by sendToClients(), with a single write. """
+
+        self.rawCw.send(Datagram(b''.join(pending)), client.connection)
+        self.numBatchedMessages += len(pending)
+        self.numBatchedWrites += 1
+        self.needsFlush.add(client)
@@ -0,0 +1,157 @@
+"""ServerRepositoryBenchmark module: times the fan-out of object updates
+from ServerRepository.sendToZoneExcept() to the clients in a busy zone.
+
+The updates are sent three ways: as the server used to, building a
+list of recipients with a linear check against the exception list and
+sending each of them the datagram; through sendToClients() with
+server-batch-sends off, which sends each client the datagram right
+away; and with it on, which frames each update once and sends each
+client a single write per tick from sendBatchesTask().  The network
+is stood in for by a loopback writer that appends what would go on the
+wire to each client's buffer, and the bytes each client receives are
+checked to be identical in all three.
+
+Run it with: python -m direct.distributed.ServerRepositoryBenchmark
+"""
+
+__all__ = []
+
+from direct.distributed.PyDatagram import PyDatagram
+
+from .ServerRepository import ServerRepository
+
+import random
+import struct
+import sys
+import time
+
+ClientCounts = (50, 200, 500)
+HotZoneId = 100
+# the clients outside the hot zone, which never receive its updates
+NumOtherClients = 100
+# the number of updates sent to the hot zone each tick, by random
+# clients in it, to everyone else in it
+UpdatesPerTick = 100
+UpdateSize = 24
+NumTicks = 20
+TcpHeaderSize = 2
+
+
+class LoopbackConnection:
+
+    def __init__(self):
+        self.received = bytearray()
+        self.numWrites = 0
+
+
+class LoopbackWriter:
+    """Stands in for a ConnectionWriter, appending what it would send
+    to the connection's buffer."""
+
+    def __init__(self, rawMode):
+        self.rawMode = rawMode
+
+    def send(self, datagram, connection):
+        message = datagram.getMessage()
+        if not self.rawMode:
+            connection.received += struct.pack('<H', len(message))
+        connection.received += message
+        connection.numWrites += 1
+        return True
+
+
+class BenchRepository(ServerRepository):
+    """A ServerRepository with just the state that the fan-out uses,
+    writing to LoopbackWriters instead of the network."""
+
+    def __init__(self, batchSends):
+        self.cw = LoopbackWriter(False)
+        self.rawCw = LoopbackWriter(True)
+        self.batchSends = batchSends
+        self.pendingSends = {}
+        self.numBatchedMessages = 0
+        self.numBatchedWrites = 0
+        self.needsFlush = set()
+        self.zonesToClients = {}
+        self.clientsByConnection = {}
+        # normally set up by ServerRepository.__init__()
+        self._ServerRepository__headerFormat = None
+        self._ServerRepository__maxMessageSize = 0
+
+    def getTcpHeaderSize(self):
+        return TcpHeaderSize
+
+
+def sendPerClient(repository, zoneId, datagram, exceptionList):
+    # the same as ServerRepository.sendToZoneExcept() used to do
+    for client in repository.zonesToClients.get(zoneId, ()):
+        if client not in exceptionList:
+            repository.cw.send(datagram, client.connection)
+            repository.needsFlush.add(client)
+
+
+def runBenchmark(numClients, seed = 1):
+    methods = (('per client', False, sendPerClient),
+               ('sendToClients', False, ServerRepository.sendToZoneExcept),
+               ('batched', True, ServerRepository.sendToZoneExcept))
+
+    repositories = []
+    for name, batchSends, send in methods:
+        repository = BenchRepository(batchSends)
+        for doIdBase in range(numClients + NumOtherClients):
+            connection = LoopbackConnection()
+            client = ServerRepository.Client(connection, None, doIdBase)
+            repository.clientsByConnection[connection] = client
+            if doIdBase < numClients:
+                repository.zonesToClients.setdefault(HotZoneId, set()).add(client)
+        repositories.append(repository)
+
+    rng = random.Random(seed)
+    times = [0.] * len(methods)
+    for tick in range(NumTicks):
+        updates = []
+        for i in range(UpdatesPerTick):
+            dg = PyDatagram()
+            dg.addUint32(rng.randrange(1 << 32))
+            dg.appendData(bytes(rng.randrange(256) for j in range(UpdateSize)))
+            updates.append((rng.randrange(numClients), dg))
+
+        for m, (name, batchSends, send) in enumerate(methods):
+            repository = repositories[m]
+            clients = list(repository.clientsByConnection.values())
+            startT = time.perf_counter()
+            for sender, dg in updates:
+                send(repository, HotZoneId, dg, [clients[sender]])
+            if batchSends:
+                repository.sendBatchesTask(None)
+            times[m] += time.perf_counter() - startT
+
+    # every method must have sent each client the same bytes
+    identical = True
+    expected = [client.connection.received
+                for client in repositories[0].clientsByConnection.values()]
+    for repository in repositories[1:]:
+        received = [client.connection.received
+                    for client in repository.clientsByConnection.values()]
+        if received != expected:
+            identical = False
+
+    numMessages = UpdatesPerTick * (numClients - 1)
+    print('%s clients in the zone, %s updates/tick:' % (numClients, UpdatesPerTick))
+    for m, (name, batchSends, send) in enumerate(methods):
+        numWrites = sum(client.connection.numWrites
+                        for client in repositories[m].clientsByConnection.values())
+        msPerTick = times[m] * 1000. / NumTicks
+        print('  %-15s %8.2f ms/tick, %9.0f messages/s, %7.1f writes/tick' % (
+            name, msPerTick, numMessages * NumTicks / times[m],
+            numWrites / float(NumTicks)))
+    print('  bytes identical: %s' % (identical))
+    return identical
+
+
+if __name__ == '__main__':
+    ok = True
+    for numClients in ClientCounts:
+        if not runBenchmark(numClients):
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,126 @@
+"""SmoothingBenchmark module: times smoothing the positions of many
+DistributedSmoothNodes with a task per node, as DistributedSmoothNode
+does by default, against the SmoothingManager used when smooth-batch is
+set, with and without distance tiers.
+
+The nodes are stand-ins that smooth exactly as DistributedSmoothNode
+does, with a SmoothMover each, fed a new position every frame for the
+moving ones; the others have come to a stop.
+
+Run it with: python -m direct.distributed.SmoothingBenchmark
+"""
+
+__all__ = []
+
+from panda3d.core import ClockObject, NodePath
+from panda3d.direct import SmoothMover
+from direct.task.TaskManagerGlobal import taskMgr
+from direct.task.Task import cont
+
+from .DistributedSmoothNode import DistributedSmoothNode
+from .SmoothingManager import SmoothingManager
+
+import random
+import time
+
+NodeCounts = (100, 500, 2000)
+NumFrames = 200
+# the fraction of the nodes that are moving; the rest are stopped
+MovingFraction = .5
+# the tiers of the "SmoothingManager, tiered" run, as (maxDistance,
+# interval) pairs
+Tiers = ((100., 1), (300., 2), (600., 4))
+
+
+class _BenchRepository:
+    spatialIndex = None
+
+
+class BenchNode(NodePath):
+    # the same method DistributedSmoothNode uses, so the SmoothingManager
+    # takes its fast path for these too
+    smoothPosition = DistributedSmoothNode.smoothPosition
+
+    def __init__(self, index, parent, cr, rng):
+        NodePath.__init__(self, 'bench-%s' % (index))
+        self.reparentTo(parent)
+        self.cr = cr
+        self.smoother = SmoothMover()
+        self.smoother.setSmoothMode(SmoothMover.SMOn)
+        self.smoother.setPredictionMode(SmoothMover.PMOff)
+        self.posX = rng.uniform(-500., 500.)
+        self.posY = rng.uniform(-500., 500.)
+        self.heading = rng.uniform(-180., 180.)
+        self.moving = rng.random() < MovingFraction
+        self.stopped = not self.moving
+        self.fullyStopped = False
+        self.addPosition()
+
+    def addPosition(self):
+        # what setSmPosHpr() does for a live update
+        self.smoother.setPos(self.posX, self.posY, 0.)
+        self.smoother.setHpr(self.heading, 0., 0.)
+        self.smoother.setPhonyTimestamp()
+        self.smoother.markPosition()
+
+    def move(self, rng):
+        self.posX += rng.uniform(-1., 1.)
+        self.posY += rng.uniform(-1., 1.)
+        self.heading += rng.uniform(-5., 5.)
+        self.addPosition()
+
+    def doSmoothTask(self, task):
+        self.smoothPosition()
+        return cont
+
+
+def runBenchmark(numNodes, mode, seed = 1):
+    rng = random.Random(seed)
+    clock = ClockObject.getGlobalClock()
+    root = NodePath('smoothingBenchmark')
+    camera = root.attachNewNode('camera')
+    cr = _BenchRepository()
+    nodes = [BenchNode(i, root, cr, rng) for i in range(numNodes)]
+
+    mgr = None
+    if mode == 'tasks':
+        for node in nodes:
+            taskMgr.add(node.doSmoothTask, 'smoothingBenchmark-%s' % (id(node)))
+    else:
+        mgr = SmoothingManager(camera = camera, taskName = 'smoothingBenchmark')
+        if mode == 'tiered':
+            mgr.setTiers(Tiers)
+        for node in nodes:
+            mgr.addNode(node)
+
+    elapsed = 0.
+    for frame in range(NumFrames):
+        clock.tick()
+        for node in nodes:
+            if node.moving:
+                node.move(rng)
+        startT = time.perf_counter()
+        taskMgr.step()
+        elapsed += time.perf_counter() - startT
+
+    if mgr is not None:
+        mgr.destroy()
+    else:
+        for node in nodes:
+            taskMgr.remove('smoothingBenchmark-%s' % (id(node)))
+    root.removeNode()
+    return elapsed * 1000. / NumFrames
+
+
+if __name__ == '__main__':
+    modes = (('tasks', 'a task per node'),
+             ('batched', 'SmoothingManager'),
+             ('tiered', 'SmoothingManager, tiered'))
+    # the time the task manager takes for a frame with no nodes, which is
+    # left out of the results
+    baseline = runBenchmark(0, 'tasks')
+    for numNodes in NodeCounts:
+        print('%s nodes, %s moving:' % (numNodes, int(numNodes * MovingFraction)))
+        for mode, name in modes:
+            msPerFrame = runBenchmark(numNodes, mode) - baseline
+            print('  %-26s %7.3f ms/frame' % (name, msPerFrame))
@@ -0,0 +1,229 @@
+"""SmoothingManager module: contains the SmoothingManager class.
+
+Each DistributedSmoothNode that is being smoothed normally runs its own
+task, so a zone with hundreds of remote avatars costs hundreds of task
+dispatches per frame.  The SmoothingManager smooths all of them from a
+single task instead.  Set smooth-batch to use it.
+"""
+
+__all__ = ['SmoothingManager', 'getSmoothingManager']
+
+from panda3d.core import ConfigVariableBool
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from direct.task.TaskManagerGlobal import taskMgr
+
+BatchSmoothing = ConfigVariableBool('smooth-batch', False,
+    'Set this true to smooth all DistributedSmoothNodes from a single '
+    'task, instead of a task for each node.')
+
+
+class _Smoothed:
+    __slots__ = ('node', 'fast', 'interval', 'phase', 'bucket', 'index')
+
+    def __init__(self, node, fast):
+        self.node = node
+        # true if the node doesn't override smoothPosition(), so that
+        # the manager can do the same work without calling it
+        self.fast = fast
+        # smoothed every interval frames, on the frames that are phase
+        # mod interval
+        self.interval = 1
+        self.phase = 0
+        # the list the entry is in, and its index in that list
+        self.bucket = None
+        self.index = 0
+
+
+class SmoothingManager:
+    """
+    Smooths the position of every DistributedSmoothNode it is given,
+    once a frame, from one task.  A node that has come to a stop
+    (fullyStopped) is skipped without calling into it.
+
+    If tiers are given, they limit how often the farther nodes are
+    smoothed, as in AnimThrottleManager: tiers is a list of
+    (maxDistance, interval) pairs in increasing order of distance, and a
+    node within maxDistance of the camera (and beyond the previous tier)
+    is smoothed every interval frames.  Nodes beyond the last tier use
+    the last tier's interval.  Nodes with the same interval are
+    staggered across the frames, and the tiers are recomputed every
+    retierFrames frames.
+
+    DistributedSmoothNode.startSmooth() and stopSmooth() add and remove
+    the node when smooth-batch is set.
+    """
+    notify = directNotify.newCategory("SmoothingManager")
+
+    def __init__(self, tiers = None, camera = None, retierFrames = 8,
+                 taskName = 'smoothingManager', taskSort = 0):
+        self.tiers = tuple(tiers or ())
+        self.camera = camera
+        self.retierFrames = retierFrames
+        self.taskName = taskName
+        self.taskSort = taskSort
+        # id(node)->_Smoothed
+        self._nodes = {}
+        # the entries smoothed every frame
+        self._everyFrame = []
+        # (interval, phase)->[_Smoothed], for intervals > 1
+        self._buckets = {}
+        # interval->the phase to give the next node, for staggering
+        self._nextPhase = {}
+        # class->whether it overrides smoothPosition()
+        self._fastClasses = {}
+        self._frame = 0
+        self.numSmoothedLastFrame = 0
+        self.taskRunning = False
+
+    def destroy(self):
+        taskMgr.remove(self.taskName)
+        self.taskRunning = False
+        self._nodes = {}
+        self._everyFrame = []
+        self._buckets = {}
+
+    def setTiers(self, tiers, camera = None):
+        self.tiers = tuple(tiers or ())
+        if camera is not None:
+            self.camera = camera
+        for entry in list(self._nodes.values()):
+            self._setInterval(entry, 1)
+        if self.tiers:
+            self._retierAll()
+
+    def addNode(self, node):
+        if id(node) in self._nodes:
+            return
+        cls = node.__class__
+        fast = self._fastClasses.get(cls)
+        if fast is None:
+            from .DistributedSmoothNode import DistributedSmoothNode
+            fast = (getattr(cls, 'smoothPosition', None) is
+                    DistributedSmoothNode.smoothPosition)
+            self._fastClasses[cls] = fast
+        entry = _Smoothed(node, fast)
+        self._nodes[id(node)] = entry
+        self._insert(entry, self._everyFrame)
+        if self.tiers:
+            self._retier(entry, self._getCamera())
+        if not self.taskRunning:
+            taskMgr.add(self._smoothTask, self.taskName, sort = self.taskSort)
+            self.taskRunning = True
+
+    def removeNode(self, node):
+        entry = self._nodes.pop(id(node), None)
+        if entry is None:
+            return
+        self._remove(entry)
+        if not self._nodes:
+            taskMgr.remove(self.taskName)
+            self.taskRunning = False
+
+    def hasNode(self, node):
+        return id(node) in self._nodes
+
+    def getNumNodes(self):
+        return len(self._nodes)
+
+    def getNumNodesByInterval(self):
+        counts = {}
+        for entry in self._nodes.values():
+            counts[entry.interval] = counts.get(entry.interval, 0) + 1
+        return counts
+
+    def _insert(self, entry, bucket):
+        entry.bucket = bucket
+        entry.index = len(bucket)
+        bucket.append(entry)
+
+    def _remove(self, entry):
+        # swap the last entry into this one's place, to keep the list
+        # compact without shifting it
+        bucket = entry.bucket
+        last = bucket.pop()
+        if last is not entry:
+            bucket[entry.index] = last
+            last.index = entry.index
+        entry.bucket = None
+
+    def _getCamera(self):
+        if self.camera is None:
+            return base.cam
+        return self.camera
+
+    def _getIntervalForDistance(self, distance):
+        for maxDistance, interval in self.tiers:
+            if distance <= maxDistance:
+                return interval
+        return self.tiers[-1][1]
+
+    def _retierAll(self):
+        camera = self._getCamera()
+        for entry in list(self._nodes.values()):
+            self._retier(entry, camera)
+
+    def _retier(self, entry, camera):
+        node = entry.node
+        if node.isEmpty():
+            return
+        self._setInterval(entry, self._getIntervalForDistance(node.getDistance(camera)))
+
+    def _setInterval(self, entry, interval):
+        interval = max(interval, 1)
+        if interval == entry.interval:
+            return
+        self._remove(entry)
+        entry.interval = interval
+        if interval == 1:
+            self._insert(entry, self._everyFrame)
+        else:
+            phase = self._nextPhase.get(interval, 0)
+            self._nextPhase[interval] = (phase + 1) % interval
+            entry.phase = phase
+            self._insert(entry, self._buckets.setdefault((interval, phase), []))
+
+    def _smoothTask(self, task):
+        frame = self._frame
+        self._frame = frame + 1
+        if self.tiers and frame % self.retierFrames == 0:
+            self._retierAll()
+
+        numSmoothed = self._smoothBucket(self._everyFrame)
+        for (interval, phase), bucket in self._buckets.items():
+            if bucket and phase == frame % interval:
+                numSmoothed += self._smoothBucket(bucket)
+        self.numSmoothedLastFrame = numSmoothed
+        return task.cont
+
+    def _smoothBucket(self, bucket):
+        numSmoothed = 0
+        # copied, since smoothing a node may stop it smoothing
+        for entry in tuple(bucket):
+            node = entry.node
+            if node.fullyStopped or entry.bucket is None:
+                continue
+            numSmoothed += 1
+            if not entry.fast:
+                node.smoothPosition()
+                continue
+            # this is DistributedSmoothNode.smoothPosition()
+            smoother = node.smoother
+            if smoother.computeSmoothPosition():
+                smoother.applySmoothPos(node)
+                smoother.applySmoothHpr(node)
+                if node.cr.spatialIndex is not None:
+                    node.updateSpatialIndex()
+            elif node.stopped:
+                node.fullyStopped = True
+        return numSmoothed
+
+
+smoothingMgr = None
+
+def getSmoothingManager():
+    """Returns the SmoothingManager that DistributedSmoothNodes use when
+    smooth-batch is set, creating it the first time."""
+    global smoothingMgr
+    if smoothingMgr is None:
+        smoothingMgr = SmoothingManager()
+    return smoothingMgr
@@ -0,0 +1,194 @@
+"""SpatialGrid module: contains the SpatialGrid class"""
+
+from direct.directnotify.DirectNotifyGlobal import directNotify
+import heapq
+
+
+class SpatialGrid:
+    """
+    A uniform grid over the XY plane, used to answer nearest-N and
+    within-radius queries over distributed objects without visiting every
+    object.  Objects are identified by doId; their positions are pushed in
+    with update() whenever they move, which only touches the grid cell
+    bookkeeping when an object crosses into a different cell.  Distances
+    are measured in 3D, but the grid itself is 2D, since our worlds are
+    mostly flat.
+    """
+    notify = directNotify.newCategory("SpatialGrid")
+
+    def __init__(self, cellSize=100., referenceNode=None):
+        self.cellSize = float(cellSize)
+        # the node that positions are measured relative to, or None to use
+        # each node's position relative to its parent
+        self.referenceNode = referenceNode
+        # (cellX, cellY)->set(doId)
+        self._cell2doIds = {}
+        # doId->(cellX, cellY)
+        self._doId2cell = {}
+        # doId->(x, y, z)
+        self._doId2pos = {}
+        # [minX, maxX, minY, maxY] of every cell that has been occupied;
+        # it is not shrunk when cells empty, so it may be larger than needed
+        self._cellBounds = None
+
+    def __len__(self):
+        return len(self._doId2pos)
+
+    def __contains__(self, doId):
+        return doId in self._doId2pos
+
+    def clear(self):
+        self._cell2doIds = {}
+        self._doId2cell = {}
+        self._doId2pos = {}
+        self._cellBounds = None
+
+    def getCell(self, x, y):
+        cellSize = self.cellSize
+        return (int(x // cellSize), int(y // cellSize))
+
+    def update(self, doId, x, y, z):
+        cell = (int(x // self.cellSize), int(y // self.cellSize))
+        oldCell = self._doId2cell.get(doId)
+        if oldCell != cell:
+            if oldCell is not None:
+                self._removeFromCell(doId, oldCell)
+            doIds = self._cell2doIds.get(cell)
+            if doIds is None:
+                doIds = self._cell2doIds[cell] = set()
+                self._growBounds(cell)
+            doIds.add(doId)
+            self._doId2cell[doId] = cell
+        self._doId2pos[doId] = (x, y, z)
+
+    def _growBounds(self, cell):
+        bounds = self._cellBounds
+        cx, cy = cell
+        if bounds is None:
+            self._cellBounds = [cx, cx, cy, cy]
+        else:
+            if cx < bounds[0]:
+                bounds[0] = cx
+            elif cx > bounds[1]:
+                bounds[1] = cx
+            if cy < bounds[2]:
+                bounds[2] = cy
+            elif cy > bounds[3]:
+                bounds[3] = cy
+
+    def updateNode(self, doId, nodePath):
+        # convenience for NodePaths; reads the position relative to the
+        # reference node
+        if self.referenceNode is None:
+            pos = nodePath.getPos()
+        else:
+            pos = nodePath.getPos(self.referenceNode)
+        self.update(doId, pos[0], pos[1], pos[2])
+
+    def remove(self, doId):
+        cell = self._doId2cell.pop(doId, None)
+        if cell is not None:
+            self._removeFromCell(doId, cell)
+            del self._doId2pos[doId]
+
+    def _removeFromCell(self, doId, cell):
+        doIds = self._cell2doIds[cell]
+        doIds.discard(doId)
+        if len(doIds) == 0:
+            del self._cell2doIds[cell]
+
+    def getPos(self, doId):
+        return self._doId2pos.get(doId)
+
+    def getWithinRadius(self, x, y, z, radius, sort=True):
+        """
+        Returns the doIds of the objects within radius of (x, y, z); if
+        sort is true, they are ordered nearest first.
+        """
+        cellSize = self.cellSize
+        minX = int((x - radius) // cellSize)
+        maxX = int((x + radius) // cellSize)
+        minY = int((y - radius) // cellSize)
+        maxY = int((y + radius) // cellSize)
+        cell2doIds = self._cell2doIds
+        doId2pos = self._doId2pos
+        radiusSq = radius * radius
+        result = []
+        if (maxX - minX + 1) * (maxY - minY + 1) > len(cell2doIds):
+            # the query covers more cells than are occupied, so just visit
+            # the occupied ones
+            cells = [cell for cell in cell2doIds
+                     if minX <= cell[0] <= maxX and minY <= cell[1] <= maxY]
+        else:
+            cells = [(cx, cy)
+                     for cx in range(minX, maxX + 1)
+                     for cy in range(minY, maxY + 1)
+                     if (cx, cy) in cell2doIds]
+        for cell in cells:
+            for doId in cell2doIds[cell]:
+                px, py, pz = doId2pos[doId]
+                distSq = (px - x) * (px - x) + (py - y) * (py - y) + (pz - z) * (pz - z)
+                if distSq <= radiusSq:
+                    result.append((distSq, doId))
+        if sort:
+            result.sort()
+        return [doId for distSq, doId in result]
+
+    def getNearest(self, x, y, z, n, maxRadius=None):
+        """
+        Returns the doIds of the n objects nearest to (x, y, z), nearest
+        first, optionally only considering objects within maxRadius.
+        """
+        if n <= 0 or len(self._doId2pos) == 0:
+            return []
+        if maxRadius is not None:
+            return self.getWithinRadius(x, y, z, maxRadius)[:n]
+
+        cellSize = self.cellSize
+        cell2doIds = self._cell2doIds
+        doId2pos = self._doId2pos
+        centerX, centerY = self.getCell(x, y)
+        # how many rings out do we have to go to have covered every cell?
+        minX, maxX, minY, maxY = self._cellBounds
+        maxRing = max(centerX - minX, maxX - centerX,
+                      centerY - minY, maxY - centerY, 0)
+
+        # max-heap (by negated distance) of the best n candidates so far
+        best = []
+        ring = 0
+        while ring <= maxRing:
+            if 8 * ring > len(cell2doIds):
+                # the rings are now larger than the number of occupied
+                # cells, so it's cheaper to check the remaining cells directly
+                cells = [cell for cell in cell2doIds
+                         if max(abs(cell[0] - centerX), abs(cell[1] - centerY)) >= ring]
+                ring = maxRing
+            elif ring == 0:
+                cells = [(centerX, centerY)]
+            else:
+                cells = []
+                for cx in range(centerX - ring, centerX + ring + 1):
+                    cells.append((cx, centerY - ring))
+                    cells.append((cx, centerY + ring))
+                for cy in range(centerY - ring + 1, centerY + ring):
+                    cells.append((centerX - ring, cy))
+                    cells.append((centerX + ring, cy))
+            for cell in cells:
+                doIds = cell2doIds.get(cell)
+                if not doIds:
+                    continue
+                for doId in doIds:
+                    px, py, pz = doId2pos[doId]
+                    distSq = (px - x) * (px - x) + (py - y) * (py - y) + (pz - z) * (pz - z)
+                    if len(best) < n:
+                        heapq.heappush(best, (-distSq, doId))
+                    elif distSq < -best[0][0]:
+                        heapq.heapreplace(best, (-distSq, doId))
+            # every object in a further ring is at least this far away
+            bound = ring * cellSize
+            if len(best) == n and -best[0][0] <= bound * bound:
+                break
+            ring += 1
+
+        best.sort(reverse=True)
+        return [doId for negDistSq, doId in best]
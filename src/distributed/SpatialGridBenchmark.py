@@ -0,0 +1,108 @@
+"""SpatialGridBenchmark module: times the nearest-N and within-radius
+queries of a SpatialGrid over 10000 objects against measuring the
+distance to every object and sorting them, as dosByDistance() does
+without a spatial index, and times moving the objects in the grid.
+
+The objects are scattered over a square world, and the queries are made
+from random points in it.  The answers of the grid are checked to be the
+same as those of the brute-force search.
+
+Run it with: python -m direct.distributed.SpatialGridBenchmark
+"""
+
+__all__ = []
+
+from .SpatialGrid import SpatialGrid
+
+import random
+import sys
+import time
+
+ObjectCounts = (1000, 10000)
+WorldSize = 4000.
+CellSize = 100.
+NumQueries = 200
+NearestN = 20
+Radius = 150.
+# the fraction of the objects that move each frame
+MovingFraction = .5
+NumFrames = 20
+
+
+def bruteNearest(positions, x, y, z, n):
+    # the same as dosByDistance(): every object is measured and sorted
+    dists = []
+    for doId, (px, py, pz) in positions.items():
+        dists.append(((px - x) * (px - x) + (py - y) * (py - y) + (pz - z) * (pz - z), doId))
+    dists.sort()
+    return [doId for distSq, doId in dists[:n]]
+
+
+def bruteWithinRadius(positions, x, y, z, radius):
+    radiusSq = radius * radius
+    dists = []
+    for doId, (px, py, pz) in positions.items():
+        distSq = (px - x) * (px - x) + (py - y) * (py - y) + (pz - z) * (pz - z)
+        if distSq <= radiusSq:
+            dists.append((distSq, doId))
+    dists.sort()
+    return [doId for distSq, doId in dists]
+
+
+def runBenchmark(numObjects, seed = 1):
+    rng = random.Random(seed)
+    positions = {}
+    for doId in range(numObjects):
+        positions[doId] = (rng.uniform(0., WorldSize), rng.uniform(0., WorldSize),
+                           rng.uniform(0., 10.))
+    grid = SpatialGrid(CellSize)
+    for doId, (x, y, z) in positions.items():
+        grid.update(doId, x, y, z)
+    queries = [(rng.uniform(0., WorldSize), rng.uniform(0., WorldSize), 0.)
+               for i in range(NumQueries)]
+
+    identical = True
+    times = {}
+    for name, query in (
+        ('nearest, brute force', lambda x, y, z: bruteNearest(positions, x, y, z, NearestN)),
+        ('nearest, SpatialGrid', lambda x, y, z: grid.getNearest(x, y, z, NearestN)),
+        ('radius, brute force', lambda x, y, z: bruteWithinRadius(positions, x, y, z, Radius)),
+        ('radius, SpatialGrid', lambda x, y, z: grid.getWithinRadius(x, y, z, Radius)),
+        ):
+        results = []
+        startT = time.perf_counter()
+        for x, y, z in queries:
+            results.append(query(x, y, z))
+        times[name] = time.perf_counter() - startT
+        if name.endswith('brute force'):
+            expected = results
+        elif results != expected:
+            identical = False
+
+    movers = [doId for doId in positions if rng.random() < MovingFraction]
+    startT = time.perf_counter()
+    for frame in range(NumFrames):
+        for doId in movers:
+            x, y, z = positions[doId]
+            x += rng.uniform(-5., 5.)
+            y += rng.uniform(-5., 5.)
+            positions[doId] = (x, y, z)
+            grid.update(doId, x, y, z)
+    updateT = time.perf_counter() - startT
+
+    print('%s objects, %s queries:' % (numObjects, NumQueries))
+    for name in ('nearest, brute force', 'nearest, SpatialGrid',
+                 'radius, brute force', 'radius, SpatialGrid'):
+        print('  %-22s %9.1f us/query' % (name, times[name] * 1e6 / NumQueries))
+    print('  %-22s %9.3f ms/frame for %s moving objects' % (
+        'update', updateT * 1000. / NumFrames, len(movers)))
+    print('  results identical: %s' % (identical))
+    return identical
+
+
+if __name__ == '__main__':
+    ok = True
+    for numObjects in ObjectCounts:
+        if not runBenchmark(numObjects):
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -80,9 +80,11 @@ send_everything() {
 
 /**
  * Examines the complete pos/hpr information to see which of the six elements
- * have changed, and broadcasts the appropriate messages.
+ * have changed, and broadcasts the appropriate messages.  Returns true if a
+ * message was sent, or false if nothing has changed since the last stop
+ * message.
  */
-void CDistributedSmoothNodeBase::
+bool CDistributedSmoothNodeBase::
 broadcast_pos_hpr_full() {
   LPoint3 xyz = _node_path.get_pos();
   LVecBase3 hpr = _node_path.get_hpr();
@@ -130,10 +132,12 @@ broadcast_pos_hpr_full() {
 
   } else if (flags == 0) {
     // No change.  Send one and only one "stop" message.
-    if (!_store_stop) {
-      _store_stop = true;
-      d_setSmStop();
+    if (_store_stop) {
+      // Already sent.
+      return false;
     }
+    _store_stop = true;
+    d_setSmStop();
 
   } else if (only_changed(flags, F_new_h)) {
     // Only change in H.
@@ -181,13 +185,15 @@ broadcast_pos_hpr_full() {
     d_setSmPosHpr(_store_xyz[0], _store_xyz[1], _store_xyz[2],
                   _store_hpr[0], _store_hpr[1], _store_hpr[2]);
   }
+
+  return true;
 }
 
 /**
  * Examines only X, Y, and H of the pos/hpr information, and broadcasts the
- * appropriate messages.
+ * appropriate messages.  Returns true if a message was sent.
  */
-void CDistributedSmoothNodeBase::
+bool CDistributedSmoothNodeBase::
 broadcast_pos_hpr_xyh() {
   LPoint3 xyz = _node_path.get_pos();
   LVecBase3 hpr = _node_path.get_hpr();
@@ -211,10 +217,12 @@ broadcast_pos_hpr_xyh() {
 
   if (flags == 0) {
     // No change.  Send one and only one "stop" message.
-    if (!_store_stop) {
-      _store_stop = true;
-      d_setSmStop();
+    if (_store_stop) {
+      // Already sent.
+      return false;
     }
+    _store_stop = true;
+    d_setSmStop();
 
   } else if (only_changed(flags, F_new_h)) {
     // Only change in H.
@@ -231,13 +239,15 @@ broadcast_pos_hpr_xyh() {
     _store_stop = false;
     d_setSmXYH(_store_xyz[0], _store_xyz[1], _store_hpr[0]);
   }
+
+  return true;
 }
 
 /**
  * Examines only X and Y of the pos/hpr information, and broadcasts the
- * appropriate messages.
+ * appropriate messages.  Returns true if a message was sent.
  */
-void CDistributedSmoothNodeBase::
+bool CDistributedSmoothNodeBase::
 broadcast_pos_hpr_xy() {
   LPoint3 xyz = _node_path.get_pos();
 
@@ -255,16 +265,20 @@ broadcast_pos_hpr_xy() {
 
   if (flags == 0) {
     // No change.  Send one and only one "stop" message.
-    if (!_store_stop) {
-      _store_stop = true;
-      d_setSmStop();
+    if (_store_stop) {
+      // Already sent.
+      return false;
     }
+    _store_stop = true;
+    d_setSmStop();
 
   } else {
     // Any other change.
     _store_stop = false;
     d_setSmXY(_store_xyz[0], _store_xyz[1]);
   }
+
+  return true;
 }
 
 /**
@@ -46,9 +46,9 @@ PUBLISHED:
 
   void send_everything();
 
-  void broadcast_pos_hpr_full();
-  void broadcast_pos_hpr_xyh();
-  void broadcast_pos_hpr_xy();
+  bool broadcast_pos_hpr_full();
+  bool broadcast_pos_hpr_xyh();
+  bool broadcast_pos_hpr_xy();
 
   void set_curr_l(uint64_t l);
   void print_curr_l();
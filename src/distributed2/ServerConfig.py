@@ -10,3 +10,10 @@ sv_tickrate = ConfigVariableInt("sv_tickrate", 66)
 sv_snapshot_history = ConfigVariableInt("sv_snapshot_history", 50)
 sv_port = ConfigVariableInt("sv_port", 27015)
 sv_alternateticks = ConfigVariableBool("sv_alternateticks", False)
+# How many threads format client snapshots?  0 formats them on the main thread.
+sv_snapshot_threads = ConfigVariableInt("sv_snapshot_threads", 0)
+# Split the object generates sent on an interest change into datagrams of
+# about this many bytes, sent over several ticks.  0 sends them all at once.
+sv_interest_chunk_size = ConfigVariableInt("sv_interest_chunk_size", 0)
+# How many of those datagrams may be sent to each client per tick?
+sv_interest_chunks_per_tick = ConfigVariableInt("sv_interest_chunks_per_tick", 4)
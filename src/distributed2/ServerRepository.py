@@ -11,6 +11,9 @@ from .ServerConfig import *
 from .BaseObjectManager import BaseObjectManager
 
 from enum import IntEnum
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
 
 class ClientState(IntEnum):
 
@@ -58,6 +61,34 @@ class ServerRepository(BaseObjectManager):
             self.explicitInterestZoneIds = set()
             self.currentInterestZoneIds = set()
 
+            # Objects still to be generated for the client after an
+            # interest change, when sv_interest_chunk_size is set, as a
+            # heap of (priority, seq, zoneId, object).
+            self.pendingGenerates = []
+            # The doIds of the objects in pendingGenerates.  The client
+            # doesn't know about these yet, so it isn't sent their
+            # updates or deletes.
+            self.pendingDoIds = set()
+            # zoneId -> number of pending generates in that zone.  These
+            # zones are left out of the client's snapshots until all of
+            # their objects have been generated.
+            self.pendingZoneCounts = {}
+            # Interest handles to acknowledge once the pending generates
+            # have been sent.
+            self.pendingInterestHandles = []
+            # Set if a snapshot was sent while generates were pending;
+            # the client then needs a full snapshot when they are done,
+            # since the deltas it received skipped the pending zones.
+            self.snapshotWhilePending = False
+            self.needsFullSnapshot = False
+            # How many ticks the client has had generates left over.
+            self.throttledTicks = 0
+
+        def getSnapshotZoneIds(self):
+            if self.pendingZoneCounts:
+                return self.currentInterestZoneIds.difference(self.pendingZoneCounts)
+            return self.currentInterestZoneIds
+
         def getClientFrame(self, tick):
             return self.frameMgr.getClientFrame(tick)
 
@@ -92,11 +123,31 @@ class ServerRepository(BaseObjectManager):
 
         self.snapshotMgr = FrameSnapshotManager()
 
+        # Formats the client snapshots in parallel, if enabled.  The
+        # snapshot formatting releases the GIL.
+        self.snapshotPool = None
+        if sv_snapshot_threads.getValue() > 0:
+            self.snapshotPool = ThreadPoolExecutor(sv_snapshot_threads.getValue())
+        self.numSnapshotsFormatted = 0
+        self.numSnapshotsSent = 0
+
+        # Orders the pending generates of equal priority.
+        self.generateSeq = itertools.count()
+
         self.objectsByZoneId = {}
 
         base.setTickRate(sv_tickrate.getValue())
         base.simTaskMgr.add(self.runFrame, "serverRunFrame", sort = -100)
 
+    def shutdown(self):
+        # Stops running the server, dropping all the clients.
+        base.simTaskMgr.remove("serverRunFrame")
+        for client in list(self.clientsByConnection.values()):
+            self.closeClientConnection(client)
+        if self.snapshotPool is not None:
+            self.snapshotPool.shutdown()
+            self.snapshotPool = None
+
     def allocateObjectID(self):
         return self.objectIdAllocator.allocate()
 
@@ -164,7 +215,11 @@ class ServerRepository(BaseObjectManager):
             dg = PyDatagram()
             dg.addUint16(NetMessages.SV_DeleteObject)
             dg.addUint32(do.doId)
-            for client in clients:
+            for client in list(clients):
+                if do.doId in client.pendingDoIds:
+                    # It was never generated for this client.
+                    self.dropPendingGenerate(client, do)
+                    continue
                 self.sendDatagram(dg, client.connection)
 
         # Forget this object in the packet history
@@ -182,6 +237,8 @@ class ServerRepository(BaseObjectManager):
 
         self.simObjects()
 
+        self.sendPendingGenerates()
+
         self.takeTickSnapshot(base.tickCount)
 
         return task.cont
@@ -205,7 +262,7 @@ class ServerRepository(BaseObjectManager):
         for _, client in self.clientsByConnection.items():
             if self.clientNeedsUpdate(client):
                 # Factor in this client's interest zones
-                clientZones |= client.currentInterestZoneIds
+                clientZones |= client.getSnapshotZoneIds()
                 # Calculate when the next update should be
                 client.nextUpdateTime = globalClock.getFrameTime() + client.updateInterval
                 client.setupPackInfo(snap)
@@ -229,21 +286,61 @@ class ServerRepository(BaseObjectManager):
 
             self.snapshotMgr.packObjectInSnapshot(snap, i, do, doId, do.zoneId, do.dclass)
 
-        # Send it out to whoever needs it
+        # Clients that acknowledged the same tick and see the same zones get
+        # the same snapshot, so format it once for all of them.
+        groups = {}
         for client in clientsNeedingSnapshots:
             # Get the frame the client most recently acknowledged
-            oldFrame = client.getClientFrame(client.tickCount)
+            if client.needsFullSnapshot:
+                client.needsFullSnapshot = False
+                oldFrame = None
+            else:
+                oldFrame = client.getClientFrame(client.tickCount)
+            if client.pendingZoneCounts:
+                client.snapshotWhilePending = True
 
             client.lastSnapshot = snap
 
-            dg = PyDatagram()
-            dg.addUint16(NetMessages.SV_Tick)
+            zoneIds = frozenset(client.getSnapshotZoneIds())
             if oldFrame:
                 # We have an old frame to delta against
-                self.snapshotMgr.clientFormatDeltaSnapshot(dg, oldFrame.getSnapshot(), snap, list(client.currentInterestZoneIds))
+                oldSnap = oldFrame.getSnapshot()
+                key = (oldSnap.getTickCount(), zoneIds)
             else:
-                self.snapshotMgr.clientFormatSnapshot(dg, snap, list(client.currentInterestZoneIds))
-            self.sendDatagram(dg, client.connection)
+                oldSnap = None
+                key = (None, zoneIds)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (oldSnap, list(zoneIds), [])
+            group[2].append(client)
+
+        groups = list(groups.values())
+        if self.snapshotPool is not None and len(groups) > 1:
+            dgs = list(self.snapshotPool.map(
+                lambda group: self.formatClientSnapshot(snap, group[0], group[1]),
+                groups))
+        else:
+            dgs = [self.formatClientSnapshot(snap, oldSnap, zoneIds)
+                   for oldSnap, zoneIds, clients in groups]
+        self.numSnapshotsFormatted += len(groups)
+
+        # Send it out to whoever needs it
+        for dg, (oldSnap, zoneIds, clients) in zip(dgs, groups):
+            for client in clients:
+                self.sendDatagram(dg, client.connection)
+            self.numSnapshotsSent += len(clients)
+
+    def formatClientSnapshot(self, snap, oldSnap, zoneIds):
+        # Returns the datagram to send to a client that sees the given
+        # zones, as a delta against oldSnap if there is one.  This may
+        # be called from the snapshot threads.
+        dg = PyDatagram()
+        dg.addUint16(NetMessages.SV_Tick)
+        if oldSnap is not None:
+            self.snapshotMgr.clientFormatDeltaSnapshot(dg, oldSnap, snap, zoneIds)
+        else:
+            self.snapshotMgr.clientFormatSnapshot(dg, snap, zoneIds)
+        return dg
 
     def isFull(self):
         return self.numClients >= sv_max_clients.getValue()
@@ -331,6 +428,9 @@ class ServerRepository(BaseObjectManager):
             if field.isBroadcast():
                 # Send to all interested clients
                 for cl in self.zonesToClients.get(do.zoneId, set()):
+                    if do.doId in cl.pendingDoIds:
+                        # It hasn't been generated for this client yet.
+                        continue
                     self.sendDatagram(dg, cl.connection)
             else:
                 self.notify.warning("Can't send non-broadcast object message without a target client")
@@ -442,6 +542,7 @@ class ServerRepository(BaseObjectManager):
         client.currentInterestZoneIds = newZoneIds
         addedZoneIds = newZoneIds - origZoneIds
         removedZoneIds = origZoneIds - newZoneIds
+        chunkSize = sv_interest_chunk_size.getValue()
 
         dg = PyDatagram()
         dg.addUint16(NetMessages.SV_GenerateObject)
@@ -454,9 +555,36 @@ class ServerRepository(BaseObjectManager):
                 if object.owner != client:
                     # Don't do this if the client owns the object, it should
                     # already be generated for them.
-                    self.packObjectGenerate(dg, object)
+                    if chunkSize > 0:
+                        # Sent over the next ticks by sendPendingGenerates().
+                        heapq.heappush(client.pendingGenerates, (
+                            self.getGeneratePriority(client, object),
+                            next(self.generateSeq), zoneId, object))
+                        client.pendingDoIds.add(object.doId)
+                        client.pendingZoneCounts[zoneId] = client.pendingZoneCounts.get(zoneId, 0) + 1
+                    else:
+                        self.packObjectGenerate(dg, object)
+
+        if chunkSize <= 0:
+            self.sendDatagram(dg, client.connection)
 
-        self.sendDatagram(dg, client.connection)
+        # Objects in the removed zones that are still waiting to be
+        # generated are simply forgotten.
+        notGenerated = set()
+        if client.pendingZoneCounts and removedZoneIds & set(client.pendingZoneCounts):
+            pending = []
+            for entry in client.pendingGenerates:
+                if entry[2] in removedZoneIds:
+                    notGenerated.add(entry[3])
+                    client.pendingDoIds.discard(entry[3].doId)
+                else:
+                    pending.append(entry)
+            heapq.heapify(pending)
+            client.pendingGenerates = pending
+            for zoneId in removedZoneIds:
+                client.pendingZoneCounts.pop(zoneId, None)
+            if not pending:
+                self.finishPendingGenerates(client)
 
         dg = PyDatagram()
         dg.addUint16(NetMessages.SV_DeleteObject)
@@ -465,12 +593,114 @@ class ServerRepository(BaseObjectManager):
             # The client is abandoning interest in this zone. Any
             # objects in this zone should be deleted on the client.
             for object in self.objectsByZoneId.get(zoneId, []):
-                if object.owner != client:
+                if object.owner != client and object not in notGenerated:
                     # Never delete objects owned by this client on interest change.
                     dg.addUint32(object.doId)
+                    if chunkSize > 0 and dg.getLength() >= chunkSize:
+                        self.sendDatagram(dg, client.connection)
+                        dg = PyDatagram()
+                        dg.addUint16(NetMessages.SV_DeleteObject)
         self.sendDatagram(dg, client.connection)
 
+    def getGeneratePriority(self, client, object):
+        """
+        Returns the priority of generating the object for the client
+        after an interest change, when the generates are paced by
+        sv_interest_chunk_size; lower values are sent first.  Override
+        this to send, for instance, the objects nearest the client's
+        avatar first.
+        """
+        return 0
+
+    def sendPendingGenerates(self):
+        """ Sends each client the next few chunks of the generates left
+        over from its interest changes. """
+        chunkSize = sv_interest_chunk_size.getValue()
+        maxChunks = sv_interest_chunks_per_tick.getValue()
+        for client in self.clientsByConnection.values():
+            if client.pendingGenerates:
+                self.sendClientPendingGenerates(client, chunkSize, maxChunks)
+
+    def sendClientPendingGenerates(self, client, chunkSize, maxChunks):
+        pending = client.pendingGenerates
+        zoneCounts = client.pendingZoneCounts
+        for _ in range(maxChunks):
+            if not pending:
+                break
+            dg = PyDatagram()
+            dg.addUint16(NetMessages.SV_GenerateObject)
+            numObjects = 0
+            while pending and (numObjects == 0 or dg.getLength() < chunkSize):
+                priority, seq, zoneId, object = heapq.heappop(pending)
+                zoneCounts[zoneId] -= 1
+                if not zoneCounts[zoneId]:
+                    del zoneCounts[zoneId]
+                client.pendingDoIds.discard(object.doId)
+                if object.zoneId != zoneId:
+                    # It has moved to another zone since.
+                    continue
+                self.packObjectGenerate(dg, object)
+                numObjects += 1
+            if numObjects:
+                self.sendDatagram(dg, client.connection)
+
+        if pending:
+            client.throttledTicks += 1
+        else:
+            self.finishPendingGenerates(client)
+
+    def dropPendingGenerate(self, client, do):
+        # Forgets the pending generate of an object that is being
+        # deleted before it was generated for the client.
+        pending = []
+        zoneCounts = client.pendingZoneCounts
+        for entry in client.pendingGenerates:
+            if entry[3] is do:
+                zoneId = entry[2]
+                zoneCounts[zoneId] -= 1
+                if not zoneCounts[zoneId]:
+                    del zoneCounts[zoneId]
+            else:
+                pending.append(entry)
+        heapq.heapify(pending)
+        client.pendingGenerates = pending
+        client.pendingDoIds.discard(do.doId)
+        if not pending:
+            self.finishPendingGenerates(client)
+
+    def finishPendingGenerates(self, client):
+        # All of the client's pending generates have been sent.
+        client.pendingZoneCounts = {}
+        client.pendingDoIds = set()
+        if client.snapshotWhilePending:
+            client.snapshotWhilePending = False
+            client.needsFullSnapshot = True
+        handles = client.pendingInterestHandles
+        client.pendingInterestHandles = []
+        for handle in handles:
+            self.sendInterestComplete(client, handle)
+
+    def getClientBacklog(self, client):
+        """ Returns how much interest change work is waiting to be sent
+        to the client. """
+        return {'generates': len(client.pendingGenerates),
+                'zones': len(client.pendingZoneCounts),
+                'interestHandles': len(client.pendingInterestHandles),
+                'throttledTicks': client.throttledTicks,
+                }
+
+    def getInterestBacklog(self):
+        """ Returns a dictionary of client id -> number of pending
+        generates, for the clients that have any. """
+        return dict((client.id, len(client.pendingGenerates))
+                    for client in self.clientsByConnection.values()
+                    if client.pendingGenerates)
+
     def sendInterestComplete(self, client, handle):
+        if client.pendingGenerates:
+            # Not complete until the objects have been generated.
+            client.pendingInterestHandles.append(handle)
+            return
         dg = PyDatagram()
         dg.addUint16(NetMessages.SV_InterestComplete)
         dg.addUint8(handle)
@@ -0,0 +1,188 @@
+"""SnapshotBenchmark module: times the formatting of the snapshots that
+ServerRepository.takeTickSnapshot() sends to its clients.
+
+The snapshots are formatted three ways: once for each client, as the
+server used to do; once for each group of clients that acknowledged the
+same tick and see the same zones, as it does now; and the same groups
+spread over a pool of threads, as with sv_snapshot_threads.  The
+datagrams that each client would receive are checked to be identical in
+all three.  Sending is stood in for by copying each client's datagram,
+in place of a network connection.
+
+Run it with: python -m direct.distributed2.SnapshotBenchmark
+"""
+
+__all__ = []
+
+from panda3d.core import StringStream
+from panda3d.direct import DCFile, FrameSnapshot, FrameSnapshotManager
+
+from direct.distributed.PyDatagram import PyDatagram
+
+from .NetMessages import NetMessages
+
+from concurrent.futures import ThreadPoolExecutor
+import random
+import sys
+import time
+
+BenchDC = """
+dclass BenchObject {
+  int32 x;
+  int32 y;
+  int16 h;
+  uint8 state;
+};
+"""
+
+NumObjects = 2000
+NumZones = 64
+# each client sees one of NumAreas sets of ZonesPerArea zones
+NumAreas = 16
+ZonesPerArea = 4
+# how many ticks behind the current one the clients acknowledge
+AckLags = (1, 2)
+NumTicks = 20
+NumThreads = 4
+ClientCounts = (64, 256, 1024)
+
+
+class BenchObject:
+
+    def __init__(self, doId, zoneId, rng):
+        self.doId = doId
+        self.zoneId = zoneId
+        self.x = rng.randint(-1000, 1000)
+        self.y = rng.randint(-1000, 1000)
+        self.h = rng.randint(-180, 180)
+        self.state = 0
+
+    def update(self, rng):
+        # about a third of the objects move each tick
+        if rng.random() < .33:
+            self.x += rng.randint(-5, 5)
+            self.y += rng.randint(-5, 5)
+            self.h = (self.h + rng.randint(-10, 10)) % 360 - 180
+
+
+class BenchClient:
+
+    def __init__(self, zoneIds, ackLag):
+        self.zoneIds = set(zoneIds)
+        self.ackLag = ackLag
+        self.received = []
+
+
+def formatSnapshot(mgr, snap, oldSnap, zoneIds):
+    # the same as ServerRepository.formatClientSnapshot()
+    dg = PyDatagram()
+    dg.addUint16(NetMessages.SV_Tick)
+    if oldSnap is not None:
+        mgr.clientFormatDeltaSnapshot(dg, oldSnap, snap, zoneIds)
+    else:
+        mgr.clientFormatSnapshot(dg, snap, zoneIds)
+    return dg
+
+
+def sendPerClient(mgr, snap, snaps, clients, pool):
+    for client in clients:
+        oldSnap = snaps.get(snap.getTickCount() - client.ackLag)
+        dg = formatSnapshot(mgr, snap, oldSnap, list(client.zoneIds))
+        client.received.append(bytes(dg.getMessage()))
+    return len(clients)
+
+
+def sendGrouped(mgr, snap, snaps, clients, pool):
+    # the same grouping as ServerRepository.takeTickSnapshot()
+    groups = {}
+    for client in clients:
+        oldSnap = snaps.get(snap.getTickCount() - client.ackLag)
+        zoneIds = frozenset(client.zoneIds)
+        if oldSnap is not None:
+            key = (oldSnap.getTickCount(), zoneIds)
+        else:
+            key = (None, zoneIds)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (oldSnap, list(zoneIds), [])
+        group[2].append(client)
+
+    groups = list(groups.values())
+    if pool is not None and len(groups) > 1:
+        dgs = list(pool.map(
+            lambda group: formatSnapshot(mgr, snap, group[0], group[1]),
+            groups))
+    else:
+        dgs = [formatSnapshot(mgr, snap, oldSnap, zoneIds)
+               for oldSnap, zoneIds, groupClients in groups]
+
+    for dg, (oldSnap, zoneIds, groupClients) in zip(dgs, groups):
+        for client in groupClients:
+            client.received.append(bytes(dg.getMessage()))
+    return len(groups)
+
+
+def runBenchmark(numClients, seed = 1):
+    dcFile = DCFile()
+    if not dcFile.read(StringStream(BenchDC.encode()), 'SnapshotBenchmark.dc'):
+        raise RuntimeError('could not read the benchmark dc file')
+    dclass = dcFile.getClassByName('BenchObject')
+
+    rng = random.Random(seed)
+    objects = [BenchObject(doId, rng.randrange(NumZones), rng)
+               for doId in range(1, NumObjects + 1)]
+    areas = [rng.sample(range(NumZones), ZonesPerArea) for i in range(NumAreas)]
+
+    methods = (('per client', sendPerClient, None),
+               ('grouped', sendGrouped, None),
+               ('grouped, %s threads' % NumThreads, sendGrouped,
+                ThreadPoolExecutor(NumThreads)))
+    clientsByMethod = []
+    for name, send, pool in methods:
+        clientRng = random.Random(seed)
+        clientsByMethod.append([BenchClient(clientRng.choice(areas), clientRng.choice(AckLags))
+                                for i in range(numClients)])
+    times = [0.] * len(methods)
+    numFormatted = [0] * len(methods)
+
+    mgr = FrameSnapshotManager()
+    snaps = {}
+    for tick in range(1, NumTicks + 1):
+        for obj in objects:
+            obj.update(rng)
+        snap = FrameSnapshot(tick, len(objects))
+        for i, obj in enumerate(objects):
+            mgr.packObjectInSnapshot(snap, i, obj, obj.doId, obj.zoneId, dclass)
+        snaps[tick] = snap
+        snaps.pop(tick - max(AckLags) - 1, None)
+
+        for m, (name, send, pool) in enumerate(methods):
+            startT = time.perf_counter()
+            numFormatted[m] += send(mgr, snap, snaps, clientsByMethod[m], pool)
+            times[m] += time.perf_counter() - startT
+
+    for name, send, pool in methods:
+        if pool is not None:
+            pool.shutdown()
+
+    # every method must have sent each client the same bytes
+    identical = True
+    for clients in clientsByMethod[1:]:
+        for client, expected in zip(clients, clientsByMethod[0]):
+            if client.received != expected.received:
+                identical = False
+
+    print('%s clients, %s objects, %s ticks:' % (numClients, NumObjects, NumTicks))
+    for m, (name, send, pool) in enumerate(methods):
+        print('  %-22s %8.2f ms/tick, %6.1f snapshots formatted/tick' % (
+            name, times[m] * 1000. / NumTicks, numFormatted[m] / float(NumTicks)))
+    print('  datagrams identical: %s' % (identical))
+    return identical
+
+
+if __name__ == '__main__':
+    ok = True
+    for numClients in ClientCounts:
+        if not runBenchmark(numClients):
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -261,6 +261,11 @@ client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
   // Indicate this is *not* a delta snapshot.
   dg.add_uint8(0);
 
+  // Nothing below touches Python objects, so let other threads run while
+  // the snapshot is formatted.  The ServerRepository formats the snapshots
+  // for different clients on several threads at once.
+  Py_BEGIN_ALLOW_THREADS
+
   int num_objects = 0;
   Datagram object_dg;
   for (int i = 0; i < snapshot->get_num_valid_entries(); i++) {
@@ -288,6 +293,8 @@ client_format_snapshot(Datagram &dg, FrameSnapshot *snapshot,
 
   // Copy object data onto main datagram
   dg.append_data(object_dg.get_data(), object_dg.get_length());
+
+  Py_END_ALLOW_THREADS
 }
 
 /**
@@ -311,6 +318,9 @@ client_format_delta_snapshot(Datagram &dg, FrameSnapshot *from, FrameSnapshot *t
   // Indicate this is a delta snapshot.
   dg.add_uint8(1);
 
+  // As above, the snapshot is formatted without holding the GIL.
+  Py_BEGIN_ALLOW_THREADS
+
   int num_objects = 0;
   Datagram object_dg;
   for (int i = 0; i < to->get_num_valid_entries(); i++) {
@@ -365,4 +375,6 @@ client_format_delta_snapshot(Datagram &dg, FrameSnapshot *from, FrameSnapshot *t
 
   // Copy object data onto main datagram
   dg.append_data(object_dg.get_data(), object_dg.get_length());
+
+  Py_END_ALLOW_THREADS
 }
@@ -46,6 +46,12 @@ Code overview:
     - derived class default values override parent class defaults
     - derived class handler functions override parent class functions
 
+    Which of the optiondefs are new options, which only supply a handler
+    for an option a derived class already defined, and which are component
+    options depends only on the widget class and the names in its
+    optiondefs, so defineoptions() works this out once per class and
+    caches it in DirectGuiBase._optionPlans.
+
 4)  Superclass initialization methods are called (resulting in nested calls
     to define options (see 2 above)
 
@@ -101,9 +107,31 @@ from direct.task import Task
 guiObjectCollector = PStatCollector("Client::GuiObjects")
 
 
+class _OptionPlan:
+    # How to merge one call's worth of optionDefs into _optionInfo; see
+    # DirectGuiBase.defineoptions().
+    __slots__ = ('actions', 'newNames')
+
+    # what to do with each option
+    NEW = 0         # it isn't defined yet
+    HANDLER = 1     # a derived class already defined it; it may only
+                    # supply the handler
+    COMPONENT = 2   # it is of the form "component_option"
+
+    def __init__(self, actions):
+        # (name, action) for each of the optionDefs
+        self.actions = actions
+        self.newNames = frozenset([name for name, action in actions
+                                   if action == self.NEW])
+
+
 class DirectGuiBase(DirectObject.DirectObject):
     """Base class of all DirectGUI widgets."""
 
+    # (previous plan or class, number of optionDefs)->_OptionPlan, shared
+    # by all widgets; see defineoptions()
+    _optionPlans = {}
+
     def __init__(self):
         # Default id of all gui object, subclasses should override this
         self.guiId = 'guiObject'
@@ -182,12 +210,102 @@ class DirectGuiBase(DirectObject.DirectObject):
                 tmp[option] = [value, 0]
             self._constructorKeywords = tmp
             self._optionInfo = {}
+            self._optionPlan = None
         # Initialize dictionary of dynamic groups
         if not hasattr(self, '_dynamicGroups'):
             self._dynamicGroups = ()
         self._dynamicGroups = self._dynamicGroups + tuple(dynamicGroups)
         # Reconcile command line and default options
-        self.addoptions(optionDefs, keywords)
+        prevPlan = getattr(self, '_optionPlan', False)
+        if prevPlan is False:
+            self.addoptions(optionDefs, keywords)
+            return
+
+        # Which options are new depends only on the option names given
+        # to each of the calls so far, so we can look up what to do with
+        # each one, keyed on the plan of the previous call (or the class,
+        # for the first call).  Since the optionDefs are built anew by
+        # each constructor, the key just uses their number, and the names
+        # are checked as we go.
+        key = (prevPlan or self.__class__, len(optionDefs))
+        plan = self._optionPlans.get(key)
+        if plan is None:
+            plan = self.__makeOptionPlan(optionDefs)
+            self._optionPlans[key] = plan
+        self.__applyOptionPlan(plan, optionDefs, keywords)
+
+    def __makeOptionPlan(self, optionDefs):
+        defined = set(self._optionInfo)
+        actions = []
+        for optionDef in optionDefs:
+            name = optionDef[0]
+            if '_' in name:
+                actions.append((name, _OptionPlan.COMPONENT))
+            elif name in defined:
+                actions.append((name, _OptionPlan.HANDLER))
+            else:
+                actions.append((name, _OptionPlan.NEW))
+                defined.add(name)
+        return _OptionPlan(tuple(actions))
+
+    def __applyOptionPlan(self, plan, optionDefs, optionkeywords):
+        # Does the same as addoptions(), but without having to look up
+        # each option to see what to do with it.
+        optionInfo = self._optionInfo
+        keywords = self._constructorKeywords
+        NEW = _OptionPlan.NEW
+        HANDLER = _OptionPlan.HANDLER
+        FUNCTION = DGG._OPT_FUNCTION
+
+        numDone = 0
+        for optionDef, (name, action) in zip(optionDefs, plan.actions):
+            if optionDef[0] is not name and optionDef[0] != name:
+                # This widget's options differ from the ones the plan
+                # was made for.
+                break
+            if action == NEW:
+                default = optionDef[1]
+                optionInfo[name] = [default, default, optionDef[2]]
+            elif action == HANDLER:
+                info = optionInfo[name]
+                if info[FUNCTION] is None:
+                    info[FUNCTION] = optionDef[2]
+            elif name not in keywords:
+                keywords[name] = [optionDef[1], 0]
+            numDone += 1
+
+        # Apply the keywords to the new options.
+        newNames = plan.newNames
+        if numDone < len(optionDefs):
+            newNames = newNames.intersection([optionDef[0] for optionDef in optionDefs[:numDone]])
+        if optionkeywords:
+            DEFAULT = DGG._OPT_DEFAULT
+            VALUE = DGG._OPT_VALUE
+            for name, default in optionkeywords.items():
+                if name in newNames:
+                    info = optionInfo[name]
+                    info[DEFAULT] = default
+                    info[VALUE] = default
+        if keywords:
+            VALUE = DGG._OPT_VALUE
+            for name in [name for name in keywords if name in newNames]:
+                # Overridden by keyword; delete it from
+                # self._constructorKeywords
+                optionInfo[name][VALUE] = keywords.pop(name)[0]
+
+        if numDone < len(optionDefs):
+            # Do the rest the slow way; this also stops using plans for
+            # the rest of this widget's options.
+            self.addoptions(optionDefs[numDone:], optionkeywords)
+        else:
+            self._optionPlan = plan
+
+    @classmethod
+    def clearOptionPlans(cls):
+        # Forgets the cached option plans, for instance after changing a
+        # widget class's options at runtime.  A plan whose option names
+        # don't match is not used anyway, but it isn't replaced either.
+        DirectGuiBase._optionPlans.clear()
 
     def addoptions(self, optionDefs, optionkeywords):
         """ addoptions(optionDefs) - add option def to option info """
@@ -195,6 +313,10 @@ class DirectGuiBase(DirectObject.DirectObject):
         # method to call when the value is changed.  See
         # "defineoptions" for more details
 
+        # The options no longer follow a cached plan, so later calls to
+        # defineoptions() can't use one either.
+        self._optionPlan = False
+
         # optimisations:
         optionInfo = self._optionInfo
         optionInfo_has_key = optionInfo.__contains__
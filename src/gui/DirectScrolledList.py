@@ -13,6 +13,7 @@ from direct.directnotify import DirectNotifyGlobal
 from direct.task.Task import Task
 from .DirectFrame import *
 from .DirectButton import *
+from collections import OrderedDict
 
 
 class DirectScrolledListItem(DirectButton):
@@ -59,7 +60,19 @@ class DirectScrolledList(DirectFrame):
            as needed, simply pass in an items list of strings (type 'str')
            and when that item is needed, itemMakeFunction will be called
            with the text, the index, and itemMakeExtraArgs.  If itemMakeFunction
-           is not specified, it will create a DirectFrame with the text."""
+           is not specified, it will create a DirectFrame with the text.
+
+           For long lists, pass virtual = 1.  Then 'items' may be a list
+           of any kind of data, and only numItemsVisible + numCachedItems
+           widgets are ever made, with itemMakeFunction as above.  As the
+           list scrolls, the widgets are reused for the rows that come
+           into view: itemBindFunction is called with the widget, the
+           item and its index to update the widget to show the item.  If
+           itemBindFunction is not specified, the widget's text is set to
+           str(item).  The cached widgets stay bound to the rows that
+           most recently scrolled out of view, so that scrolling back
+           doesn't have to bind them again.  Since the widgets change, it
+           is best to use forceHeight with a virtual list."""
 
         # if 'items' is a list of strings, make a copy for our use
         # so we can modify it without mangling the user's list
@@ -74,6 +87,17 @@ class DirectScrolledList(DirectFrame):
 
         self.nextItemID = 10
 
+        # for a virtual list: index->widget for the visible rows, and for
+        # the rows whose widgets are cached (least recently shown first),
+        # and the widgets that aren't bound to any row
+        self.__shownWidgets = {}
+        self.__cachedWidgets = OrderedDict()
+        self.__spareWidgets = []
+        self.__numWidgets = 0
+        # the index and the data of the selected row of a virtual list
+        self.__selectedRow = None
+        self.__selectedItem = None
+
         # Inherits from DirectFrame
         optiondefs = (
             # Define type of DirectGuiWidget
@@ -89,6 +113,9 @@ class DirectScrolledList(DirectFrame):
             ('forceHeight',        None,      self.setForceHeight),
             ('incButtonCallback',  None,      self.setIncButtonCallback),
             ('decButtonCallback',  None,      self.setDecButtonCallback),
+            ('virtual',            0,         DGG.INITOPT),
+            ('itemBindFunction',   None,      None),
+            ('numCachedItems',     2,         DGG.INITOPT),
             )
         # Merge keyword options with default options
         self.defineoptions(kw, optiondefs)
@@ -109,9 +136,10 @@ class DirectScrolledList(DirectFrame):
         self.itemFrame = self.createcomponent("itemFrame", (), None,
                                               DirectFrame, (self,),
                                               )
-        for item in self["items"]:
-            if not isinstance(item, str):
-                item.reparentTo(self.itemFrame)
+        if not self['virtual']:
+            for item in self["items"]:
+                if not isinstance(item, str):
+                    item.reparentTo(self.itemFrame)
 
         self.initialiseoptions(DirectScrolledList)
         self.recordMaxHeight()
@@ -125,6 +153,10 @@ class DirectScrolledList(DirectFrame):
         assert self.notify.debugStateCall(self)
         if self.__forceHeight is not None:
             self.maxHeight = self.__forceHeight
+        elif self['virtual']:
+            self.maxHeight = 0.0
+            for widget in self.__getWidgets():
+                self.maxHeight = max(self.maxHeight, widget.getHeight())
         else:
             self.maxHeight = 0.0
             for item in self["items"]:
@@ -152,6 +184,10 @@ class DirectScrolledList(DirectFrame):
             self.__incButtonCallback = None
         if self.__decButtonCallback:
             self.__decButtonCallback = None
+        # the virtual list's widgets are destroyed with the itemFrame
+        self.__shownWidgets = {}
+        self.__cachedWidgets = OrderedDict()
+        self.__spareWidgets = []
         self.incButton.destroy()
         self.decButton.destroy()
         DirectFrame.destroy(self)
@@ -162,6 +198,10 @@ class DirectScrolledList(DirectFrame):
             self.currentSelected['state']=DGG.NORMAL
         item['state']=DGG.DISABLED
         self.currentSelected=item
+        if self['virtual']:
+            # remember the row, since the widget will be reused
+            self.__selectedRow = item.itemIndex
+            self.__selectedItem = self['items'][item.itemIndex]
 
     def scrollBy(self, delta):
         assert self.notify.debugStateCall(self)
@@ -176,7 +216,7 @@ class DirectScrolledList(DirectFrame):
         if len(self["items"]) == 0:
             return 0
 
-        if isinstance(self["items"][0], str):
+        if self['virtual'] or isinstance(self["items"][0], str):
             self.notify.warning("getItemIndexForItemID: cant find itemID for non-class list items!")
             return 0
 
@@ -240,6 +280,13 @@ class DirectScrolledList(DirectFrame):
 
         #print "self.index set to ", self.index
 
+        if self['virtual']:
+            self.__showRows(numItemsVisible)
+            if self['command']:
+                # Pass any extra args to command
+                self['command'](*self['extraArgs'])
+            return ret
+
         # Hide them all
         for item in self["items"]:
             if not isinstance(item, str):
@@ -276,8 +323,107 @@ class DirectScrolledList(DirectFrame):
             self['command'](*self['extraArgs'])
         return ret
 
+    def __getWidgets(self):
+        # returns all of the widgets of a virtual list
+        return (list(self.__shownWidgets.values()) +
+                list(self.__cachedWidgets.values()) + self.__spareWidgets)
+
+    def __showRows(self, numItemsVisible):
+        # Makes sure each visible row of a virtual list has a widget bound
+        # to it.  This only visits the visible rows and their widgets, so
+        # it takes the same time however long the list is.
+        items = self["items"]
+        first = self.index
+        last = min(len(items), first + numItemsVisible)
+        shownWidgets = self.__shownWidgets
+        cachedWidgets = self.__cachedWidgets
+
+        # Widgets that have scrolled out of view are hidden, but stay
+        # bound to their rows in case they scroll back.
+        for i in list(shownWidgets.keys()):
+            if i < first or i >= last:
+                widget = shownWidgets.pop(i)
+                widget.hide()
+                cachedWidgets[i] = widget
+
+        for i in range(first, last):
+            if i not in shownWidgets:
+                widget = cachedWidgets.pop(i, None)
+                if widget is None:
+                    widget = self.__getFreeWidget(items[i], i, numItemsVisible)
+                    self.__bindWidget(widget, items[i], i)
+                    if self.__forceHeight is None:
+                        self.maxHeight = max(self.maxHeight, widget.getHeight())
+                widget.show()
+                shownWidgets[i] = widget
+
+        # Then stack them, now that we know how tall they are.
+        for i in range(first, last):
+            shownWidgets[i].setPos(0, 0, -(i - first) * self.maxHeight)
+
+    def __getFreeWidget(self, item, i, numItemsVisible):
+        if self.__spareWidgets:
+            return self.__spareWidgets.pop()
+        if self.__numWidgets < numItemsVisible + self['numCachedItems'] or \
+           not self.__cachedWidgets:
+            # make a new widget
+            if self['itemMakeFunction']:
+                widget = self['itemMakeFunction'](item, i, self['itemMakeExtraArgs'])
+            else:
+                widget = DirectFrame(text = '',
+                                     text_align = self['itemsAlign'],
+                                     text_wordwrap = self['itemsWordwrap'],
+                                     relief = None)
+            widget.reparentTo(self.itemFrame)
+            self.__numWidgets += 1
+            return widget
+        # reuse the widget of the row that was shown least recently
+        i, widget = self.__cachedWidgets.popitem(last = False)
+        return widget
+
+    def __bindWidget(self, widget, item, i):
+        widget.itemIndex = i
+        if self['itemBindFunction']:
+            self['itemBindFunction'](widget, item, i)
+        else:
+            widget['text'] = str(item)
+        if isinstance(widget, DirectScrolledListItem):
+            if i == self.__selectedRow:
+                widget['state'] = DGG.DISABLED
+                self.currentSelected = widget
+            else:
+                widget['state'] = DGG.NORMAL
+                if getattr(self, "currentSelected", None) is widget:
+                    del self.currentSelected
+
+    def __findSelectedRow(self):
+        # returns the index that the selected row of a virtual list has
+        # now that its items have changed, or None if it is gone
+        if self.__selectedRow is None:
+            return None
+        items = self['items']
+        selectedItem = self.__selectedItem
+        if self.__selectedRow < len(items) and items[self.__selectedRow] is selectedItem:
+            return self.__selectedRow
+        for i, item in enumerate(items):
+            if item is selectedItem:
+                return i
+        return None
+
+    def __unbindAllWidgets(self):
+        # called when a virtual list's items change, since the rows may
+        # have moved
+        for widget in list(self.__shownWidgets.values()) + list(self.__cachedWidgets.values()):
+            widget.hide()
+            self.__spareWidgets.append(widget)
+        self.__shownWidgets = {}
+        self.__cachedWidgets = OrderedDict()
+
     def makeAllItems(self):
         assert self.notify.debugStateCall(self)
+        if self['virtual']:
+            # there is nothing to make ahead of time
+            return
         for i in range(len(self['items'])):
             item = self["items"][i]
             # If the item is a 'str', then it has not been created
@@ -349,6 +495,13 @@ class DirectScrolledList(DirectFrame):
         Add this string and extraArg to the list
         """
         assert self.notify.debugStateCall(self)
+        if self['virtual']:
+            # the items are only data; appending one doesn't move any
+            # rows, so there's no need to unbind the widgets
+            self['items'].append(item)
+            if refresh:
+                self.scrollTo(self.index)
+            return None
         if not isinstance(item, str):
             # cant add attribs to non-classes (like strings & ints)
             item.itemID = self.nextItemID
@@ -373,7 +526,7 @@ class DirectScrolledList(DirectFrame):
             if hasattr(self, "currentSelected") and self.currentSelected is item:
                 del self.currentSelected
             self["items"].remove(item)
-            if not isinstance(item, str):
+            if not self['virtual'] and not isinstance(item, str):
                 item.reparentTo(ShowBaseGlobal.hidden)
             self.refresh()
             return 1
@@ -388,10 +541,11 @@ class DirectScrolledList(DirectFrame):
         if item in self["items"]:
             if hasattr(self, "currentSelected") and self.currentSelected is item:
                 del self.currentSelected
-            if (hasattr(item, 'destroy') and hasattr(item.destroy, '__call__')):
+            if (not self['virtual'] and hasattr(item, 'destroy') and
+                hasattr(item.destroy, '__call__')):
                 item.destroy()
             self["items"].remove(item)
-            if not isinstance(item, str):
+            if not self['virtual'] and not isinstance(item, str):
                 item.reparentTo(ShowBaseGlobal.hidden)
             self.refresh()
             return 1
@@ -413,7 +567,7 @@ class DirectScrolledList(DirectFrame):
             if hasattr(self, "currentSelected") and self.currentSelected is item:
                 del self.currentSelected
             self["items"].remove(item)
-            if not isinstance(item, str):
+            if not self['virtual'] and not isinstance(item, str):
                 #RAU possible leak here, let's try to do the right thing
                 #item.reparentTo(ShowBaseGlobal.hidden)
                 item.removeNode()
@@ -435,10 +589,11 @@ class DirectScrolledList(DirectFrame):
             item = self['items'][0]
             if hasattr(self, "currentSelected") and self.currentSelected is item:
                 del self.currentSelected
-            if (hasattr(item, 'destroy') and hasattr(item.destroy, '__call__')):
+            if (not self['virtual'] and hasattr(item, 'destroy') and
+                hasattr(item.destroy, '__call__')):
                 item.destroy()
             self["items"].remove(item)
-            if not isinstance(item, str):
+            if not self['virtual'] and not isinstance(item, str):
                 #RAU possible leak here, let's try to do the right thing
                 #item.reparentTo(ShowBaseGlobal.hidden)
                 item.removeNode()
@@ -453,6 +608,15 @@ class DirectScrolledList(DirectFrame):
         or changing properties that would affect the scrolling
         """
         assert self.notify.debugStateCall(self)
+        if self['virtual']:
+            self.__unbindAllWidgets()
+            # keep the selection on the same row, if it is still there
+            self.__selectedRow = self.__findSelectedRow()
+            if self.__selectedRow is None:
+                self.__selectedItem = None
+                if hasattr(self, "currentSelected"):
+                    self.currentSelected['state'] = DGG.NORMAL
+                    del self.currentSelected
         self.recordMaxHeight()
         #print "refresh called"
         self.scrollTo(self.index)
@@ -463,6 +627,12 @@ class DirectScrolledList(DirectFrame):
 
     def getSelectedText(self):
         assert self.notify.debugStateCall(self)
+        if self['virtual']:
+          # the text of the data row, as shown without an
+          # itemBindFunction; None if the list is empty
+          if self.index >= len(self['items']):
+            return None
+          return str(self['items'][self.index])
         if isinstance(self['items'][self.index], str):
           return self['items'][self.index]
         else:
@@ -0,0 +1,66 @@
+"""DirectScrolledListBenchmark module: times scrolling a DirectScrolledList
+of many rows, as an ordinary list of strings, whose items are made into
+DirectFrames as they come into view, and as a virtual list, which only
+has widgets for the visible rows and a few more.
+
+Each list is scrolled a row at a time from top to bottom, and then to
+random rows; the number of widgets each list has made is counted after.
+
+Run it with: python -m direct.gui.DirectScrolledListBenchmark
+"""
+
+__all__ = []
+
+from direct.showbase.ShowBase import ShowBase
+
+from .DirectScrolledList import DirectScrolledList
+
+import random
+import time
+
+RowCounts = (1000, 10000)
+NumItemsVisible = 10
+NumRandomScrolls = 200
+ItemHeight = 0.1
+
+
+def runBenchmark(numRows, virtual, seed = 1):
+    rng = random.Random(seed)
+    items = ['row %s' % (i) for i in range(numRows)]
+
+    startT = time.perf_counter()
+    scrolledList = DirectScrolledList(items = items,
+                                      numItemsVisible = NumItemsVisible,
+                                      forceHeight = ItemHeight,
+                                      virtual = virtual)
+    createT = time.perf_counter() - startT
+
+    numSteps = numRows - NumItemsVisible
+    startT = time.perf_counter()
+    for i in range(numSteps):
+        scrolledList.scrollBy(1)
+    stepT = time.perf_counter() - startT
+
+    startT = time.perf_counter()
+    for i in range(NumRandomScrolls):
+        scrolledList.scrollTo(rng.randrange(numRows))
+    jumpT = time.perf_counter() - startT
+
+    numWidgets = scrolledList.itemFrame.getNumChildren()
+    scrolledList.destroy()
+    return (createT * 1000., stepT * 1e6 / numSteps,
+            jumpT * 1e6 / NumRandomScrolls, numWidgets)
+
+
+if __name__ == '__main__':
+    base = ShowBase(windowType = 'none')
+    modes = ((False, 'strings'),
+             (True, 'virtual'))
+    for numRows in RowCounts:
+        print('%s rows, %s visible:' % (numRows, NumItemsVisible))
+        for virtual, name in modes:
+            createMs, stepUs, jumpUs, numWidgets = runBenchmark(numRows, virtual)
+            print('  %-8s create %8.2f ms, %9.1f us/scrollBy, '
+                  '%9.1f us/scrollTo, %6s widgets' % (
+                      name, createMs, stepUs, jumpUs, numWidgets))
+    base.destroy()
@@ -26,4 +26,5 @@ from .SoundInterval import *
 from .ProjectileInterval import *
 from .MetaInterval import *
 from .IntervalManager import *
+from .IntervalPool import *
 from panda3d.direct import WaitInterval
@@ -8,6 +8,7 @@ from panda3d.direct import *
 from direct.directnotify.DirectNotifyGlobal import *
 from direct.showbase import EventManager
 import fnmatch
+import re
 
 class IntervalManager(CIntervalManager):
 
@@ -16,6 +17,15 @@ class IntervalManager(CIntervalManager):
     # the Python extensions is to add support for Python-based
     # intervals (like MetaIntervals).
 
+    # For getCostsByPrefix(), each run of digits in an interval's name
+    # is replaced with '#', so that "Sequence-12" and "Sequence-34" are
+    # counted together.
+    costPrefixPattern = re.compile(r'\d+')
+
+    # A low-priority interval is not deferred by the frame budget for
+    # more than this many frames in a row.
+    maxDeferFrames = 4
+
     def __init__(self, globalPtr = 0):
         # Pass globalPtr == 1 to the constructor to trick it into
         # "constructing" a Python wrapper around the global
@@ -32,6 +42,25 @@ class IntervalManager(CIntervalManager):
         self.ivals = []
         self.removedIvals = {}
 
+        # If cost accounting is on, step() records the time spent in
+        # the C++ step and in the Python callbacks, and the time spent
+        # on each interval's Python callbacks.
+        self.costAccounting = ConfigVariableBool('interval-cost-accounting', False).getValue()
+        # If there is a frame budget, in seconds, the events of
+        # intervals flagged lowPriority are deferred to the next frame
+        # once step() has taken longer than the budget.
+        budget = ConfigVariableDouble('interval-frame-budget-ms', 0).getValue()
+        self.frameBudget = budget / 1000. if budget > 0 else None
+        self.__clock = ClockObject.getGlobalClock()
+        # name->[count, totalTime, maxTime]
+        self.__costs = {}
+        # index->number of frames in a row its events have been deferred
+        self.__deferCounts = {}
+        self.cStepTime = 0.
+        self.pythonTime = 0.
+        self.numSteps = 0
+        self.numDeferred = 0
+
     def addInterval(self, interval):
         index = self.addCInterval(interval, 1)
         self.__storeInterval(interval, index)
@@ -42,6 +71,7 @@ class IntervalManager(CIntervalManager):
             self.removeCInterval(index)
             if index < len(self.ivals):
                 self.ivals[index] = None
+            self.__deferCounts.pop(index, None)
             return 1
         return 0
 
@@ -91,8 +121,20 @@ class IntervalManager(CIntervalManager):
         # This method should be called once per frame to perform all
         # of the per-frame processing on the active intervals.
         # Call C++ step, then do the Python stuff.
+        if not self.costAccounting and self.frameBudget is None:
+            CIntervalManager.step(self)
+            self.__doPythonCallbacks()
+            return
+
+        clock = self.__clock
+        startTime = clock.getRealTime()
         CIntervalManager.step(self)
-        self.__doPythonCallbacks()
+        pythonStartTime = clock.getRealTime()
+        self.__doPythonCallbacks(startTime)
+        if self.costAccounting:
+            self.cStepTime += pythonStartTime - startTime
+            self.pythonTime += clock.getRealTime() - pythonStartTime
+            self.numSteps += 1
 
     def interrupt(self):
         # This method should be called during an emergency cleanup
@@ -102,12 +144,14 @@ class IntervalManager(CIntervalManager):
         CIntervalManager.interrupt(self)
         self.__doPythonCallbacks()
 
-    def __doPythonCallbacks(self):
+    def __doPythonCallbacks(self, startTime = None):
         # This method does all of the required Python post-processing
         # after performing some C++-level action.
         # It is important to call all of the python callbacks on the
         # just-removed intervals before we call any of the callbacks
         # on the still-running intervals.
+        # startTime is the time step() began, if the frame budget
+        # applies.
         index = self.getNextRemoval()
         while index >= 0:
             # We have to clear the interval first before we call
@@ -115,13 +159,35 @@ class IntervalManager(CIntervalManager):
             # try to add a new interval.
             ival = self.ivals[index]
             self.ivals[index] = None
-            ival.privPostEvent()
+            if self.__deferCounts:
+                self.__deferCounts.pop(index, None)
+            self.__postEvent(ival)
             index = self.getNextRemoval()
 
-        index = self.getNextEvent()
-        while index >= 0:
-            self.ivals[index].privPostEvent()
+        if startTime is None or self.frameBudget is None:
             index = self.getNextEvent()
+            while index >= 0:
+                self.__postEvent(self.ivals[index])
+                index = self.getNextEvent()
+        else:
+            deadline = startTime + self.frameBudget
+            deferCounts = self.__deferCounts
+            index = self.getNextEvent()
+            while index >= 0:
+                ival = self.ivals[index]
+                if getattr(ival, 'lowPriority', 0) and \
+                   deferCounts.get(index, 0) < self.maxDeferFrames and \
+                   self.__clock.getRealTime() > deadline:
+                    # Over budget; its events stay queued until the
+                    # next frame.
+                    deferCounts[index] = deferCounts.get(index, 0) + 1
+                    self.numDeferred += 1
+                    self.skipEvent()
+                else:
+                    if deferCounts:
+                        deferCounts.pop(index, None)
+                    self.__postEvent(ival)
+                index = self.getNextEvent()
 
         # Finally, throw all the events on the custom event queue.
         # These are the done events that may have been generated in
@@ -130,6 +196,103 @@ class IntervalManager(CIntervalManager):
         # queue to be serviced (which might not be till next frame).
         self.MyEventmanager.doEvents()
 
+    def __postEvent(self, ival):
+        if not self.costAccounting:
+            ival.privPostEvent()
+            return
+        clock = self.__clock
+        startTime = clock.getRealTime()
+        ival.privPostEvent()
+        self.accountCost(ival.getName(), clock.getRealTime() - startTime)
+
+    def setCostAccounting(self, costAccounting):
+        self.costAccounting = costAccounting
+
+    def setFrameBudget(self, frameBudget):
+        # frameBudget is in seconds, or None for no budget
+        self.frameBudget = frameBudget
+        if frameBudget is None:
+            self.__deferCounts = {}
+
+    def accountCost(self, name, cost):
+        # Records cost seconds spent on the named interval.  This is
+        # called by step(), and by MetaInterval for its Python
+        # intervals, so a MetaInterval's cost includes theirs.
+        record = self.__costs.get(name)
+        if record is None:
+            record = self.__costs[name] = [0, 0., 0.]
+        record[0] += 1
+        record[1] += cost
+        if cost > record[2]:
+            record[2] = cost
+
+    def getCosts(self):
+        """
+        Returns a dictionary of interval name -> (count, totalTime,
+        maxTime) for the time spent in each interval's Python callbacks
+        since cost accounting was turned on, or resetCosts() was last
+        called.  The time C++ intervals spend in their own privStep()
+        is not broken down; it is counted in cStepTime as a whole.
+        """
+        return dict((name, tuple(record))
+                    for name, record in self.__costs.items())
+
+    def getCostsByPrefix(self):
+        # As getCosts(), but grouped by name prefix; see
+        # costPrefixPattern.
+        costs = {}
+        for name, (count, totalTime, maxTime) in self.__costs.items():
+            prefix = self.costPrefixPattern.sub('#', name)
+            record = costs.get(prefix)
+            if record is None:
+                costs[prefix] = [count, totalTime, maxTime]
+            else:
+                record[0] += count
+                record[1] += totalTime
+                record[2] = max(record[2], maxTime)
+        return dict((prefix, tuple(record))
+                    for prefix, record in costs.items())
+
+    def resetCosts(self):
+        self.__costs = {}
+        self.cStepTime = 0.
+        self.pythonTime = 0.
+        self.numSteps = 0
+        self.numDeferred = 0
+
+    def getIntervalCounts(self):
+        # Returns the number of active intervals that need Python to
+        # run, and the number that run entirely in C++.
+        numPython = 0
+        numC = 0
+        for index in range(self.getMaxIndex()):
+            if not self.getCInterval(index):
+                continue
+            if index < len(self.ivals) and \
+               getattr(self.ivals[index], 'inPython', 0):
+                numPython += 1
+            else:
+                numC += 1
+        return {'python': numPython, 'c': numC}
+
+    def getCostReport(self, numEntries = 10):
+        # Returns a human-readable summary of the recorded costs, with
+        # the most expensive name prefixes first.
+        numSteps = max(self.numSteps, 1)
+        counts = self.getIntervalCounts()
+        s = ('IntervalManager: %s steps, %.3f ms/frame in C++, %.3f ms/frame in Python, '
+             '%s deferred; %s Python and %s C++ intervals active' % (
+            self.numSteps, self.cStepTime * 1000. / numSteps,
+            self.pythonTime * 1000. / numSteps, self.numDeferred,
+            counts['python'], counts['c']))
+        costs = self.getCostsByPrefix()
+        prefixes = sorted(costs, key = lambda prefix: -costs[prefix][1])
+        for prefix in prefixes[:numEntries]:
+            count, totalTime, maxTime = costs[prefix]
+            s += '\n  %s: %s calls, %.3f ms total, %.3f ms max' % (
+                prefix, count, totalTime * 1000., maxTime * 1000.)
+        return s
+
 
     def __storeInterval(self, interval, index):
         while index >= len(self.ivals):
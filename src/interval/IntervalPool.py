@@ -0,0 +1,132 @@
+"""IntervalPool module: contains the IntervalPool class.
+
+Constructing a LerpInterval and throwing it away every time an object is
+nudged to a new position costs an allocation and a C++ wrapper per call.
+An IntervalPool keeps the intervals that are given back to it, and
+retargets them instead of making new ones.
+"""
+
+__all__ = ['IntervalPool']
+
+from panda3d.core import NodePath
+from direct.directnotify.DirectNotifyGlobal import directNotify
+
+
+class IntervalPool:
+    """
+    Hands out LerpNodePathIntervals of the single-property kinds (pos,
+    hpr, scale, color and so on; see LerpNodePathInterval.retarget()).
+
+    acquire() returns an interval of the requested class set up to lerp
+    the given node, reusing one that has been released if there is one.
+    The caller plays it as usual.  The pool doesn't keep track of the
+    intervals it hands out without a key: when the caller is done with
+    one, it gives it back with release(), and must not use it after
+    that, since it may be handed out to someone else.  One that is
+    never released is simply garbage collected, like any interval.
+
+    If a key is given, the pool keeps one interval per (class, key), and
+    acquiring it again interrupts and retargets that interval, even if
+    it is still playing.  This suits the common case of a single lerp
+    per object that is restarted every time the object's target changes;
+    use the object's doId, or the NodePath itself, as the key.  The pool
+    holds on to a keyed interval, and so to its node, until it is
+    released, so the object must call releaseKey() when it is deleted.
+
+    Example::
+
+        pool = IntervalPool()
+        ...
+        ival = pool.acquire(LerpPosInterval, self, 0.2, newPos, key = self)
+        ival.start()
+        ...
+        # in the object's delete()
+        pool.releaseKey(self)
+    """
+    notify = directNotify.newCategory("IntervalPool")
+
+    def __init__(self, maxFree = 64):
+        # the number of free intervals of each class to keep
+        self.maxFree = maxFree
+        # cls->[ival], the intervals of each class that are free to reuse
+        self._free = {}
+        # (cls, key)->ival
+        self._keyed = {}
+        self.numCreated = 0
+        self.numReused = 0
+
+    def destroy(self):
+        for ival in self._keyed.values():
+            ival.pause()
+        self._free = {}
+        self._keyed = {}
+
+    def acquire(self, cls, nodePath, duration, end, start = None,
+                blendType = 'noBlend', other = None, key = None):
+        """
+        Returns an interval of class cls that lerps nodePath to end (and
+        from start, if it is given) over duration seconds, as if it had
+        been constructed with those parameters.
+        """
+        if key is not None:
+            ival = self._keyed.get((cls, key))
+            if ival is not None:
+                ival.pause()
+                self.numReused += 1
+                ival.retarget(nodePath, start, end, duration, blendType, other)
+                return ival
+        ival = self._getFree(cls)
+        if ival is None:
+            self.numCreated += 1
+            ival = cls(nodePath, duration, end, other = other,
+                       blendType = blendType)
+            if start is not None:
+                # not passed to the constructor, since LerpQuatInterval
+                # takes its start as an hpr there
+                getattr(ival, ival.retargetSetters[0])(start)
+        else:
+            self.numReused += 1
+            ival.retarget(nodePath, start, end, duration, blendType, other)
+
+        if key is not None:
+            self._keyed[(cls, key)] = ival
+        return ival
+
+    def release(self, ival, key = None):
+        """Returns an interval to the pool, stopping it if it is still
+        playing.  If it was acquired with a key, the same key must be
+        given here."""
+        if key is not None:
+            if self._keyed.get((ival.__class__, key)) is not ival:
+                return
+            del self._keyed[(ival.__class__, key)]
+        free = self._free.setdefault(ival.__class__, [])
+        for freeIval in free:
+            if freeIval is ival:
+                # already released
+                return
+        ival.pause()
+        # clear the node, so the pool doesn't keep it alive
+        ival.setNode(NodePath())
+        if len(free) < self.maxFree:
+            free.append(ival)
+
+    def releaseKey(self, key):
+        """Releases the intervals of every class acquired with the given
+        key.  Call this when the object the key stands for is deleted."""
+        for cls, ivalKey in list(self._keyed.keys()):
+            if ivalKey == key:
+                self.release(self._keyed[(cls, ivalKey)], key)
+
+    def _getFree(self, cls):
+        free = self._free.get(cls)
+        if free:
+            return free.pop()
+        return None
+
+    def getStats(self):
+        return {'created': self.numCreated,
+                'reused': self.numReused,
+                'free': sum(len(free) for free in self._free.values()),
+                'keyed': len(self._keyed),
+                }
@@ -30,6 +30,11 @@ class LerpNodePathInterval(CLerpNodePathInterval):
     # affect a property on a NodePath, like pos or hpr.
     lerpNodePathNum = 1
 
+    # The names of the start and end setters for the property lerped by
+    # a derived class, for retarget().  This is None for the classes
+    # that lerp more than one property.
+    retargetSetters = None
+
     def __init__(self, name, duration, blendType, bakeInStart, fluid,
                  nodePath, other):
         if name == None:
@@ -51,6 +56,48 @@ class LerpNodePathInterval(CLerpNodePathInterval):
         CLerpNodePathInterval.__init__(self, name, duration, blendType,
                                        bakeInStart, fluid, nodePath, other)
 
+    def retarget(self, nodePath, start, end, duration = None,
+                 blendType = None, other = None):
+        """
+        Re-parameterizes this interval to lerp the indicated node from
+        start to end, so that it can be reused instead of constructing a
+        new interval.  start may be None, to start from the node's value
+        at the time the interval is played, as with the constructor;
+        duration and blendType are unchanged if they are None.  Unlike
+        the constructor, this does not accept functors for start or end.
+
+        The interval must not be playing; if it was paused partway, it is
+        reset to its initial state, without lerping the node back to its
+        start.  If it is part of a MetaInterval that has already been
+        played, the MetaInterval's timeline is updated to match the new
+        duration; see also MetaInterval.retargetInterval().
+        """
+        if self.retargetSetters is None:
+            raise TypeError('%s cannot be retargeted' % (self.__class__.__name__))
+        assert not self.isPlaying()
+        assert not self.anyCallable(start, end)
+        setStart, setEnd = self.retargetSetters
+
+        # it starts over as a new interval that hasn't been played
+        self.clearToInitial()
+        self.setNode(nodePath)
+        if other == None:
+            other = NodePath()
+        self.setOther(other)
+        self.clearStart()
+        getattr(self, setEnd)(end)
+        if start != None:
+            getattr(self, setStart)(start)
+        if duration != None:
+            self.setDuration(duration)
+        if blendType != None:
+            blendType = self.stringBlendType(blendType)
+            assert blendType != self.BTInvalid
+            self.setBlendType(blendType)
+        # any functors passed to the constructor are superseded
+        self.paramSetup = 0
+        self.inPython = 0
+
     def anyCallable(self, *params):
         # Returns true if any of the parameters listed is a callable
         # functor, false if none of them are.  This is used by derived
@@ -100,6 +147,8 @@ class LerpNodePathInterval(CLerpNodePathInterval):
 #####################################################################
 
 class LerpPosInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartPos', 'setEndPos')
+
     def __init__(self, nodePath, duration, pos, startPos = None,
                  other = None, blendType = 'noBlend',
                  bakeInStart = 1, fluid = 0, name = None):
@@ -127,6 +176,8 @@ class LerpPosInterval(LerpNodePathInterval):
 
 
 class LerpHprInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartHpr', 'setEndHpr')
+
     def __init__(self, nodePath, duration, hpr,
                  startHpr = None, startQuat = None,
                  other = None, blendType = 'noBlend',
@@ -158,6 +209,8 @@ class LerpHprInterval(LerpNodePathInterval):
         LerpNodePathInterval.privDoEvent(self, t, event)
 
 class LerpQuatInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartQuat', 'setEndQuat')
+
     def __init__(self, nodePath, duration, quat = None,
                  startHpr = None, startQuat = None,
                  other = None, blendType = 'noBlend',
@@ -196,6 +249,8 @@ class LerpQuatInterval(LerpNodePathInterval):
         LerpNodePathInterval.privDoEvent(self, t, event)
 
 class LerpScaleInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartScale', 'setEndScale')
+
     def __init__(self, nodePath, duration, scale, startScale = None,
                  other = None, blendType = 'noBlend',
                  bakeInStart = 1, fluid = 0, name = None):
@@ -221,6 +276,8 @@ class LerpScaleInterval(LerpNodePathInterval):
         LerpNodePathInterval.privDoEvent(self, t, event)
 
 class LerpShearInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartShear', 'setEndShear')
+
     def __init__(self, nodePath, duration, shear, startShear = None,
                  other = None, blendType = 'noBlend',
                  bakeInStart = 1, fluid = 0, name = None):
@@ -636,6 +693,8 @@ class LerpPosQuatScaleShearInterval(LerpNodePathInterval):
         LerpNodePathInterval.privDoEvent(self, t, event)
 
 class LerpColorInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartColor', 'setEndColor')
+
     def __init__(self, nodePath, duration, color, startColor = None,
                  other = None, blendType = 'noBlend',
                  bakeInStart = 1, name = None, override = None):
@@ -648,6 +707,8 @@ class LerpColorInterval(LerpNodePathInterval):
             self.setOverride(override)
 
 class LerpColorScaleInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartColorScale', 'setEndColorScale')
+
     def __init__(self, nodePath, duration, colorScale, startColorScale = None,
                  other = None, blendType = 'noBlend',
                  bakeInStart = 1, name = None, override = None):
@@ -660,6 +721,8 @@ class LerpColorScaleInterval(LerpNodePathInterval):
             self.setOverride(override)
 
 class LerpTexOffsetInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartTexOffset', 'setEndTexOffset')
+
     def __init__(self, nodePath, duration, texOffset, startTexOffset = None,
                  other = None, blendType = 'noBlend',
                  textureStage = None,
@@ -675,6 +738,8 @@ class LerpTexOffsetInterval(LerpNodePathInterval):
             self.setOverride(override)
 
 class LerpTexRotateInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartTexRotate', 'setEndTexRotate')
+
     def __init__(self, nodePath, duration, texRotate, startTexRotate = None,
                  other = None, blendType = 'noBlend',
                  textureStage = None,
@@ -690,6 +755,8 @@ class LerpTexRotateInterval(LerpNodePathInterval):
             self.setOverride(override)
 
 class LerpTexScaleInterval(LerpNodePathInterval):
+    retargetSetters = ('setStartTexScale', 'setEndTexScale')
+
     def __init__(self, nodePath, duration, texScale, startTexScale = None,
                  other = None, blendType = 'noBlend',
                  textureStage = None,
@@ -62,6 +62,14 @@ class MetaInterval(CMetaInterval):
             autoFinish = kw['autoFinish']
             del kw['autoFinish']
 
+        # If the keyword "lowPriority" is defined to non-zero, the
+        # IntervalManager may defer the interval's Python callbacks to
+        # the next frame when it is over its frame budget.
+        self.lowPriority = 0
+        if 'lowPriority' in kw:
+            self.lowPriority = kw['lowPriority']
+            del kw['lowPriority']
+
         # A duration keyword specifies the duration the interval will
         # appear to have for the purposes of computing the start time
         # for subsequent intervals in a sequence or track.
@@ -338,6 +346,21 @@ class MetaInterval(CMetaInterval):
         else:
             self.notify.error("Not an Interval: %s" % (ival,))
 
+    def retargetInterval(self, ival, *args, **kw):
+        # Calls ival.retarget() with the given arguments, for an
+        # interval somewhere within this MetaInterval, which should be
+        # the root of its hierarchy.  An ordinary C++ interval notifies
+        # us of its new duration on its own, so the compiled interval
+        # list is kept as it is; but one that is run in Python was
+        # added with its old duration, so the list must be rebuilt
+        # before we are played again.
+        assert not self.isPlaying()
+        wasInPython = (not isinstance(ival, CInterval) or
+                       getattr(ival, "inPython", 0))
+        ival.retarget(*args, **kw)
+        if wasInPython or getattr(ival, "inPython", 0):
+            self.__ivalsDirty = 1
+
     # Functions to support automatic playback of MetaIntervals along
     # with all of their associated Python callbacks:
 
@@ -485,6 +508,7 @@ class MetaInterval(CMetaInterval):
         # that must be invoked through this interface.
 
         ival = None
+        costAccounting = getattr(self.__manager, 'costAccounting', 0)
         try:
             while (self.isEventReady()):
                 index = self.getEventIndex()
@@ -493,8 +517,16 @@ class MetaInterval(CMetaInterval):
                 self.popEvent()
 
                 ival = self.pythonIvals[index]
-                ival.privDoEvent(t, eventType)
-                ival.privPostEvent()
+                if costAccounting:
+                    clock = ClockObject.getGlobalClock()
+                    startTime = clock.getRealTime()
+                    ival.privDoEvent(t, eventType)
+                    ival.privPostEvent()
+                    self.__manager.accountCost(
+                        ival.getName(), clock.getRealTime() - startTime)
+                else:
+                    ival.privDoEvent(t, eventType)
+                    ival.privPostEvent()
                 ival = None
         except:
             if ival != None:
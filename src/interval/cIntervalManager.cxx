@@ -318,6 +318,21 @@ get_next_event() {
   return -1;
 }
 
+/**
+ * May be called by the scripting language in place of servicing the interval
+ * most recently returned by get_next_event(), to leave its events pending
+ * until after the next call to step().  The following call to
+ * get_next_event() will move on to the next interval.
+ */
+void CIntervalManager::
+skip_event() {
+  MutexHolder holder(_lock);
+
+  if (_next_event_index < (int)_intervals.size()) {
+    _next_event_index++;
+  }
+}
+
 /**
  * This should be called by the scripting language after each call to step().
  * It returns the index number of an interval that was recently removed, or -1
@@ -55,6 +55,7 @@ PUBLISHED:
 
   void step();
   int get_next_event();
+  void skip_event();
   int get_next_removal();
 
   void output(std::ostream &out) const;
@@ -37,6 +37,8 @@ public:
 
 PUBLISHED:
   INLINE BlendType get_blend_type() const;
+  INLINE void set_blend_type(BlendType blend_type);
+  INLINE void set_duration(double duration);
 
   static BlendType string_blend_type(const std::string &blend_type);
 
@@ -31,7 +31,10 @@ PUBLISHED:
                                  const NodePath &node, const NodePath &other);
 
   INLINE const NodePath &get_node() const;
+  INLINE void set_node(const NodePath &node);
   INLINE const NodePath &get_other() const;
+  INLINE void set_other(const NodePath &other);
+  INLINE void clear_start();
 
   INLINE void set_start_pos(const LVecBase3 &pos);
   INLINE void set_end_pos(const LVecBase3 &pos);
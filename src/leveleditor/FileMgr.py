@@ -1,6 +1,8 @@
 import os
 import imp
 
+from . import LevelFile
+
 
 class FileMgr:
     """ To handle data file """
@@ -9,6 +11,8 @@ class FileMgr:
         self.editor = editor
 
     def saveToFile(self, fileName):
+        if LevelFile.isLevelFile(fileName):
+            return self.saveToLevelFile(fileName)
         try:
             f = open(fileName, 'w')
             f.write("from panda3d.core import *\n")
@@ -39,7 +43,42 @@ class FileMgr:
             if f:
                 f.close()
 
+    def saveToLevelFile(self, fileName):
+        extras = {
+            'keyFramesInfo': self.editor.animMgr.keyFramesInfo,
+            'curveAnimation': self.editor.animMgr.curveAnimation,
+            'layers': self.editor.ui.layerEditorUI.getLayers(),
+            }
+        try:
+            LevelFile.writeLevelFile(fileName, self.editor.objectMgr.getSaveRecords(), extras)
+            self.editor.updateStatusReadout('Sucessfully saved to %s'%fileName)
+            self.editor.fNeedToSave = False
+        except IOError:
+            print('failed to save %s'%fileName)
+
+    def loadFromLevelFile(self, fileName):
+        try:
+            reader = LevelFile.LevelFileReader(fileName)
+        except (IOError, ValueError):
+            print('failed to load %s'%fileName)
+            return
+        try:
+            self.editor.ui.sceneGraphUI.reset()
+            self.editor.animMgr.keyFramesInfo = reader.getExtra('keyFramesInfo', {})
+            self.editor.animMgr.curveAnimation = reader.getExtra('curveAnimation', {})
+            objects = {}
+            for chunk in reader.getChunks():
+                for record in reader.readChunk(chunk):
+                    self.editor.objectMgr.addObjectFromRecord(record, objects)
+            self.editor.ui.layerEditorUI.setLayers(reader.getExtra('layers', []))
+        finally:
+            reader.close()
+        self.editor.updateStatusReadout('Sucessfully opened file %s'%fileName)
+        self.editor.fNeedToSave = False
+
     def loadFromFile(self, fileName):
+        if LevelFile.isLevelFile(fileName):
+            return self.loadFromLevelFile(fileName)
         dirname, moduleName = os.path.split(fileName)
         if moduleName.endswith('.py'):
             moduleName = moduleName[:-3]
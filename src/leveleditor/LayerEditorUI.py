@@ -251,6 +251,24 @@ class LayerEditorUI(wx.Panel):
             for j in range(len(layerData)):
                 self.saveData.append("    ui.layerEditorUI.addLayerData(%s, '%s')"%(layersDataDictKeys[i], layerData[j]))
 
+    def getLayers(self):
+        # returns the layers as [(name, idx, [objUID, ...]), ...]
+        layers = []
+        for index in range(self.llist.GetItemCount()):
+            idx = self.llist.GetItemData(index)
+            layers.append((self.llist.GetItemText(index), idx,
+                           list(self.layersDataDict.get(idx, []))))
+        return layers
+
+    def setLayers(self, layers):
+        # restores the layers returned by getLayers()
+        self.reset()
+        for name, idx, layerData in layers:
+            self.addLayerEntry(name, idx)
+        for name, idx, layerData in layers:
+            for objUID in layerData:
+                self.addLayerData(idx, objUID)
+
     def getSaveData(self):
         self.saveData = []
         self.traverse()
@@ -478,7 +478,7 @@ class LevelEditorUIBase(WxPandaShell):
         self.editor.reset()
 
     def onOpen(self, evt=None):
-        dialog = wx.FileDialog(None, "Choose a file", os.getcwd(), "", "*.py", style = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+        dialog = wx.FileDialog(None, "Choose a file", os.getcwd(), "", "*.py;*.lvl", style = wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
         if dialog.ShowModal() == wx.ID_OK:
             self.editor.load(dialog.GetPath())
             self.editor.setTitleWithFilename(dialog.GetPath())
@@ -486,13 +486,13 @@ class LevelEditorUIBase(WxPandaShell):
 
     def onSave(self, evt=None):
         if self.editor.currentFile is None or\
-           not self.editor.currentFile.endswith('.py'):
+           not self.editor.currentFile.endswith(('.py', '.lvl')):
             return self.onSaveAs(evt)
         else:
             self.editor.save()
 
     def onSaveAs(self, evt):
-        dialog = wx.FileDialog(None, "Choose a file", os.getcwd(), "", "*.py", style = wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+        dialog = wx.FileDialog(None, "Choose a file", os.getcwd(), "", "*.py;*.lvl", style = wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
         result = True
         if dialog.ShowModal() == wx.ID_OK:
             self.editor.saveAs(dialog.GetPath())
@@ -0,0 +1,488 @@
+"""
+Defines the binary level file format, an alternative to saving a level as
+a Python script.
+
+A level file holds the same objects as the script would create, but as
+data, grouped into chunks by the XY grid cell of each top-level object, so
+that a game can load the chunks nearest the player first, or only the ones
+within some radius, a few objects per frame.
+
+The file starts with a 4-byte magic number and the size of the header,
+followed by the header: the format version, the extra data (see
+writeLevelFile()), the chunk size, a table of the strings used by the
+records (type names, models, anims and object names), and the table of
+chunks, giving each chunk's cell, number of records, and where its
+zlib-compressed records are in the rest of the file.
+"""
+
+import ast
+import zlib
+
+from panda3d import core
+from panda3d.core import Datagram, DatagramIterator, Filename, ModelNode, NodePath, Point3
+from direct.task.TaskManagerGlobal import taskMgr
+
+LevelFileExtension = '.lvl'
+
+Magic = b'PLVL'
+# Version 1 wrote the float members with the build's stdfloat width;
+# since version 2 they are always 64-bit.
+Version = 2
+
+# the default size of the XY cells that the objects are grouped by
+DefaultChunkSize = 100.
+
+# the kinds of record
+RecordObject = 0
+RecordCurve = 1
+
+
+def isLevelFile(fileName):
+    return str(fileName).endswith(LevelFileExtension)
+
+
+# The Panda types that a saved value may be made of, as their repr()
+# writes them, eg. LPoint3f(1, 2, 3).
+_ValueTypeNames = frozenset(
+    [short + size + suffix
+     for short in ('VBase', 'Vec', 'Point')
+     for size in '234'
+     for suffix in ('', 'F', 'D')] +
+    [long + size + suffix
+     for long in ('LVecBase', 'LVector', 'LPoint')
+     for size in '234'
+     for suffix in ('', 'f', 'd', 'i')] +
+    ['Quat', 'QuatF', 'QuatD', 'LQuaternion', 'LQuaternionf', 'LQuaterniond',
+     'LColor', 'LColorf', 'LColord'])
+
+
+def _evalValue(valueStr):
+    # The values are written with repr().  Most are plain Python
+    # literals; the rest are Panda vector types, as in the Python level
+    # format.  Those are parsed here, rather than evaluated, so that a
+    # level file can't run code: only the types above may be called, and
+    # only with numbers.
+    try:
+        tree = ast.parse(valueStr.strip(), mode = 'eval')
+    except SyntaxError:
+        raise ValueError('malformed level file value: %r' % (valueStr))
+    return _convertNode(tree.body, valueStr)
+
+
+def _convertNode(node, valueStr):
+    if isinstance(node, ast.Call):
+        func = node.func
+        if not isinstance(func, ast.Name) or func.id not in _ValueTypeNames or \
+           node.keywords or not hasattr(core, func.id):
+            raise ValueError('unsupported type in level file value: %r' % (valueStr))
+        args = [_convertNode(arg, valueStr) for arg in node.args]
+        for arg in args:
+            if isinstance(arg, bool) or not isinstance(arg, (int, float)):
+                raise ValueError('malformed level file value: %r' % (valueStr))
+        return getattr(core, func.id)(*args)
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+        items = [_convertNode(elt, valueStr) for elt in node.elts]
+        if isinstance(node, ast.Tuple):
+            return tuple(items)
+        if isinstance(node, ast.Set):
+            return set(items)
+        return items
+    if isinstance(node, ast.Dict):
+        if None in node.keys:
+            raise ValueError('malformed level file value: %r' % (valueStr))
+        return dict((_convertNode(key, valueStr), _convertNode(value, valueStr))
+                    for key, value in zip(node.keys, node.values))
+    # anything else must be a literal, such as a string, a number (which
+    # may be negative), True or None
+    return ast.literal_eval(node)
+
+
+def writeLevelFile(fileName, records, extras = None, chunkSize = DefaultChunkSize):
+    """
+    Writes the records returned by ObjectMgrBase.getSaveRecords() to the
+    named file.  extras is a dictionary of strings to Python values for
+    whatever else is saved along with the objects, such as the editor's
+    layers; the values are written with repr().
+    """
+    strings = [None]
+    string2index = {None: 0}
+
+    def stringIndex(s):
+        index = string2index.get(s)
+        if index is None:
+            index = string2index[s] = len(strings)
+            strings.append(s)
+        return index
+
+    # each record goes into the chunk of its top-level ancestor, so that a
+    # chunk never refers to a parent that is in another chunk
+    uid2cell = {}
+    cell2records = {}
+    for record in records:
+        parentId = record['parentId']
+        if parentId is not None and parentId in uid2cell:
+            cell = uid2cell[parentId]
+        else:
+            pos = record['pos']
+            cell = (int(pos[0] // chunkSize), int(pos[1] // chunkSize))
+        uid2cell[record['uid']] = cell
+        cell2records.setdefault(cell, []).append(record)
+
+    chunks = []
+    for cell in sorted(cell2records.keys()):
+        dg = Datagram()
+        for record in cell2records[cell]:
+            _writeRecord(dg, record, stringIndex)
+        chunks.append((cell, len(cell2records[cell]),
+                       zlib.compress(bytes(dg.getMessage()))))
+
+    header = Datagram()
+    header.addUint16(Version)
+    extras = extras or {}
+    header.addString32(repr(dict((key, repr(value))
+                                 for key, value in extras.items())))
+    header.addFloat64(chunkSize)
+    header.addUint32(len(strings) - 1)
+    for s in strings[1:]:
+        header.addString32(s)
+    header.addUint32(len(chunks))
+    offset = 0
+    for (cellX, cellY), numRecords, data in chunks:
+        header.addInt32(cellX)
+        header.addInt32(cellY)
+        header.addUint32(numRecords)
+        header.addUint64(offset)
+        header.addUint32(len(data))
+        offset += len(data)
+
+    prefix = Datagram()
+    prefix.appendData(Magic)
+    prefix.addUint32(header.getLength())
+    f = open(Filename(fileName).toOsSpecific(), 'wb')
+    try:
+        f.write(bytes(prefix.getMessage()))
+        f.write(bytes(header.getMessage()))
+        for cell, numRecords, data in chunks:
+            f.write(data)
+    finally:
+        f.close()
+
+
+def _writeRecord(dg, record, stringIndex):
+    curveInfo = record.get('curveInfo')
+    if curveInfo is None:
+        dg.addUint8(RecordObject)
+    else:
+        dg.addUint8(RecordCurve)
+    dg.addString(record['uid'])
+    dg.addString(record['parentId'] or '')
+    dg.addUint32(stringIndex(record['typeName']))
+    dg.addUint32(stringIndex(record['model']))
+    dg.addUint32(stringIndex(record['anim']))
+    dg.addUint32(stringIndex(record['name']))
+    for vec in (record['pos'], record['hpr'], record['scale']):
+        for value in vec:
+            dg.addFloat64(value)
+    for value in record['rgba']:
+        dg.addFloat32(value)
+    if curveInfo is None:
+        dg.addString32(repr(record['props']))
+    else:
+        dg.addUint16(record['degree'])
+        dg.addUint32(len(curveInfo))
+        for index, pos in curveInfo:
+            dg.addInt32(index)
+            for value in pos:
+                dg.addFloat64(value)
+
+
+class LevelFileReader:
+    """
+    Reads a file written by writeLevelFile().  The header is read when the
+    reader is created; each chunk is read only when readChunk() is called
+    for it.
+    """
+
+    def __init__(self, fileName):
+        self.fileName = Filename(fileName)
+        self.file = open(self.fileName.toOsSpecific(), 'rb')
+        prefix = self.file.read(8)
+        if prefix[:4] != Magic:
+            self.file.close()
+            raise ValueError('%s is not a level file' % (fileName))
+        headerSize = DatagramIterator(Datagram(prefix[4:])).getUint32()
+        dgi = DatagramIterator(Datagram(self.file.read(headerSize)))
+        self.dataStart = 8 + headerSize
+
+        version = dgi.getUint16()
+        if version > Version:
+            self.file.close()
+            raise ValueError('%s is a newer level file (version %s)' % (fileName, version))
+        self.version = version
+        self.extras = ast.literal_eval(dgi.getString32())
+        self.chunkSize = dgi.getFloat64()
+        self.strings = [None]
+        for i in range(dgi.getUint32()):
+            self.strings.append(dgi.getString32())
+        # each chunk is (cellX, cellY, numRecords, offset, size)
+        self.chunks = []
+        for i in range(dgi.getUint32()):
+            self.chunks.append((dgi.getInt32(), dgi.getInt32(), dgi.getUint32(),
+                                dgi.getUint64(), dgi.getUint32()))
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def getExtra(self, key, default = None):
+        if key not in self.extras:
+            return default
+        return _evalValue(self.extras[key])
+
+    def getNumRecords(self):
+        return sum(chunk[2] for chunk in self.chunks)
+
+    def getChunks(self, center = None, radius = None):
+        """
+        Returns the chunks, nearest to center first if it is given.  If a
+        radius is given too, only the chunks whose cells come within that
+        distance of center are returned.
+        """
+        if center is None:
+            return list(self.chunks)
+        chunkSize = self.chunkSize
+        cx, cy = center[0], center[1]
+        result = []
+        for chunk in self.chunks:
+            # the distance from center to the nearest point of the cell
+            minX = chunk[0] * chunkSize
+            minY = chunk[1] * chunkSize
+            dx = max(minX - cx, 0., cx - (minX + chunkSize))
+            dy = max(minY - cy, 0., cy - (minY + chunkSize))
+            distSq = dx * dx + dy * dy
+            if radius is None or distSq <= radius * radius:
+                result.append((distSq, chunk))
+        result.sort(key = lambda entry: entry[0])
+        return [chunk for distSq, chunk in result]
+
+    def getModels(self, chunks = None):
+        # returns the models used by the given chunks (or all of them)
+        models = set()
+        for chunk in (self.chunks if chunks is None else chunks):
+            for record in self.readChunk(chunk):
+                if record['model']:
+                    models.add(record['model'])
+        return sorted(models)
+
+    def readChunk(self, chunk):
+        # returns the records in the chunk, in the order they were saved
+        self.file.seek(self.dataStart + chunk[3])
+        data = zlib.decompress(self.file.read(chunk[4]))
+        dgi = DatagramIterator(Datagram(data))
+        if self.version >= 2:
+            getFloat = dgi.getFloat64
+        else:
+            getFloat = dgi.getStdfloat
+        strings = self.strings
+        records = []
+        for i in range(chunk[2]):
+            kind = dgi.getUint8()
+            record = {
+                'uid': dgi.getString(),
+                'parentId': dgi.getString() or None,
+                'typeName': strings[dgi.getUint32()],
+                'model': strings[dgi.getUint32()],
+                'anim': strings[dgi.getUint32()],
+                'name': strings[dgi.getUint32()],
+                'pos': Point3(getFloat(), getFloat(), getFloat()),
+                'hpr': Point3(getFloat(), getFloat(), getFloat()),
+                'scale': Point3(getFloat(), getFloat(), getFloat()),
+                'rgba': (dgi.getFloat32(), dgi.getFloat32(), dgi.getFloat32(), dgi.getFloat32()),
+                'props': None,
+                'curveInfo': None,
+                'degree': None,
+                }
+            if kind == RecordObject:
+                record['props'] = _evalValue(dgi.getString32())
+            else:
+                record['degree'] = dgi.getUint16()
+                curveInfo = []
+                for j in range(dgi.getUint32()):
+                    index = dgi.getInt32()
+                    curveInfo.append((index, Point3(getFloat(), getFloat(), getFloat())))
+                record['curveInfo'] = curveInfo
+            records.append(record)
+        return records
+
+
+class LevelModelCache:
+    """
+    Loads each model used by a level once, and hands out instances of it:
+    each object gets its own copy of the model's top node, for its own
+    transform and tags, with the rest of the model instanced below it
+    under a node of its own.  ObjectMgrBase.updateObjectColor() sets the
+    color on the children of the top node, so it lands on that node and
+    not on the shared ones.  Set it as the modelCache of an ObjectMgr to
+    use it.
+
+    Since the instances share the nodes below that one, this should only
+    be used when the objects' models aren't going to be changed, as in a game; and
+    ObjectMgrBase.flatten() should not modify the model.
+    """
+
+    def __init__(self, loader = None):
+        if loader is None:
+            loader = base.loader
+        self.loader = loader
+        # model path->NodePath, or None if it couldn't be loaded
+        self.models = {}
+        self.numInstances = 0
+
+    def destroy(self):
+        for model in self.models.values():
+            if model is not None:
+                model.removeNode()
+        self.models = {}
+
+    def preload(self, modelPaths, callback = None):
+        """Loads the models that aren't loaded yet, asynchronously if a
+        callback is given; the callback is called with no arguments when
+        they are all loaded."""
+        modelPaths = [modelPath for modelPath in modelPaths
+                      if modelPath not in self.models]
+        if callback is None:
+            for modelPath in modelPaths:
+                self.getModel(modelPath)
+            return None
+        if not modelPaths:
+            callback()
+            return None
+
+        def gotModels(models):
+            for modelPath, model in zip(modelPaths, models):
+                if modelPath not in self.models:
+                    self.models[modelPath] = model
+            callback()
+        return self.loader.loadModel(modelPaths, callback = gotModels)
+
+    def getModel(self, modelPath):
+        if modelPath in self.models:
+            return self.models[modelPath]
+        model = self.loader.loadModel(modelPath, okMissing = True)
+        if model is None:
+            model = self.loader.loadModel(Filename.fromOsSpecific(modelPath).getFullpath(),
+                                          okMissing = True)
+        self.models[modelPath] = model
+        return model
+
+    def getInstance(self, modelPath):
+        model = self.getModel(modelPath)
+        if model is None:
+            return None
+        instance = NodePath(model.node().makeCopy())
+        # the per-object state set on the children of the top node goes
+        # on this one, which isn't shared with the other instances
+        holder = ModelNode(model.getName())
+        holder.setPreserveTransform(ModelNode.PTLocal)
+        holderNP = instance.attachNewNode(holder)
+        for child in model.getChildren():
+            child.instanceTo(holderNP)
+        self.numInstances += 1
+        return instance
+
+
+class LevelFileLoader:
+    """
+    Adds the objects in a level file to an ObjectMgr, a chunk at a time,
+    recordsPerFrame objects per frame, nearest to center first if it is
+    given (and only within radius of it, if that is given too).  If
+    modelCache is given, the models of each chunk are preloaded
+    asynchronously before its objects are added.  When all of them have
+    been added, doneCallback is called with the dictionary of uid->
+    NodePath of the objects.
+    """
+
+    def __init__(self, objectMgr, fileName, doneCallback = None,
+                 recordsPerFrame = 100, center = None, radius = None,
+                 modelCache = None, taskName = None):
+        self.objectMgr = objectMgr
+        self.reader = LevelFileReader(fileName)
+        self.doneCallback = doneCallback
+        self.recordsPerFrame = recordsPerFrame
+        self.modelCache = modelCache
+        self.objects = {}
+        self.chunks = self.reader.getChunks(center, radius)
+        self.numRecords = sum(chunk[2] for chunk in self.chunks)
+        self.numLoaded = 0
+        self._records = []
+        self._waitingForModels = False
+        self._loadCb = None
+        if taskName is None:
+            taskName = 'levelFileLoader-%s' % (id(self))
+        self.taskName = taskName
+
+    def start(self):
+        taskMgr.add(self._loadTask, self.taskName)
+
+    def loadAll(self):
+        # adds all of the objects now, instead of over several frames
+        while not self.isDone():
+            if not self._records:
+                self._records = self.reader.readChunk(self.chunks.pop(0))
+                if self.modelCache is not None:
+                    self.modelCache.preload(self._getModels(self._records))
+            self._addRecords(len(self._records))
+        self._finish()
+        return self.objects
+
+    def cancel(self):
+        taskMgr.remove(self.taskName)
+        if self._loadCb is not None:
+            self._loadCb.cancel()
+            self._loadCb = None
+        self.reader.close()
+
+    def isDone(self):
+        return not self._records and not self.chunks
+
+    def getProgress(self):
+        if self.numRecords == 0:
+            return 1.
+        return self.numLoaded / float(self.numRecords)
+
+    def _getModels(self, records):
+        return set(record['model'] for record in records if record['model'])
+
+    def _modelsLoaded(self):
+        self._loadCb = None
+        self._waitingForModels = False
+
+    def _addRecords(self, numRecords):
+        records = self._records[:numRecords]
+        del self._records[:numRecords]
+        for record in records:
+            self.objectMgr.addObjectFromRecord(record, self.objects)
+        self.numLoaded += len(records)
+
+    def _loadTask(self, task):
+        if self._waitingForModels:
+            return task.cont
+        if not self._records:
+            if not self.chunks:
+                self._finish()
+                return task.done
+            self._records = self.reader.readChunk(self.chunks.pop(0))
+            if self.modelCache is not None:
+                self._waitingForModels = True
+                self._loadCb = self.modelCache.preload(
+                    self._getModels(self._records), self._modelsLoaded)
+                if self._waitingForModels:
+                    return task.cont
+        self._addRecords(self.recordsPerFrame)
+        return task.cont
+
+    def _finish(self):
+        self.reader.close()
+        if self.doneCallback:
+            self.doneCallback(self.objects)
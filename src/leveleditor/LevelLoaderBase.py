@@ -1,5 +1,8 @@
+import os
 import imp
 
+from . import LevelFile
+
 class LevelLoaderBase:
     """
     Base calss for LevelLoader
@@ -22,10 +25,25 @@ class LevelLoaderBase:
         del base.objectHandler
         del base.objectMgr
 
-    def loadFromFile(self, fileName, filePath=None):
+    def loadFromFile(self, fileName, filePath=None, callback=None, **kw):
+        """
+        Loads a level saved by the level editor, either as a Python
+        script or as a binary level file (see LevelFile.py).
+
+        A binary level file is loaded all at once if no callback is
+        given, and the dictionary of uid->NodePath of its objects is
+        returned.  Otherwise its objects are added over the next frames,
+        and callback is called with the dictionary of uid->NodePath of
+        the objects when they are all added; the LevelFileLoader that
+        does this is returned.  Any extra keyword arguments, such as
+        recordsPerFrame, center and radius, are passed on to it.
+        """
         if filePath is None:
             filePath = self.defaultPath
 
+        if LevelFile.isLevelFile(fileName):
+            return self.loadFromLevelFile(os.path.join(filePath, fileName), callback, **kw)
+
         if fileName.endswith('.py'):
             fileName = fileName[:-3]
         file, pathname, description = imp.find_module(fileName, [filePath])
@@ -35,3 +53,18 @@ class LevelLoaderBase:
         except:
             print('failed to load %s'%fileName)
             return None
+
+    def loadFromLevelFile(self, fileName, callback=None, **kw):
+        # the models are shared by the objects that use them
+        if base.objectMgr.modelCache is None:
+            base.objectMgr.modelCache = LevelFile.LevelModelCache()
+        kw.setdefault('modelCache', base.objectMgr.modelCache)
+        try:
+            levelLoader = LevelFile.LevelFileLoader(base.objectMgr, fileName, callback, **kw)
+        except (IOError, ValueError):
+            print('failed to load %s'%fileName)
+            return None
+        if callback is None:
+            return levelLoader.loadAll()
+        levelLoader.start()
+        return levelLoader
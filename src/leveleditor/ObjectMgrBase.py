@@ -32,6 +32,10 @@ class ObjectMgrBase:
         self.currNodePath = None
         self.currLiveNP = None
 
+        # when set to a LevelFile.LevelModelCache, the models of simple
+        # objects are instanced from it instead of loaded for each object
+        self.modelCache = None
+
         self.Actor = []
         self.findActors(render)
         self.Nodes = []
@@ -213,10 +217,13 @@ class ObjectMgrBase:
                     # since this obj is simple model let's load the model
                     if model is None:
                         model = objDef.model
-                    try:
-                        newobjModel = loader.loadModel(model)
-                    except:
-                        newobjModel = loader.loadModel(Filename.fromOsSpecific(model).getFullpath(), okMissing=True)
+                    if self.modelCache is not None:
+                        newobjModel = self.modelCache.getInstance(model)
+                    else:
+                        try:
+                            newobjModel = loader.loadModel(model)
+                        except:
+                            newobjModel = loader.loadModel(Filename.fromOsSpecific(model).getFullpath(), okMissing=True)
                     if newobjModel:
                         self.flatten(newobjModel, model, objDef, uid)
                         newobj = PythonNodePath(newobjModel)
@@ -490,7 +497,8 @@ class ObjectMgrBase:
                child.getName() != 'bboxLines':
                 child.setTransparency(1)
                 child.setColorScale(r, g, b, a)
-        self.editor.fNeedToSave = True
+        if self.editor:
+            self.editor.fNeedToSave = True
 
     def updateObjectModel(self, model, obj, fSelectObject=True):
         """ replace object's model """
@@ -732,7 +740,42 @@ class ObjectMgrBase:
 
         if obj:
             for propName in propValues:
-                self.updateObjectPropValue(obj, propName, propValues[propName])
+                self.updateObjectPropValue(obj, propName, propValues[propName],
+                                           fUndo=self.editor is not None)
+
+    def getSaveRecord(self, obj, parentId = None):
+        """
+        Returns the data to save for an object, as a dictionary
+        """
+        np = obj[OG.OBJ_NP]
+        objDef = obj[OG.OBJ_DEF]
+
+        record = {
+            'uid': obj[OG.OBJ_UID],
+            'typeName': objDef.name,
+            'model': obj[OG.OBJ_MODEL] or None,
+            'anim': obj[OG.OBJ_ANIM] or None,
+            'name': None,
+            'parentId': parentId or None,
+            'pos': np.getPos(),
+            'hpr': np.getHpr(),
+            'scale': np.getScale(),
+            'rgba': obj[OG.OBJ_RGBA],
+            'props': obj[OG.OBJ_PROP],
+            'curveInfo': None,
+            'degree': None,
+            }
+
+        if objDef.named:
+            record['name'] = np.getName()
+
+        if objDef.name == '__Curve__':
+            #transfer the curve information from control nodes into simple positions for file save
+            record['curveInfo'] = [(item[0], item[1].getPos()) for item in obj[OG.OBJ_PROP]['curveInfo']]
+            record['degree'] = obj[OG.OBJ_PROP]['Degree']
+            record['props'] = None
+
+        return record
 
     def traverse(self, parent, parentId = None):
         """
@@ -743,59 +786,95 @@ class ObjectMgrBase:
                 obj = self.findObjectByNodePath(child)
 
                 if obj:
-                    uid = obj[OG.OBJ_UID]
-                    np = obj[OG.OBJ_NP]
-                    objDef = obj[OG.OBJ_DEF]
-                    objModel = obj[OG.OBJ_MODEL]
-                    objAnim = obj[OG.OBJ_ANIM]
-                    objProp = obj[OG.OBJ_PROP]
-                    objRGBA = obj[OG.OBJ_RGBA]
+                    record = self.getSaveRecord(obj, parentId)
+                    uid = record['uid']
+                    objRGBA = record['rgba']
 
                     if parentId:
                         parentStr = "objects['%s']"%parentId
                     else:
                         parentStr = "None"
 
-                    if objModel:
-                        modelStr = "'%s'"%objModel
+                    if record['model']:
+                        modelStr = "'%s'"%record['model']
                     else:
                         modelStr = "None"
 
-                    if objAnim:
-                        animStr = "'%s'"%objAnim
+                    if record['anim']:
+                        animStr = "'%s'"%record['anim']
                     else:
                         animStr = "None"
 
-                    if objDef.named:
-                        nameStr = "'%s'"%np.getName()
+                    if record['name'] is not None:
+                        nameStr = "'%s'"%record['name']
                     else:
                         nameStr = "None"
 
-                    if objDef.name == '__Curve__':
-                        #transfer the curve information from control nodes into simple positions for file save
-                        objCurveInfo = obj[OG.OBJ_PROP]['curveInfo']
-                        self.objDegree = obj[OG.OBJ_PROP]['Degree']
-                        newobjCurveInfo = []
-                        for item in objCurveInfo:
-                            newobjCurveInfo.append((item[0], item[1].getPos()))
-
-                        self.saveData.append("\nobjects['%s'] = objectMgr.addNewCurveFromFile(%s, %s, '%s', %s, False, None)"%(uid, newobjCurveInfo, self.objDegree, uid, parentStr))
+                    if record['curveInfo'] is not None:
+                        self.objDegree = record['degree']
+                        self.saveData.append("\nobjects['%s'] = objectMgr.addNewCurveFromFile(%s, %s, '%s', %s, False, None)"%(uid, record['curveInfo'], self.objDegree, uid, parentStr))
                     else:
-                        self.saveData.append("\nobjects['%s'] = objectMgr.addNewObject('%s', '%s', %s, %s, %s, False, None, %s)"%(uid, objDef.name, uid, modelStr, parentStr, animStr, nameStr))
+                        self.saveData.append("\nobjects['%s'] = objectMgr.addNewObject('%s', '%s', %s, %s, %s, False, None, %s)"%(uid, record['typeName'], uid, modelStr, parentStr, animStr, nameStr))
 
                     self.saveData.append("if objects['%s']:"%uid)
-                    self.saveData.append("    objects['%s'].setPos(%s)"%(uid, np.getPos()))
-                    self.saveData.append("    objects['%s'].setHpr(%s)"%(uid, np.getHpr()))
-                    self.saveData.append("    objects['%s'].setScale(%s)"%(uid, np.getScale()))
+                    self.saveData.append("    objects['%s'].setPos(%s)"%(uid, record['pos']))
+                    self.saveData.append("    objects['%s'].setHpr(%s)"%(uid, record['hpr']))
+                    self.saveData.append("    objects['%s'].setScale(%s)"%(uid, record['scale']))
                     self.saveData.append("    objectMgr.updateObjectColor(%f, %f, %f, %f, objects['%s'])"%(objRGBA[0], objRGBA[1], objRGBA[2], objRGBA[3], uid))
 
-                    if objDef.name == '__Curve__':
-                        pass
-                    else:
-                        self.saveData.append("    objectMgr.updateObjectProperties(objects['%s'], %s)"%(uid,objProp))
+                    if record['curveInfo'] is None:
+                        self.saveData.append("    objectMgr.updateObjectProperties(objects['%s'], %s)"%(uid, record['props']))
 
                 self.traverse(child, uid)
 
+    def traverseRecords(self, parent, records, parentId = None):
+        """
+        Trasverse scene graph to gather the records for saving to a
+        binary level file; parents come before their children
+        """
+        for child in parent.getChildren():
+            if child.hasTag('OBJRoot') and not child.hasTag('Controller'):
+                obj = self.findObjectByNodePath(child)
+                uid = parentId
+                if obj:
+                    records.append(self.getSaveRecord(obj, parentId))
+                    uid = obj[OG.OBJ_UID]
+                self.traverseRecords(child, records, uid)
+
+    def getSaveRecords(self):
+        records = []
+        self.traverseRecords(render, records)
+        return records
+
+    def addObjectFromRecord(self, record, objects):
+        """
+        Adds an object saved by getSaveRecord(), the same way a saved
+        level script does; objects is the dictionary of uid->NodePath of
+        the objects added so far, which the new one is added to
+        """
+        uid = record['uid']
+        parent = None
+        if record['parentId'] is not None:
+            parent = objects.get(record['parentId'])
+        if parent is None and not self.editor:
+            # when loaded outside of LE
+            parent = render
+
+        if record['curveInfo'] is not None:
+            newobj = self.addNewCurveFromFile(record['curveInfo'], record['degree'], uid, parent, False, None)
+        else:
+            newobj = self.addNewObject(record['typeName'], uid, record['model'], parent, record['anim'], False, None, record['name'])
+        objects[uid] = newobj
+
+        if newobj:
+            newobj.setPos(record['pos'])
+            newobj.setHpr(record['hpr'])
+            newobj.setScale(record['scale'])
+            self.updateObjectColor(*record['rgba'], np=newobj)
+            if record['curveInfo'] is None:
+                self.updateObjectProperties(newobj, record['props'])
+        return newobj
+
     def getSaveData(self):
         self.saveData = []
         self.getPreSaveData()
@@ -0,0 +1,261 @@
+"""Defines the AssetCache class, which keeps the models and textures held in
+Panda's ModelPool and TexturePool within a memory budget."""
+
+__all__ = ['AssetCache']
+
+from panda3d.core import ClockObject, Filename, ModelPool, ModelRoot, NodePath, TexturePool
+from direct.directnotify.DirectNotifyGlobal import directNotify
+from collections import OrderedDict
+
+
+class _AssetRecord:
+    __slots__ = ('kind', 'fullpath', 'asset', 'size', 'lastUse', 'probe',
+                 'textureKeys')
+
+    def __init__(self, kind, fullpath, asset, size, lastUse):
+        self.kind = kind
+        self.fullpath = fullpath
+        # the pooled ModelRoot or Texture
+        self.asset = asset
+        self.size = size
+        self.lastUse = lastUse
+        # for models, a GeomNode of the pooled model; see isReferenced()
+        self.probe = None
+        # for models, the keys of the pooled textures it uses
+        self.textureKeys = ()
+
+
+class AssetCache:
+    """
+    Tracks the models and textures that the Loader has put into the
+    ModelPool and TexturePool, with an estimate of the memory each one
+    costs and the last time it was loaded.  The pools never release
+    anything on their own; when the total estimate exceeds the budget, the
+    least recently used assets that nothing else refers to any more are
+    released from their pools, until the total is back under budget.
+
+    Model sizes count their vertex and index data; texture sizes are
+    Panda's estimate of their texture memory, which stands in for both
+    the RAM and VRAM copies.  The pooled textures that a model uses are
+    tracked along with it.  They are referred to by the model, so they
+    only become evictable after it is, and they are released along with
+    it if nothing else uses them.
+
+    If everything is in use, the budget can't be met; the assets are then
+    scanned again at most every ScanInterval seconds, rather than on
+    every load.
+    """
+    notify = directNotify.newCategory("AssetCache")
+
+    Model = 'model'
+    Texture = 'texture'
+
+    # the references held on a pooled texture by its pool and by our
+    # record, or on a pooled model's Geom by its GeomNode and by the
+    # temporary returned by getGeom(); anything above this means the asset
+    # is still in use
+    PooledRefCount = 2
+
+    # the minimum time, in seconds, between scans for assets to evict
+    # while over budget, after a scan that found too few
+    ScanInterval = 1.
+
+    def __init__(self, budget=None):
+        # budget in bytes, or None to only track
+        self.budget = budget
+        # (kind, fullpath)->_AssetRecord, least recently used first
+        self._records = OrderedDict()
+        self.totalBytes = 0
+        self.evictions = 0
+        self.evictedBytes = 0
+        # the real time before which enforceBudget() doesn't scan again
+        self._nextScanTime = 0.
+
+    def destroy(self):
+        self._records = OrderedDict()
+        self.totalBytes = 0
+
+    def setBudget(self, budget):
+        self.budget = budget
+        self.enforceBudget(force = True)
+
+    def getBudget(self):
+        return self.budget
+
+    def noteModel(self, model):
+        """Called by the Loader with each model it loads; model is the
+        NodePath it returned."""
+        if model is None:
+            return
+        modelNode = model.node()
+        if not isinstance(modelNode, ModelRoot):
+            return
+        fullpath = modelNode.getFullpath()
+        # we track the pooled copy, not the one handed out
+        pooled = ModelPool.getModel(fullpath, False)
+        if pooled is None:
+            # it was loaded with noCache
+            return
+        textureKeys = []
+        for texture in NodePath(pooled).findAllTextures():
+            textureFullpath = texture.getFullpath()
+            if textureFullpath.empty() or not TexturePool.hasTexture(textureFullpath):
+                continue
+            self._note(self.Texture, textureFullpath, texture, enforce = False)
+            textureKeys.append((self.Texture, str(textureFullpath)))
+        record = self._note(self.Model, fullpath, pooled, enforce = False)
+        record.textureKeys = tuple(textureKeys)
+        self.enforceBudget()
+
+    def noteTexture(self, texture):
+        """Called by the Loader with each texture it loads."""
+        if texture is None:
+            return
+        fullpath = texture.getFullpath()
+        if not TexturePool.hasTexture(fullpath):
+            return
+        self._note(self.Texture, fullpath, texture)
+
+    def forget(self, kind, fullpath):
+        # called when an asset is released from its pool by someone else
+        record = self._records.pop((kind, str(fullpath)), None)
+        if record is not None:
+            self.totalBytes -= record.size
+
+    def _note(self, kind, fullpath, asset, enforce = True):
+        # records a use of the asset, and returns its record
+        key = (kind, str(fullpath))
+        record = self._records.get(key)
+        now = ClockObject.getGlobalClock().getRealTime()
+        if record is not None and record.asset == asset:
+            record.lastUse = now
+            self._records.move_to_end(key)
+            return record
+        if record is not None:
+            # the pool has a new asset under the same name
+            self.totalBytes -= record.size
+            del self._records[key]
+        size = self.estimateSize(kind, asset)
+        record = self._records[key] = _AssetRecord(kind, str(fullpath), asset, size, now)
+        if kind == self.Model:
+            for geomNode in NodePath(asset).findAllMatches('**/+GeomNode'):
+                if geomNode.node().getNumGeoms():
+                    record.probe = geomNode.node()
+                    break
+        self.totalBytes += size
+        if enforce:
+            self.enforceBudget()
+        return record
+
+    def estimateSize(self, kind, asset):
+        if kind == self.Texture:
+            return asset.estimateTextureMemory()
+        size = 0
+        for geomNode in NodePath(asset).findAllMatches('**/+GeomNode'):
+            geomNode = geomNode.node()
+            for i in range(geomNode.getNumGeoms()):
+                geom = geomNode.getGeom(i)
+                vdata = geom.getVertexData()
+                for j in range(vdata.getNumArrays()):
+                    size += vdata.getArray(j).getDataSizeBytes()
+                for prim in geom.getPrimitives():
+                    vertices = prim.getVertices()
+                    if vertices is not None:
+                        size += vertices.getDataSizeBytes()
+        return size
+
+    def isReferenced(self, record):
+        """Returns true if something other than its pool still refers to
+        the asset; those assets are never evicted."""
+        if record.kind == self.Texture:
+            return record.asset.getRefCount() > self.PooledRefCount
+        # loadModel() hands out copies of the pooled model, which have
+        # their own nodes but share its Geoms
+        if record.probe is None:
+            return record.asset.getRefCount() > self.PooledRefCount
+        return record.probe.getGeom(0).getRefCount() > self.PooledRefCount
+
+    def enforceBudget(self, force = False):
+        # evicts unreferenced assets, oldest first, until we're within the
+        # budget; returns the number evicted.  Unless force is true, this
+        # doesn't scan again within ScanInterval of a scan that couldn't
+        # get within the budget.
+        if self.budget is None or self.totalBytes <= self.budget:
+            return 0
+        now = ClockObject.getGlobalClock().getRealTime()
+        if not force and now < self._nextScanTime:
+            return 0
+        numEvicted = 0
+        for key, record in list(self._records.items()):
+            if self.totalBytes <= self.budget:
+                break
+            if key not in self._records or self.isReferenced(record):
+                # already evicted along with its model, or still in use
+                continue
+            numEvicted += self._evict(key, record)
+        if self.totalBytes > self.budget:
+            self._nextScanTime = now + self.ScanInterval
+            self.notify.debug('%s bytes in use, over budget of %s bytes' % (
+                self.totalBytes, self.budget))
+        return numEvicted
+
+    def _evict(self, key, record):
+        # returns the number of assets evicted, counting the textures that
+        # went along with a model
+        assert self.notify.debug('evicting %s %s (%s bytes)' % (
+            record.kind, record.fullpath, record.size))
+        del self._records[key]
+        self.totalBytes -= record.size
+        self.evictions += 1
+        self.evictedBytes += record.size
+        if record.kind == self.Texture:
+            TexturePool.releaseTexture(record.asset)
+            return 1
+        ModelPool.releaseModel(record.asset)
+        # drop our references to the model, so that its textures are only
+        # referenced by whatever else still uses them
+        record.asset = None
+        record.probe = None
+        numEvicted = 1
+        for textureKey in record.textureKeys:
+            textureRecord = self._records.get(textureKey)
+            if textureRecord is not None and not self.isReferenced(textureRecord):
+                numEvicted += self._evict(textureKey, textureRecord)
+        return numEvicted
+
+    def getStats(self):
+        return {'assets': len(self._records),
+                'bytes': self.totalBytes,
+                'budget': self.budget,
+                'evictions': self.evictions,
+                'evictedBytes': self.evictedBytes,
+                }
+
+    def getBreakdown(self):
+        """Returns a dictionary of directory->[numModels, modelBytes,
+        numTextures, textureBytes] for the assets that are currently
+        tracked."""
+        breakdown = {}
+        for record in self._records.values():
+            dirname = Filename(record.fullpath).getDirname()
+            counts = breakdown.setdefault(dirname, [0, 0, 0, 0])
+            if record.kind == self.Model:
+                counts[0] += 1
+                counts[1] += record.size
+            else:
+                counts[2] += 1
+                counts[3] += record.size
+        return breakdown
+
+    def report(self):
+        # returns a human-readable breakdown by directory, largest first
+        s = 'AssetCache: %s assets, %s bytes' % (len(self._records), self.totalBytes)
+        if self.budget is not None:
+            s += ' of %s' % self.budget
+        s += ', %s evictions (%s bytes)' % (self.evictions, self.evictedBytes)
+        breakdown = self.getBreakdown()
+        for dirname in sorted(breakdown, key=lambda d: -(breakdown[d][1] + breakdown[d][3])):
+            numModels, modelBytes, numTextures, textureBytes = breakdown[dirname]
+            s += '\n  %s: %s models (%s bytes), %s textures (%s bytes)' % (
+                dirname, numModels, modelBytes, numTextures, textureBytes)
+        return s
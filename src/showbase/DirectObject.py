@@ -36,6 +36,15 @@ class DirectObject:
     def isAccepting(self, event):
         return messenger.isAccepting(event, self)
 
+    def acceptPattern(self, pattern, method, extraArgs=[]):
+        return messenger.acceptPattern(pattern, self, method, extraArgs, 1)
+
+    def acceptPatternOnce(self, pattern, method, extraArgs=[]):
+        return messenger.acceptPattern(pattern, self, method, extraArgs, 0)
+
+    def ignorePattern(self, pattern):
+        return messenger.ignorePattern(pattern, self)
+
     def getAllAccepting(self):
         return messenger.getAllAccepting(self)
 
@@ -113,3 +122,6 @@ class DirectObject:
     remove_all_tasks = removeAllTasks
     remove_task = removeTask
     is_accepting = isAccepting
+    accept_pattern = acceptPattern
+    accept_pattern_once = acceptPatternOnce
+    ignore_pattern = ignorePattern
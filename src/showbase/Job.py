@@ -32,7 +32,13 @@ class Job(DirectObject):
         self._id = Job._SerialGen.next()
         self._printing = False
         self._priority = Job.Priorities.Normal
+        self._deadline = None
         self._finished = False
+        # run statistics, kept up to date by the JobManager
+        self._slicesRun = 0
+        self._totalTime = 0.
+        self._overruns = 0
+        self._missedDeadline = False
         if __debug__:
             self._pstats = PStatCollector("App:Show code:jobManager:%s" % self._name)
 
@@ -60,6 +66,35 @@ class Job(DirectObject):
     def setPriority(self, priority):
         self._priority = priority
 
+    def getDeadline(self):
+        return self._deadline
+    def setDeadline(self, deadline):
+        """Sets the real time (as returned by globalClock.getRealTime())
+        by which this job should be finished, or None for no deadline.
+        This is only honored by the JobManager's 'fair' scheduler, which
+        runs the job with the earliest deadline first.  Must be set
+        before the job is added to the JobManager.
+        """
+        self._deadline = deadline
+
+    def getStats(self):
+        """Returns a dict with the number of timeslices this job has run,
+        the total time it has spent running, how many of its timeslices
+        overran the JobManager's frame budget, and whether it finished
+        after its deadline.
+        """
+        return {'slicesRun': self._slicesRun,
+                'totalTime': self._totalTime,
+                'overruns': self._overruns,
+                'missedDeadline': self._missedDeadline,
+                }
+
+    def _recordSlice(self, duration, overran):
+        self._slicesRun += 1
+        self._totalTime += duration
+        if overran:
+            self._overruns += 1
+
     def printingBegin(self):
         self._printing = True
     def printingEnd(self):
@@ -1,7 +1,21 @@
 from direct.directnotify.DirectNotifyGlobal import directNotify
 from direct.task.TaskManagerGlobal import taskMgr
 from direct.showbase.Job import Job
-from direct.showbase.PythonUtil import getBase
+from direct.showbase.PythonUtil import getBase, ScratchPad, SerialNumGen
+import heapq
+
+
+class _FairSchedInfo:
+    # per-job bookkeeping for the 'fair' scheduler
+    __slots__ = ('virtualTime', 'entryId', 'lastRunT')
+
+    def __init__(self, virtualTime, lastRunT):
+        self.virtualTime = virtualTime
+        # identifies the job's current heap entries; entries with any other
+        # id are stale and are discarded when they reach the top of a heap
+        self.entryId = None
+        self.lastRunT = lastRunT
+
 
 class JobManager:
     """
@@ -14,7 +28,15 @@ class JobManager:
     # there's one task for the JobManager, all jobs run in this task
     TaskName = 'jobManager'
 
-    def __init__(self, timeslice=None):
+    # available scheduling strategies:
+    # Flywheel round-robins the jobs, giving each a number of turns
+    # proportional to its priority.
+    # Fair runs jobs with deadlines earliest-deadline-first and otherwise picks
+    # the job with the least virtual time, where a job's virtual time advances by
+    # the time it runs divided by its priority (weighted fair queuing).
+    Schedulers = ScratchPad(Flywheel='flywheel', Fair='fair')
+
+    def __init__(self, timeslice=None, scheduler=None):
         # how long do we run per frame
         self._timeslice = timeslice
         # store the jobs in these structures to allow fast lookup by various keys
@@ -36,6 +58,21 @@ class JobManager:
         # than low-priority
         self._jobIdGenerator = None
         self._highestPriority = Job.Priorities.Normal
+        # which scheduler _process uses, see JobManager.Schedulers
+        self._scheduler = scheduler
+        # state for the 'fair' scheduler
+        # jobId -> _FairSchedInfo
+        self._jobId2fairInfo = {}
+        # heap of (virtualTime, entryId, jobId)
+        self._fairHeap = []
+        # heap of (deadline, entryId, jobId), for jobs that have a deadline
+        self._deadlineHeap = []
+        # jobs that yielded Job.Sleep, to be scheduled again next frame
+        self._sleepingJobIds = []
+        # virtual time of the most recently scheduled job; new jobs start here
+        self._virtualTime = 0.
+        self._entryIdGen = SerialNumGen()
+        self._starvationTime = None
 
     def destroy(self):
         taskMgr.remove(JobManager.TaskName)
@@ -56,6 +93,12 @@ class JobManager:
         self._jobId2timeslices[jobId] = pri
         # init the overflow time tracking
         self._jobId2overflowTime[jobId] = 0.
+        # start the job off at the current virtual time, so that it doesn't
+        # monopolize the fair scheduler while it catches up with older jobs
+        self._jobId2fairInfo[jobId] = _FairSchedInfo(
+            self._virtualTime, globalClock.getRealTime())
+        if self.getScheduler() == JobManager.Schedulers.Fair:
+            self._pushFairJob(jobId, job)
         # reset the jobId round-robin
         self._jobIdGenerator = None
         if len(self._jobId2pri) == 1:
@@ -79,6 +122,8 @@ class JobManager:
         self._jobId2timeslices.pop(jobId)
         # remove the overflow time
         self._jobId2overflowTime.pop(jobId)
+        # any heap entries for the job are now stale
+        self._jobId2fairInfo.pop(jobId)
         if len(self._pri2jobId2job[pri]) == 0:
             del self._pri2jobId2job[pri]
             if pri == self._highestPriority:
@@ -135,6 +180,50 @@ class JobManager:
     def setTimeslice(self, timeslice):
         self._timeslice = timeslice
 
+    def getScheduler(self):
+        if self._scheduler is None:
+            self._scheduler = getBase().config.GetString(
+                'job-manager-scheduler', JobManager.Schedulers.Flywheel)
+        return self._scheduler
+    def setScheduler(self, scheduler):
+        assert scheduler in (JobManager.Schedulers.Flywheel,
+                             JobManager.Schedulers.Fair)
+        if scheduler == self.getScheduler():
+            return
+        self._scheduler = scheduler
+        # the fair scheduler's heaps are only maintained while it is in use
+        self._fairHeap = []
+        self._deadlineHeap = []
+        self._sleepingJobIds = []
+        for info in self._jobId2fairInfo.values():
+            info.entryId = None
+        if scheduler == JobManager.Schedulers.Fair:
+            for jobId2job in self._pri2jobId2job.values():
+                for jobId, job in jobId2job.items():
+                    self._pushFairJob(jobId, job)
+
+    # how long can a job go without running before the fair scheduler runs it
+    # ahead of jobs with deadlines?
+    def getStarvationTime(self):
+        if self._starvationTime is None:
+            # config is in milliseconds, this func returns value in seconds
+            self._starvationTime = getBase().config.GetFloat(
+                'job-starvation-time-ms', 1000.) / 1000.
+        return self._starvationTime
+    def setStarvationTime(self, starvationTime):
+        self._starvationTime = starvationTime
+
+    def getJobStats(self, job=None):
+        # returns the run statistics of the indicated job, or a dict of
+        # job name -> stats for every job that is currently running
+        if job is not None:
+            return job.getStats()
+        stats = {}
+        for jobId2job in self._pri2jobId2job.values():
+            for job in jobId2job.values():
+                stats[job.getJobName()] = job.getStats()
+        return stats
+
     def _getSortedPriorities(self):
         # returns all job priorities in ascending order
         priorities = list(self._pri2jobId2job.keys())
@@ -144,11 +233,19 @@ class JobManager:
     def _process(self, task=None):
         if self._useOverflowTime is None:
             self._useOverflowTime = config.GetBool('job-use-overflow-time', 1)
-        if len(self._pri2jobId2job):
+        if self.getScheduler() == JobManager.Schedulers.Fair:
+            self._processFair()
+        elif len(self._pri2jobId2job):
             #assert self.notify.debugCall()
             # figure out how long we can run
             endT = globalClock.getRealTime() + (self.getTimeslice() * .9)
+            # jobs that yielded Job.Sleep this frame; like the fair
+            # scheduler, they don't run again until next frame
+            sleepingJobIds = set()
             while True:
+                if len(sleepingJobIds) >= len(self._jobId2pri):
+                    # every job is asleep, there's nothing to do until next frame
+                    break
                 if self._jobIdGenerator is None:
                     # round-robin the jobs, giving high-priority jobs more timeslices
                     self._jobIdGenerator = flywheel(
@@ -165,6 +262,8 @@ class JobManager:
                 if pri is None:
                     # this job is no longer present
                     continue
+                if jobId in sleepingJobIds:
+                    continue
                 # check if there's overflow time that we need to make up for
                 if self._useOverflowTime:
                     overflowTime = self._jobId2overflowTime[jobId]
@@ -179,6 +278,7 @@ class JobManager:
                 if __debug__:
                     job._pstats.start()
                 job.resume()
+                startT = globalClock.getRealTime()
                 while globalClock.getRealTime() < endT:
                     try:
                         result = next(gen)
@@ -190,12 +290,15 @@ class JobManager:
 
                     if result is Job.Sleep:
                         job.suspend()
+                        sleepingJobIds.add(jobId)
+                        job._recordSlice(globalClock.getRealTime() - startT, False)
                         if __debug__:
                             job._pstats.stop()
                         # grab the next job if there's time left
                         break
                     elif result is Job.Done:
                         job.suspend()
+                        job._recordSlice(globalClock.getRealTime() - startT, False)
                         self.remove(job)
                         job._setFinished()
                         if __debug__:
@@ -208,8 +311,10 @@ class JobManager:
                     #assert self.notify.debug('timeslice end: %s, %s' % (endT, globalClock.getRealTime()))
                     job.suspend()
                     overflowTime = globalClock.getRealTime() - endT
-                    if overflowTime > self.getTimeslice():
+                    overran = overflowTime > self.getTimeslice()
+                    if overran:
                         self._jobId2overflowTime[jobId] += overflowTime
+                    job._recordSlice(globalClock.getRealTime() - startT, overran)
                     if __debug__:
                         job._pstats.stop()
                     break
@@ -219,6 +324,100 @@ class JobManager:
                     break
         return task.cont
 
+    def _pushFairJob(self, jobId, job):
+        # (re-)inserts the job into the fair scheduler's heaps
+        info = self._jobId2fairInfo[jobId]
+        info.entryId = self._entryIdGen.next()
+        heapq.heappush(self._fairHeap, (info.virtualTime, info.entryId, jobId))
+        deadline = job.getDeadline()
+        if deadline is not None:
+            heapq.heappush(self._deadlineHeap, (deadline, info.entryId, jobId))
+
+    def _peekFairHeap(self, heap):
+        # discards stale entries from the top of the heap, returns the jobId
+        # at the top or None if the heap is empty
+        while heap:
+            key, entryId, jobId = heap[0]
+            info = self._jobId2fairInfo.get(jobId)
+            if info is not None and info.entryId == entryId:
+                return jobId
+            heapq.heappop(heap)
+        return None
+
+    def _popFairJobId(self, t):
+        # picks the next job to run under the fair scheduler
+        fairJobId = self._peekFairHeap(self._fairHeap)
+        deadlineJobId = self._peekFairHeap(self._deadlineHeap)
+        if fairJobId is None:
+            return None
+        if ((deadlineJobId is not None) and
+            (t - self._jobId2fairInfo[fairJobId].lastRunT < self.getStarvationTime())):
+            jobId = deadlineJobId
+        else:
+            # either there are no deadlines, or the job that is owed the most
+            # time has been starved for too long
+            jobId = fairJobId
+        # invalidate the job's entries in both heaps
+        self._jobId2fairInfo[jobId].entryId = None
+        return jobId
+
+    def _processFair(self):
+        getRealTime = globalClock.getRealTime
+        timeslice = self.getTimeslice()
+        endT = getRealTime() + (timeslice * .9)
+        # jobs that went to sleep last frame may run again
+        for jobId in self._sleepingJobIds:
+            if jobId in self._jobId2pri:
+                self._pushFairJob(jobId, self._pri2jobId2job[self._jobId2pri[jobId]][jobId])
+        self._sleepingJobIds = []
+        while True:
+            startT = getRealTime()
+            if startT >= endT:
+                break
+            jobId = self._popFairJobId(startT)
+            if jobId is None:
+                break
+            info = self._jobId2fairInfo[jobId]
+            self._virtualTime = max(self._virtualTime, info.virtualTime)
+            pri = self._jobId2pri[jobId]
+            job = self._pri2jobId2job[pri][jobId]
+            gen = job._getGenerator()
+            if __debug__:
+                job._pstats.start()
+            job.resume()
+            while True:
+                try:
+                    result = next(gen)
+                except StopIteration:
+                    # Job didn't yield Job.Done, it ran off the end and returned
+                    # treat it as if it returned Job.Done
+                    self.notify.warning('job %s never yielded Job.Done' % job)
+                    result = Job.Done
+                if result is Job.Sleep or result is Job.Done:
+                    break
+                if getRealTime() >= endT:
+                    break
+            job.suspend()
+            t = getRealTime()
+            job._recordSlice(t - startT, (t - endT) > timeslice)
+            if __debug__:
+                job._pstats.stop()
+            info.virtualTime += (t - startT) / max(pri, 1)
+            info.lastRunT = t
+            if result is Job.Done:
+                deadline = job.getDeadline()
+                if deadline is not None and t > deadline:
+                    job._missedDeadline = True
+                self.remove(job)
+                job._setFinished()
+                messenger.send(job.getFinishedEvent())
+            elif result is Job.Sleep:
+                self._sleepingJobIds.append(jobId)
+            else:
+                # out of time for this frame
+                self._pushFairJob(jobId, job)
+                break
+
     def __repr__(self):
         s  =   '======================================================='
         s += '\nJobManager: active jobs in descending order of priority'
@@ -8,6 +8,8 @@ from panda3d.core import *
 from panda3d.core import Loader as PandaLoader
 from direct.directnotify.DirectNotifyGlobal import *
 from direct.showbase.DirectObject import DirectObject
+from direct.showbase.AssetCache import AssetCache
+import heapq
 
 # You can specify a phaseChecker callback to check
 # a modelPath to see if it is being loaded in the correct
@@ -15,6 +17,23 @@ from direct.showbase.DirectObject import DirectObject
 phaseChecker = None
 
 
+class _PrefetchEntry:
+    # one model in the prefetch queue; all prefetches of the same model
+    # with the same loader options share an entry
+    __slots__ = ('modelPath', 'loaderOptions', 'priority', 'waiters',
+                 'queueTime', 'cb')
+
+    def __init__(self, modelPath, loaderOptions, priority, queueTime):
+        self.modelPath = modelPath
+        self.loaderOptions = loaderOptions
+        self.priority = priority
+        # list of [callback, extraArgs, group]
+        self.waiters = []
+        self.queueTime = queueTime
+        # the loadModel() request, once the load has been started
+        self.cb = None
+
+
 class Loader(DirectObject):
     """
     Load models, textures, sounds, and code.
@@ -147,6 +166,36 @@ class Loader(DirectObject):
 
         self._requests = {}
 
+        # prefetch queue state; see prefetchModel()
+        self.prefetchMaxInFlight = ConfigVariableInt('loader-prefetch-max-in-flight', 8).getValue()
+        # key->_PrefetchEntry, for entries that are waiting to be started
+        self._prefetchQueued = {}
+        # key->_PrefetchEntry, for entries that are being loaded
+        self._prefetchInFlight = {}
+        # heap of (-priority, seq, key); entries whose priority doesn't
+        # match the queued entry are stale and are skipped
+        self._prefetchHeap = []
+        self._prefetchSeq = 0
+        # group->set of keys with waiters in that group
+        self._prefetchGroups = {}
+        # modelPath->seconds from the first request until it was ready
+        self._prefetchTimes = {}
+        self._prefetchStats = {'requested': 0,
+                               'coalesced': 0,
+                               'completed': 0,
+                               'cancelled': 0,
+                               'totalTime': 0.,
+                               'maxTime': 0.,
+                               }
+
+        # keeps the ModelPool and TexturePool within a memory budget, if
+        # one is configured; see AssetCache
+        budget = ConfigVariableDouble('loader-cache-budget-mb', 0).getValue()
+        if budget > 0:
+            self.assetCache = AssetCache(int(budget * 1024 * 1024))
+        else:
+            self.assetCache = None
+
         self.hook = "async_loader_%s" % (Loader.loaderIndex)
         Loader.loaderIndex += 1
         self.accept(self.hook, self.__gotAsyncObject)
@@ -155,6 +204,15 @@ class Loader(DirectObject):
 
     def destroy(self):
         self.ignore(self.hook)
+        for entry in self._prefetchInFlight.values():
+            entry.cb.cancel()
+        self._prefetchQueued = {}
+        self._prefetchInFlight = {}
+        self._prefetchHeap = []
+        self._prefetchGroups = {}
+        if self.assetCache is not None:
+            self.assetCache.destroy()
+            self.assetCache = None
         self.loader.stopThreads()
         del self.base
         del self.loader
@@ -293,6 +351,10 @@ class Loader(DirectObject):
 
                 result.append(nodePath)
 
+            if self.assetCache is not None:
+                for nodePath in result:
+                    self.assetCache.noteModel(nodePath)
+
             if not okMissing and None in result:
                 message = 'Could not load model file(s): %s' % (modelList,)
                 raise IOError(message)
@@ -340,6 +402,183 @@ class Loader(DirectObject):
 
         return bool(cb.requests)
 
+    # prefetch queue priority classes; higher numbers are loaded first
+    PrefetchCosmetic = 0
+    PrefetchLow = 1
+    PrefetchNormal = 2
+    PrefetchHigh = 3
+    PrefetchCritical = 4
+
+    def prefetchModel(self, modelPath, priority = PrefetchNormal,
+                      group = None, callback = None, extraArgs = [],
+                      loaderOptions = None):
+        """
+        Queues an asynchronous load of the model.  Unlike loadModel()
+        with a callback, which starts every load immediately, prefetched
+        models are loaded from a queue: at most prefetchMaxInFlight
+        loads (config loader-prefetch-max-in-flight) are running at
+        once, and the rest wait their turn in order of priority (one of
+        the Prefetch* priority classes, or any number; higher numbers
+        are loaded first).
+
+        Prefetching a model that is already queued or being loaded does
+        not load it again; the callback is added to the existing request,
+        whose priority is raised if the new one is higher.  When the model
+        has loaded, each callback is invoked with a NodePath to its own
+        copy of the model (or None if it could not be loaded) followed by
+        its extraArgs.  callback may be None to just warm the ModelPool.
+
+        group is any hashable key; cancelPrefetchGroup() cancels all of
+        the callbacks that were queued with it, e.g. all the loads for a
+        zone that is being left.
+        """
+        if loaderOptions is None:
+            loaderOptions = LoaderOptions()
+        else:
+            loaderOptions = LoaderOptions(loaderOptions)
+        # report missing models through the callback, not an exception
+        loaderOptions.setFlags(loaderOptions.getFlags() & ~LoaderOptions.LFReportErrors)
+        key = (str(modelPath), loaderOptions.getFlags())
+
+        stats = self._prefetchStats
+        stats['requested'] += 1
+        entry = self._prefetchQueued.get(key)
+        if entry is None:
+            entry = self._prefetchInFlight.get(key)
+        if entry is None:
+            entry = _PrefetchEntry(modelPath, loaderOptions, priority,
+                                   ClockObject.getGlobalClock().getRealTime())
+            self._prefetchQueued[key] = entry
+            self._pushPrefetch(key, entry)
+        else:
+            stats['coalesced'] += 1
+            if priority > entry.priority:
+                entry.priority = priority
+                if entry.cb is None:
+                    self._pushPrefetch(key, entry)
+                else:
+                    for request in entry.cb.requestList or []:
+                        request.setPriority(priority)
+
+        entry.waiters.append([callback, extraArgs, group])
+        if group is not None:
+            self._prefetchGroups.setdefault(group, set()).add(key)
+
+        self._servicePrefetchQueue()
+
+    def cancelPrefetchGroup(self, group):
+        """Cancels the callbacks of all of the prefetches queued with the
+        given group.  Models that no other prefetch is waiting for are
+        removed from the queue, or their loads are cancelled if they have
+        already started."""
+        keys = self._prefetchGroups.pop(group, ())
+        for key in keys:
+            entry = self._prefetchQueued.get(key)
+            if entry is None:
+                entry = self._prefetchInFlight.get(key)
+                if entry is None:
+                    continue
+            numWaiters = len(entry.waiters)
+            entry.waiters = [waiter for waiter in entry.waiters
+                             if waiter[2] != group]
+            self._prefetchStats['cancelled'] += numWaiters - len(entry.waiters)
+            if not entry.waiters:
+                if entry.cb is None:
+                    # its heap entries are now stale
+                    del self._prefetchQueued[key]
+                else:
+                    entry.cb.cancel()
+                    del self._prefetchInFlight[key]
+        self._servicePrefetchQueue()
+
+    def setPrefetchMaxInFlight(self, maxInFlight):
+        self.prefetchMaxInFlight = maxInFlight
+        self._servicePrefetchQueue()
+
+    def getPrefetchQueueDepth(self):
+        # returns the number of models waiting to be loaded, not counting
+        # the ones that are currently loading
+        return len(self._prefetchQueued)
+
+    def getPrefetchStats(self):
+        """Returns a dictionary of statistics for the prefetch queue.
+        'requested' counts prefetchModel() calls and 'coalesced' those that
+        were merged into an existing request; times are in seconds from
+        the first request for a model until it was ready."""
+        stats = dict(self._prefetchStats)
+        stats['queued'] = len(self._prefetchQueued)
+        stats['inFlight'] = len(self._prefetchInFlight)
+        if stats['completed']:
+            stats['avgTime'] = stats['totalTime'] / stats['completed']
+        else:
+            stats['avgTime'] = 0.
+        return stats
+
+    def getPrefetchTimes(self):
+        # returns a modelPath->time-to-ready dictionary for the models
+        # that have been prefetched
+        return dict(self._prefetchTimes)
+
+    def resetPrefetchStats(self):
+        self._prefetchTimes = {}
+        for name in self._prefetchStats:
+            self._prefetchStats[name] = type(self._prefetchStats[name])()
+
+    def _pushPrefetch(self, key, entry):
+        heapq.heappush(self._prefetchHeap, (-entry.priority, self._prefetchSeq, key))
+        self._prefetchSeq += 1
+
+    def _servicePrefetchQueue(self):
+        heap = self._prefetchHeap
+        queued = self._prefetchQueued
+        while heap and len(self._prefetchInFlight) < self.prefetchMaxInFlight:
+            negPriority, seq, key = heapq.heappop(heap)
+            entry = queued.get(key)
+            if entry is None or entry.priority != -negPriority:
+                # stale heap entry
+                continue
+            del queued[key]
+            self._prefetchInFlight[key] = entry
+            # the callback may be invoked before loadModel() returns
+            cb = self.loadModel(entry.modelPath, loaderOptions = entry.loaderOptions,
+                                callback = self.__prefetchDone, extraArgs = [key, entry],
+                                priority = entry.priority)
+            if self._prefetchInFlight.get(key) is entry:
+                entry.cb = cb
+
+    def __prefetchDone(self, model, key, entry):
+        if self._prefetchInFlight.get(key) is not entry:
+            # cancelled
+            return
+        del self._prefetchInFlight[key]
+
+        elapsed = ClockObject.getGlobalClock().getRealTime() - entry.queueTime
+        stats = self._prefetchStats
+        stats['completed'] += 1
+        stats['totalTime'] += elapsed
+        stats['maxTime'] = max(stats['maxTime'], elapsed)
+        self._prefetchTimes[entry.modelPath] = elapsed
+
+        first = True
+        for callback, extraArgs, group in entry.waiters:
+            if group is not None:
+                keys = self._prefetchGroups.get(group)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._prefetchGroups[group]
+            if callback is None:
+                continue
+            if model is None or first:
+                waiterModel = model
+                first = False
+            else:
+                # every waiter gets its own copy, as with loadModel()
+                waiterModel = model.copyTo(NodePath())
+            callback(waiterModel, *extraArgs)
+
+        self._servicePrefetchQueue()
+
     def loadModelOnce(self, modelPath):
         """
         modelPath is a string.
@@ -416,6 +655,8 @@ class Loader(DirectObject):
 
         assert Loader.notify.debug("Unloading model: %s" % (modelNode.getFullpath()))
         ModelPool.releaseModel(modelNode)
+        if self.assetCache is not None:
+            self.assetCache.forget(AssetCache.Model, modelNode.getFullpath())
 
     def saveModel(self, modelPath, node, loaderOptions = None,
                   callback = None, extraArgs = [], priority = None,
@@ -761,6 +1002,9 @@ class Loader(DirectObject):
         if anisotropicDegree is not None:
             texture.setAnisotropicDegree(anisotropicDegree)
 
+        if self.assetCache is not None:
+            self.assetCache.noteTexture(texture)
+
         return texture
 
     def load3DTexture(self, texturePattern, readMipmaps = False, okMissing = False,
@@ -945,6 +1189,8 @@ class Loader(DirectObject):
         """
         assert Loader.notify.debug("Unloading texture: %s" % (texture))
         TexturePool.releaseTexture(texture)
+        if self.assetCache is not None:
+            self.assetCache.forget(AssetCache.Texture, texture.getFullpath())
 
     # sound loading funcs
     def loadSfx(self, *args, **kw):
@@ -1131,10 +1377,19 @@ class Loader(DirectObject):
         result = request.result()
         if isinstance(result, PandaNode):
             result = NodePath(result)
+            if self.assetCache is not None:
+                self.assetCache.noteModel(result)
 
         cb.gotObject(i, result)
 
     load_model = loadModel
+    prefetch_model = prefetchModel
+    cancel_prefetch_group = cancelPrefetchGroup
+    set_prefetch_max_in_flight = setPrefetchMaxInFlight
+    get_prefetch_queue_depth = getPrefetchQueueDepth
+    get_prefetch_stats = getPrefetchStats
+    get_prefetch_times = getPrefetchTimes
+    reset_prefetch_stats = resetPrefetchStats
     unload_model = unloadModel
     save_model = saveModel
     load_font = loadFont
@@ -7,11 +7,107 @@ __all__ = ['Messenger']
 
 from .PythonUtil import *
 from direct.directnotify import DirectNotifyGlobal
+from panda3d.core import ConfigVariableBool, PStatCollector, ClockObject
+from collections import deque
+from functools import partial
+import fnmatch
 import types
+import re
 
 from direct.stdpy.threading import Lock
 
 
+class _PatternIndex:
+    """
+    Indexes event name patterns by their literal prefix (the part before
+    the first wildcard character) in a character trie, so that the
+    patterns that may match a given event name are found by walking the
+    trie along that name, rather than by testing every pattern.
+    """
+
+    def __init__(self):
+        # Each node is a dict of char->child node; the None key, if
+        # present, holds the list of patterns ending at that node.
+        self.root = {}
+
+    def add(self, prefix, pattern):
+        node = self.root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault(None, []).append(pattern)
+
+    def remove(self, prefix, pattern):
+        path = [self.root]
+        for ch in prefix:
+            path.append(path[-1][ch])
+        patterns = path[-1][None]
+        patterns.remove(pattern)
+        if not patterns:
+            del path[-1][None]
+        # Prune the nodes that no longer lead anywhere.
+        for i in range(len(prefix), 0, -1):
+            if path[i]:
+                break
+            del path[i - 1][prefix[i - 1]]
+
+    def getCandidates(self, name):
+        candidates = []
+        node = self.root
+        if None in node:
+            candidates += node[None]
+        for ch in name:
+            node = node.get(ch)
+            if node is None:
+                break
+            if None in node:
+                candidates += node[None]
+        return candidates
+
+
+class _TaskChainMailbox:
+    """
+    Holds the events sent to one task chain.  Senders append to the
+    deque from any thread while holding the Messenger's lock, and the
+    first event sent to an empty mailbox adds a task on the receiving
+    chain, which drains it in batches and then goes away.
+    """
+
+    def __init__(self, taskChain):
+        self.taskChain = taskChain
+        self.queue = deque()
+        self.task = None
+
+        # numSent is updated under the Messenger's lock; the rest are
+        # only updated by the task draining the mailbox.
+        self.numSent = 0
+        self.numDispatched = 0
+        self.numDrains = 0
+        self.maxDepth = 0
+        self.lastLatency = 0.0
+        self.maxLatency = 0.0
+        self.totalLatency = 0.0
+
+        self.depthCollector = PStatCollector(
+            'App:Show code:messenger:%s:queueDepth' % (taskChain))
+        self.latencyCollector = PStatCollector(
+            'App:Show code:messenger:%s:drainLatency' % (taskChain))
+
+    def getStats(self):
+        if self.numDispatched:
+            avgLatency = self.totalLatency / self.numDispatched
+        else:
+            avgLatency = 0.0
+        return {'depth': len(self.queue),
+                'maxDepth': self.maxDepth,
+                'sent': self.numSent,
+                'dispatched': self.numDispatched,
+                'drains': self.numDrains,
+                'lastLatency': self.lastLatency,
+                'maxLatency': self.maxLatency,
+                'avgLatency': avgLatency,
+                }
+
+
 class Messenger:
 
     notify = DirectNotifyGlobal.directNotify.newCategory("Messenger")
@@ -43,9 +139,10 @@ class Messenger:
         # objMsgrId->listenerObject
         self._id2object = {}
 
-        # A mapping of taskChain -> eventList, used for sending events
-        # across task chains (and therefore across threads).
+        # A mapping of taskChain -> _TaskChainMailbox, used for sending
+        # events across task chains (and therefore across threads).
         self._eventQueuesByTaskChain = {}
+        self._clock = ClockObject.getGlobalClock()
 
         # This protects the data structures within this object from
         # multithreaded access.
@@ -67,9 +164,51 @@ class Messenger:
         self.taskMgr = taskMgr
         self.eventMgr = None
 
+        # eventName->tuple of (objMsgrId, callInfo, boundMethod), used
+        # when precompiled dispatch is enabled.  A table is discarded
+        # whenever the set of acceptors for its event changes, so a
+        # table that is still present is known to be current.
+        self.__dispatchTables = {}
+        self._precompiledDispatch = ConfigVariableBool(
+            'messenger-precompiled-dispatch', False).getValue()
+
+        # pattern->objMsgrId->callbackInfo, for acceptPattern()
+        self.__patternCallbacks = {}
+        # objMsgrId->set(pattern)
+        self.__objectPatterns = {}
+        # pattern->compiled matcher, or None for a plain prefix pattern
+        self.__patternMatchers = {}
+        self.__patternIndex = _PatternIndex()
+        # eventName->tuple(pattern); cleared whenever a pattern is added
+        # or removed.
+        self.__patternMatchCache = {}
+        self.__patternMatchCacheLimit = 10000
+
     def setEventMgr(self, mgr):
         self.eventMgr = mgr
 
+    def setPrecompiledDispatch(self, enabled):
+        """
+        Enables or disables precompiled dispatch.  In this mode, each
+        event keeps an immutable table of its handlers, with the
+        extraArgs already bound, which is rebuilt only when an accept
+        or ignore changes the event's acceptors.  This makes sending
+        an event with many listeners considerably cheaper.
+
+        Note that in this mode, the extraArgs passed to accept() are
+        captured when the table is built; modifying the list in place
+        afterwards has no effect until the table is next rebuilt.
+        """
+        self.lock.acquire()
+        try:
+            self._precompiledDispatch = bool(enabled)
+            self.__dispatchTables.clear()
+        finally:
+            self.lock.release()
+
+    def getPrecompiledDispatch(self):
+        return self._precompiledDispatch
+
     def _getMessengerId(self, object):
         # TODO: allocate this id in DirectObject.__init__ and get derived
         # classes to call down (speed optimization, assuming objects
@@ -176,6 +315,7 @@ class Messenger:
                             (object.__class__.__name__, safeRepr(event), method.__name__, oldMethod.__name__))
 
             acceptorDict[id] = [method, extraArgs, persistent]
+            self.__dispatchTables.pop(event, None)
 
             # Remember that this object is listening for this event
             eventDict = self.__objectEvents.setdefault(id, {})
@@ -203,6 +343,7 @@ class Messenger:
             # If this object is there, delete it from the dictionary
             if acceptorDict and id in acceptorDict:
                 del acceptorDict[id]
+                self.__dispatchTables.pop(event, None)
                 # If this dictionary is now empty, remove the event
                 # entry from the Messenger alltogether
                 if (len(acceptorDict) == 0):
@@ -240,15 +381,202 @@ class Messenger:
                     # If this object is there, delete it from the dictionary
                     if acceptorDict and id in acceptorDict:
                         del acceptorDict[id]
+                        self.__dispatchTables.pop(event, None)
                         # If this dictionary is now empty, remove the event
                         # entry from the Messenger alltogether
                         if (len(acceptorDict) == 0):
                             del self.__callbacks[event]
                     self._releaseObject(object)
                 del self.__objectEvents[id]
+
+            patternDict = self.__objectPatterns.get(id)
+            if patternDict:
+                for pattern in list(patternDict.keys()):
+                    acceptorDict = self.__patternCallbacks.get(pattern)
+                    if acceptorDict and id in acceptorDict:
+                        del acceptorDict[id]
+                        if len(acceptorDict) == 0:
+                            self.__removePattern(pattern)
+                    self._releaseObject(object)
+                del self.__objectPatterns[id]
+        finally:
+            self.lock.release()
+
+    def acceptPattern(self, pattern, object, method, extraArgs=[], persistent=1):
+        """
+        Make this object accept every event whose name matches the given
+        pattern.  The pattern is a glob-style pattern as understood by
+        the fnmatch module; the common case of a prefix followed by a
+        single trailing '*' (e.g. 'enter*') is matched without a regex.
+
+        Because the handler may be called for many different events,
+        the name of the event that was sent is passed to the method
+        after the extraArgs, and before any arguments sent with it.
+        """
+        if Messenger.notify.getDebug():
+            Messenger.notify.debug(
+                "object: %s (%s)\n accepting pattern: %s\n method: %s\n extraArgs: %s\n persistent: %s" %
+                (safeRepr(object), self._getMessengerId(object), pattern, safeRepr(method),
+                 safeRepr(extraArgs), persistent))
+
+        assert hasattr(method, '__call__'), (
+            "method not callable in acceptPattern (ignoring): %s %s"%
+            (safeRepr(method), safeRepr(extraArgs)))
+
+        if not (isinstance(extraArgs, list) or isinstance(extraArgs, tuple) or isinstance(extraArgs, set)):
+            raise TypeError("A list is required as extraArgs argument")
+
+        self.lock.acquire()
+        try:
+            acceptorDict = self.__patternCallbacks.get(pattern)
+            if acceptorDict is None:
+                acceptorDict = self.__patternCallbacks[pattern] = {}
+                self.__addPatternToIndex(pattern)
+
+            id = self._getMessengerId(object)
+            acceptorDict[id] = [method, extraArgs, persistent]
+
+            patternDict = self.__objectPatterns.setdefault(id, {})
+            if pattern not in patternDict:
+                self._storeObject(object)
+                patternDict[pattern] = None
+        finally:
+            self.lock.release()
+
+    def ignorePattern(self, pattern, object):
+        """
+        Make this object no longer respond to events matching the given
+        pattern.  It is safe to call even if it was not already accepting
+        """
+        if Messenger.notify.getDebug():
+            Messenger.notify.debug(
+                safeRepr(object) + ' (%s)\n now ignoring pattern: ' % (self._getMessengerId(object), ) + safeRepr(pattern))
+
+        self.lock.acquire()
+        try:
+            id = self._getMessengerId(object)
+            acceptorDict = self.__patternCallbacks.get(pattern)
+            if acceptorDict and id in acceptorDict:
+                del acceptorDict[id]
+                if len(acceptorDict) == 0:
+                    self.__removePattern(pattern)
+
+            patternDict = self.__objectPatterns.get(id)
+            if patternDict and pattern in patternDict:
+                del patternDict[pattern]
+                if len(patternDict) == 0:
+                    del self.__objectPatterns[id]
+                self._releaseObject(object)
+        finally:
+            self.lock.release()
+
+    def isAcceptingPattern(self, pattern, object):
+        """
+        Is this object accepting events matching this pattern?
+        """
+        self.lock.acquire()
+        try:
+            acceptorDict = self.__patternCallbacks.get(pattern)
+            return int(bool(acceptorDict) and self._getMessengerId(object) in acceptorDict)
+        finally:
+            self.lock.release()
+
+    def getPatterns(self):
+        return list(self.__patternCallbacks.keys())
+
+    def getMatchingPatterns(self, event):
+        """
+        Returns the list of accepted patterns that match the given event.
+        """
+        self.lock.acquire()
+        try:
+            return list(self.__getMatchingPatterns(event))
         finally:
             self.lock.release()
 
+    def __addPatternToIndex(self, pattern):
+        # assumes lock is held.
+        match = re.search(r'[*?\[]', pattern)
+        if match is None:
+            # No wildcards at all; it only matches itself.
+            prefix = pattern
+            matcher = re.compile(re.escape(pattern) + r'\Z').match
+        else:
+            prefix = pattern[:match.start()]
+            if match.start() == len(pattern) - 1 and pattern[-1] == '*':
+                # A plain prefix; reaching its trie node is a match.
+                matcher = None
+            else:
+                matcher = re.compile(fnmatch.translate(pattern)).match
+        self.__patternMatchers[pattern] = (prefix, matcher)
+        self.__patternIndex.add(prefix, pattern)
+        self.__patternMatchCache.clear()
+
+    def __removePattern(self, pattern):
+        # assumes lock is held.
+        del self.__patternCallbacks[pattern]
+        prefix, matcher = self.__patternMatchers.pop(pattern)
+        self.__patternIndex.remove(prefix, pattern)
+        self.__patternMatchCache.clear()
+
+    def __getMatchingPatterns(self, event):
+        # assumes lock is held.
+        patterns = self.__patternMatchCache.get(event)
+        if patterns is None:
+            if not isinstance(event, str):
+                patterns = ()
+            else:
+                matchers = self.__patternMatchers
+                patterns = tuple([pattern for pattern in self.__patternIndex.getCandidates(event)
+                                  if matchers[pattern][1] is None or matchers[pattern][1](event)])
+            if len(self.__patternMatchCache) >= self.__patternMatchCacheLimit:
+                self.__patternMatchCache.clear()
+            self.__patternMatchCache[event] = patterns
+        return patterns
+
+    def __dispatchPatterns(self, patterns, event, sentArgs, foundWatch):
+        # Calls the handlers for each of the given patterns.
+        # assumes lock is held.
+        for pattern in patterns:
+            acceptorDict = self.__patternCallbacks.get(pattern)
+            if not acceptorDict:
+                continue
+            for id in list(acceptorDict.keys()):
+                callInfo = acceptorDict.get(id)
+                if not callInfo:
+                    continue
+                method, extraArgs, persistent = callInfo
+                if not persistent:
+                    patternDict = self.__objectPatterns.get(id)
+                    if patternDict and pattern in patternDict:
+                        del patternDict[pattern]
+                        if len(patternDict) == 0:
+                            del self.__objectPatterns[id]
+                        self._releaseObject(self._getObject(id))
+
+                    del acceptorDict[id]
+                    if len(acceptorDict) == 0:
+                        self.__removePattern(pattern)
+
+                if __debug__:
+                    if foundWatch:
+                        print("Messenger: \"%s\" (%s) --> %s%s"%(
+                            event, pattern,
+                            self.__methodRepr(method),
+                            (*extraArgs, event, *sentArgs)))
+
+                self.lock.release()
+                try:
+                    result = method(*extraArgs, event, *sentArgs)
+                finally:
+                    self.lock.acquire()
+
+                if hasattr(result, 'cr_await'):
+                    if not self.taskMgr:
+                        from direct.task import TaskManagerGlobal
+                        self.taskMgr = TaskManagerGlobal.taskMgr
+                    self.taskMgr.add(result)
+
     def getAllAccepting(self, object):
         """
         Returns the list of all events accepted by the indicated object.
@@ -314,6 +642,8 @@ class Messenger:
                 'sent event: %s sentArgs = %s, taskChain = %s' % (
                 event, sentArgs, taskChain))
 
+        table = None
+        deferredPatterns = ()
         self.lock.acquire()
         try:
             foundWatch=0
@@ -324,59 +654,138 @@ class Messenger:
                             foundWatch=1
                             break
             acceptorDict = self.__callbacks.get(event)
-            if not acceptorDict:
+            patterns = ()
+            if self.__patternCallbacks:
+                patterns = self.__getMatchingPatterns(event)
+            if not acceptorDict and not patterns:
                 if __debug__:
                     if foundWatch:
                         print("Messenger: \"%s\" was sent, but no function in Python listened."%(event,))
                 return
 
             if taskChain:
-                # Queue the event onto the indicated task chain.
-                queue = self._eventQueuesByTaskChain.setdefault(taskChain, [])
-                queue.append((acceptorDict, event, sentArgs, foundWatch))
-                if len(queue) == 1:
-                    # If this is the first (only) item on the queue,
-                    # spawn the task to empty it.
-                    if not self.taskMgr:
-                        from direct.task import TaskManagerGlobal
-                        self.taskMgr = TaskManagerGlobal.taskMgr
-                    self.taskMgr.add(self.__taskChainDispatch, name = 'Messenger-%s' % (taskChain),
-                                extraArgs = [taskChain], taskChain = taskChain,
-                                appendTask = True)
+                # Queue the event onto the task chain's mailbox, to be
+                # handled by the task that drains it.
+                mailbox = self._eventQueuesByTaskChain.get(taskChain)
+                if mailbox is None:
+                    mailbox = _TaskChainMailbox(taskChain)
+                    self._eventQueuesByTaskChain[taskChain] = mailbox
+                mailbox.queue.append((acceptorDict, patterns, event, sentArgs,
+                                      foundWatch, self._clock.getRealTime()))
+                mailbox.numSent += 1
+                if mailbox.task is None or not mailbox.task.isAlive():
+                    # The mailbox was empty (or its task was removed
+                    # from outside), so start draining it again.
+                    self.__startTaskChainDispatch(mailbox)
+            elif acceptorDict and self._precompiledDispatch:
+                # Fetch (or build) the handler table; it is immutable,
+                # so it can safely be walked without holding the lock.
+                table = self.__dispatchTables.get(event)
+                if table is None:
+                    table = self.__compileDispatchTable(event, acceptorDict)
+                deferredPatterns = patterns
             else:
                 # Handle the event immediately.
-                self.__dispatch(acceptorDict, event, sentArgs, foundWatch)
+                if acceptorDict:
+                    self.__dispatch(acceptorDict, event, sentArgs, foundWatch)
+                if patterns:
+                    self.__dispatchPatterns(patterns, event, sentArgs, foundWatch)
         finally:
             self.lock.release()
 
-    def __taskChainDispatch(self, taskChain, task):
-        """ This task is spawned each time an event is sent across
-        task chains.  Its job is to empty the task events on the queue
-        for this particular task chain.  This guarantees that events
-        are still delivered in the same order they were sent. """
-
-        while True:
-            eventTuple = None
-            self.lock.acquire()
-            try:
-                queue = self._eventQueuesByTaskChain.get(taskChain, None)
-                if queue:
-                    eventTuple = queue[0]
-                    del queue[0]
-                if not queue:
-                    # The queue is empty, we're done.
-                    if queue is not None:
-                        del self._eventQueuesByTaskChain[taskChain]
-
-                if not eventTuple:
-                    # No event; we're done.
-                    return task.done
+        if table is not None:
+            self.__dispatchPrecompiled(table, event, sentArgs, foundWatch)
+            if deferredPatterns:
+                self.lock.acquire()
+                try:
+                    self.__dispatchPatterns(deferredPatterns, event, sentArgs, foundWatch)
+                finally:
+                    self.lock.release()
 
-                self.__dispatch(*eventTuple)
-            finally:
-                self.lock.release()
+    def __startTaskChainDispatch(self, mailbox):
+        # Adds the task that drains the mailbox on its task chain.
+        # assumes lock is held.
+        if not self.taskMgr:
+            from direct.task import TaskManagerGlobal
+            self.taskMgr = TaskManagerGlobal.taskMgr
+        mailbox.task = self.taskMgr.add(
+            self.__taskChainDispatch, name = 'Messenger-%s' % (mailbox.taskChain),
+            extraArgs = [mailbox], taskChain = mailbox.taskChain, appendTask = True)
+
+    def __taskChainDispatch(self, mailbox, task):
+        """ This task runs on each task chain that events have been sent
+        to.  Its job is to empty that chain's mailbox, in a single batch
+        each time it runs.  This guarantees that events are still
+        delivered in the same order they were sent.  Events are taken
+        off the mailbox one at a time, so if a handler raises an
+        exception, the events after it are still delivered later.  Once
+        the mailbox is empty the task ends, until the next event is
+        sent. """
+
+        # The lock is held for the whole batch; __dispatch() releases it
+        # around each handler call.
+        self.lock.acquire()
+        try:
+            if self._eventQueuesByTaskChain.get(mailbox.taskChain) is not mailbox:
+                # The messenger was cleared since the task was added.
+                return task.done
+            queue = mailbox.queue
+
+            depth = len(queue)
+            if depth > mailbox.maxDepth:
+                mailbox.maxDepth = depth
+            mailbox.depthCollector.setLevel(depth)
+
+            # Only the events that are queued now are handled in this
+            # batch; any sent by the handlers wait for the next one.
+            maxLatency = 0.0
+            for i in range(depth):
+                if not queue:
+                    # A handler cleared the messenger.
+                    break
+                acceptorDict, patterns, event, sentArgs, foundWatch, sendTime = queue.popleft()
+
+                latency = self._clock.getRealTime() - sendTime
+                mailbox.totalLatency += latency
+                if latency > maxLatency:
+                    maxLatency = latency
+
+                mailbox.numDispatched += 1
+                if acceptorDict:
+                    self.__dispatch(acceptorDict, event, sentArgs, foundWatch)
+                if patterns:
+                    self.__dispatchPatterns(patterns, event, sentArgs, foundWatch)
+
+            mailbox.numDrains += 1
+            mailbox.lastLatency = maxLatency
+            if maxLatency > mailbox.maxLatency:
+                mailbox.maxLatency = maxLatency
+            mailbox.latencyCollector.setLevel(maxLatency * 1000.0)
+
+            if queue and self._eventQueuesByTaskChain.get(mailbox.taskChain) is mailbox:
+                # More events were sent while these were handled; they
+                # are handled the next time the chain runs.
+                return task.cont
+            mailbox.task = None
+            mailbox.depthCollector.setLevel(0)
+            return task.done
+        finally:
+            self.lock.release()
 
-        return task.done
+    def getTaskChainQueueStats(self, taskChain=None):
+        """
+        Returns a dictionary of statistics (current and maximum queue
+        depth, events sent and dispatched, and drain latency in seconds)
+        for the mailbox of the indicated task chain, or a dictionary of
+        taskChain->stats for every task chain if taskChain is None.
+        """
+        if taskChain is None:
+            return dict((name, mailbox.getStats())
+                        for name, mailbox in list(self._eventQueuesByTaskChain.items()))
+        mailbox = self._eventQueuesByTaskChain.get(taskChain)
+        if mailbox is None:
+            return None
+        return mailbox.getStats()
 
     def __dispatch(self, acceptorDict, event, sentArgs, foundWatch):
         for id in list(acceptorDict.keys()):
@@ -394,20 +803,7 @@ class Messenger:
                 # If this object was only accepting this event once,
                 # remove it from the dictionary
                 if not persistent:
-                    # This object is no longer listening for this event
-                    eventDict = self.__objectEvents.get(id)
-                    if eventDict and event in eventDict:
-                        del eventDict[event]
-                        if (len(eventDict) == 0):
-                            del self.__objectEvents[id]
-                        self._releaseObject(self._getObject(id))
-
-                    del acceptorDict[id]
-                    # If the dictionary at this event is now empty, remove
-                    # the event entry from the Messenger altogether
-                    if (event in self.__callbacks \
-                            and (len(self.__callbacks[event]) == 0)):
-                        del self.__callbacks[event]
+                    self.__removeOnceAcceptor(acceptorDict, event, id)
 
                 if __debug__:
                     if foundWatch:
@@ -441,20 +837,111 @@ class Messenger:
                         self.taskMgr = TaskManagerGlobal.taskMgr
                     self.taskMgr.add(result)
 
+    def __removeOnceAcceptor(self, acceptorDict, event, id):
+        # Removes an acceptor that was only accepting this event once,
+        # just before it is called.  Assumes lock is held.
+        eventDict = self.__objectEvents.get(id)
+        if eventDict and event in eventDict:
+            del eventDict[event]
+            if (len(eventDict) == 0):
+                del self.__objectEvents[id]
+            self._releaseObject(self._getObject(id))
+
+        del acceptorDict[id]
+        self.__dispatchTables.pop(event, None)
+        # If the dictionary at this event is now empty, remove
+        # the event entry from the Messenger altogether
+        if (event in self.__callbacks \
+                and (len(self.__callbacks[event]) == 0)):
+            del self.__callbacks[event]
+
+    def __compileDispatchTable(self, event, acceptorDict):
+        # Builds the immutable handler table for this event, binding
+        # each handler's extraArgs up front so that a send need not
+        # concatenate argument lists.  Assumes lock is held.
+        table = []
+        for id, callInfo in acceptorDict.items():
+            method, extraArgs, persistent = callInfo
+            if extraArgs:
+                method = partial(method, *extraArgs)
+            table.append((id, callInfo, method))
+        table = tuple(table)
+        self.__dispatchTables[event] = table
+        return table
+
+    def __dispatchPrecompiled(self, table, event, sentArgs, foundWatch):
+        # Calls the handlers in the given table.  This is called without
+        # the lock held; it is only taken when an acceptor needs to be
+        # removed, or when the table went stale during this send.
+        tables = self.__dispatchTables
+        for id, callInfo, boundMethod in table:
+            if callInfo[2] and tables.get(event) is table:
+                # Steady state: the table is still current, and this
+                # acceptor is persistent, so just make the call.
+                method = boundMethod
+                args = sentArgs
+            else:
+                # Either this acceptor must be removed before calling
+                # it, or a previous handler changed the acceptors for
+                # this event; look the acceptor up again, as __dispatch
+                # would have done.
+                self.lock.acquire()
+                try:
+                    acceptorDict = self.__callbacks.get(event)
+                    callInfo = acceptorDict and acceptorDict.get(id)
+                    if not callInfo:
+                        continue
+                    method, extraArgs, persistent = callInfo
+                    if not persistent:
+                        self.__removeOnceAcceptor(acceptorDict, event, id)
+                    args = extraArgs + sentArgs
+                finally:
+                    self.lock.release()
+
+            if __debug__:
+                if foundWatch:
+                    print("Messenger: \"%s\" --> %s%s"%(
+                        event,
+                        self.__methodRepr(callInfo[0]),
+                        tuple(callInfo[1] + sentArgs)))
+
+            result = method(*args)
+
+            if hasattr(result, 'cr_await'):
+                # It's a coroutine, so schedule it with the task manager.
+                if not self.taskMgr:
+                    from direct.task import TaskManagerGlobal
+                    self.taskMgr = TaskManagerGlobal.taskMgr
+                self.taskMgr.add(result)
+
     def clear(self):
         """
         Start fresh with a clear dict
         """
         self.lock.acquire()
         try:
+            self.__dispatchTables.clear()
             self.__callbacks.clear()
             self.__objectEvents.clear()
+            self.__patternCallbacks.clear()
+            self.__objectPatterns.clear()
+            self.__patternMatchers.clear()
+            self.__patternIndex = _PatternIndex()
+            self.__patternMatchCache.clear()
             self._id2object.clear()
+            # Throw away any events still waiting to be sent across task
+            # chains, along with the tasks that would have handled them.
+            for mailbox in self._eventQueuesByTaskChain.values():
+                if mailbox.task is not None:
+                    mailbox.task.remove()
+                    mailbox.task = None
+                mailbox.queue.clear()
+            self._eventQueuesByTaskChain.clear()
         finally:
             self.lock.release()
 
     def isEmpty(self):
-        return (len(self.__callbacks) == 0)
+        return (len(self.__callbacks) == 0 and len(self.__patternCallbacks) == 0)
 
     def getEvents(self):
         return list(self.__callbacks.keys())
@@ -481,6 +968,7 @@ class Messenger:
                 if (function == oldMethod):
                     newMethod = types.MethodType(newFunction, method.__self__)
                     params[0] = newMethod
+                    self.__dispatchTables.pop(event, None)
                     # Found it retrun true
                     retFlag += 1
         # didn't find that method, return false
@@ -675,3 +1163,11 @@ class Messenger:
     detailed_repr = detailedRepr
     get_all_accepting = getAllAccepting
     toggle_verbose = toggleVerbose
+    accept_pattern = acceptPattern
+    ignore_pattern = ignorePattern
+    is_accepting_pattern = isAcceptingPattern
+    get_patterns = getPatterns
+    get_matching_patterns = getMatchingPatterns
+    get_task_chain_queue_stats = getTaskChainQueueStats
+    set_precompiled_dispatch = setPrecompiledDispatch
+    get_precompiled_dispatch = getPrecompiledDispatch
@@ -0,0 +1,87 @@
+"""Defines the ProcessPoolJob class, a :class:`.Job` that runs its work in a
+pool of worker processes."""
+
+__all__ = ['ProcessPoolJob']
+
+from direct.showbase.Job import Job
+from direct.showbase.PythonUtil import getBase
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+
+class ProcessPoolJob(Job):
+    """Job that runs CPU-bound work on other cores.
+
+    Each work unit is a tuple of arguments for `func`; the calls are made in
+    a shared pool of worker processes, so `func` must be a module-level
+    function, and its arguments and return value must be picklable.  While
+    the work is in progress the job yields `Job.Sleep`, so with either
+    scheduler it checks on the work once a frame and costs the main thread
+    almost nothing.  When every unit has completed, `handleResults()`
+    is called on the main thread with the results in the same order as the
+    work units, and the job finishes through the usual JobManager path, so
+    `getFinishedEvent()` is sent as for any other job.
+
+    Example::
+
+        job = ProcessPoolJob('parseLevels', parseLevelFile,
+                             [(filename, ) for filename in filenames])
+        jobMgr.add(job)
+    """
+
+    # the process pool, shared by all ProcessPoolJobs
+    _executor = None
+
+    def __init__(self, name, func, workUnits, executor=None):
+        Job.__init__(self, name)
+        self._func = func
+        self._workUnits = list(workUnits)
+        self._jobExecutor = executor
+        self._futures = []
+        self._results = None
+
+    def destroy(self):
+        for future in self._futures:
+            future.cancel()
+        del self._futures
+        del self._func
+        del self._workUnits
+        Job.destroy(self)
+
+    @classmethod
+    def getExecutor(cls):
+        if cls._executor is None:
+            # 0 means one worker per CPU
+            numWorkers = getBase().config.GetInt('job-process-pool-size', 0)
+            cls._executor = ProcessPoolExecutor(numWorkers or os.cpu_count())
+        return cls._executor
+
+    @classmethod
+    def shutdownExecutor(cls, wait=True):
+        if cls._executor is not None:
+            cls._executor.shutdown(wait)
+            cls._executor = None
+
+    def getResults(self):
+        # returns the list of results, or None if the job hasn't finished
+        return self._results
+
+    def handleResults(self, results):
+        """Override this to process the results on the main thread before
+        the job finishes."""
+        pass
+
+    def run(self):
+        executor = self._jobExecutor or ProcessPoolJob.getExecutor()
+        self._futures = [executor.submit(self._func, *workUnit)
+                         for workUnit in self._workUnits]
+        # futures are checked in order, so each one is only polled until it
+        # is done
+        for future in self._futures:
+            while not future.done():
+                yield Job.Sleep
+        # result() re-raises any exception from the worker process here
+        self._results = [future.result() for future in self._futures]
+        self._futures = []
+        self.handleResults(self._results)
+        yield Job.Done